@@ -1,93 +1,538 @@
 # servers predictions
 
-from fastapi import FastAPI, HTTPException
+from src.startup import StartupTimeline, lazy_import
+startup = StartupTimeline()  # created first, so the import phase covers the whole module
+
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Response, Header
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import importlib
 import numpy as np
 import os
-import boto3
-from src.utils import load_artifacts
+import shutil
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, nullcontext
+from functools import partial
+# loaded on first use by the startup thread, the port is bound without them
+boto3 = lazy_import('boto3')
+joblib = lazy_import('joblib')
+from src.utils import ARTIFACTS, OPTIONAL_ARTIFACTS
+from src.model_handle import ModelHandle, ModelRegistry
+from src.artifact_store import ArtifactStore
+from src.microbatch import MicroBatcher
+from src.shadow import ShadowScorer
+from src.metrics import Metrics, MetricsMiddleware
+from src.prediction_cache import PredictionCache, feature_key
+from src.payload import CompactPayloadRoute, decode_features
+from src.drift import DriftMonitor
+from src.admission import AdmissionController, AdmissionMiddleware
+
+@asynccontextmanager
+async def lifespan(app):
+    # the model is fetched, loaded and warmed on a background thread, uvicorn binds the port as soon as this yields
+    start_up_in_background()
+    yield
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 S3_BUCKET = os.getenv('S3_BUCKET', 'fraud-mlops-artifacts-bt') # which S3 bucket
 S3_PREFIX = 'artifacts/'  # folder in S3 bucket
+N_FEATURES = 30
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '10000'))  # max transactions per /predict/batch call
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'sklearn')  # 'sklearn' or 'flat' (array-backed forest)
+FLAT_ENGINE_MAX_ROWS = int(os.getenv('FLAT_ENGINE_MAX_ROWS', '256'))  # larger batches go through sklearn
+MICROBATCH_ENABLED = os.getenv('MICROBATCH_ENABLED', 'false').lower() == 'true'  # coalesce concurrent /predict calls
+MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', '64'))
+MICROBATCH_WINDOW_MS = float(os.getenv('MICROBATCH_WINDOW_MS', '2'))
+USE_FUSED_MODEL = os.getenv('USE_FUSED_MODEL', 'true').lower() == 'true'  # serve the raw-input model when one was exported
+USE_BUNDLE = os.getenv('USE_BUNDLE', 'true').lower() == 'true'  # serve model.bundle (memory-mapped) when it exists in S3
+ARTIFACT_CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR', '/tmp/artifact-cache')  # content-addressed, shared by all workers on the host
+SHADOW_ENABLED = os.getenv('SHADOW_ENABLED', 'false').lower() == 'true'  # also score every request with a challenger model
+SHADOW_PREFIX = os.getenv('SHADOW_PREFIX', 'shadow/')  # S3 folder holding the challenger artifact set
+SHADOW_LOG_PATH = os.getenv('SHADOW_LOG_PATH', f'/tmp/shadow/shadow-{os.getpid()}.log')  # one append-only log per worker
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '1024'))  # queued requests before shadow work is dropped
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'  # Prometheus metrics on /metrics
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'false').lower() == 'true'  # answer repeated transactions from memory
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '100000'))  # entries, least recently used evicted first
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '300'))  # seconds
+DRIFT_ENABLED = os.getenv('DRIFT_ENABLED', 'true').lower() == 'true'  # streaming input/probability drift sketches on /drift
+DRIFT_PSI_THRESHOLD = float(os.getenv('DRIFT_PSI_THRESHOLD', '0.2'))  # features above this PSI are reported as drifted
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'  # bound concurrent scoring requests, shed the excess
+ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', '32'))  # scoring requests running at once, per worker
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '64'))  # requests waiting for a slot before new ones are shed
+ADMISSION_DEFAULT_DEADLINE_MS = float(os.getenv('ADMISSION_DEFAULT_DEADLINE_MS', '0'))  # for requests without X-Deadline-Ms, 0 = none
+WARMUP_ROWS = int(os.getenv('WARMUP_ROWS', '64'))  # synthetic rows per warm-up batch before /ready reports ready
+
+# Per-stage latency, counters and model load metrics, None when disabled
+metrics = Metrics() if METRICS_ENABLED else None
+
+# Scoring requests past the concurrency limit queue on the event loop, and are shed when the
+# queue is full or their X-Deadline-Ms cannot be met. Added first so the metrics middleware sees shed requests
+admission = AdmissionController(ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_DEFAULT_DEADLINE_MS) if ADMISSION_ENABLED else None
+if admission is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission, paths=['/predict', '/predict/batch'], metrics=metrics)
+if metrics is not None:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 # artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts') # this line is redundant, used for local
 
-try:
-    # download from S3 and load artifacts on startup
-    s3_client = boto3.client('s3')
-    for artifact in ["model", "preprocessor", "threshold", "best_f1"]:
-        s3_client.download_file(
-            Bucket=S3_BUCKET,
-            Key=f'{S3_PREFIX}{artifact}.joblib',
-            Filename=f'/tmp/{artifact}.joblib'
-        )
-    model, preprocessor, threshold, best_f1 = load_artifacts('/tmp')
-    print("Models loaded from S3 successfully")
-except Exception as e:
-    print(f"Could not load models on startup: {e}")
-    # Set to None so API knows models aren't ready
-    model = preprocessor = threshold = best_f1 = None
+def artifact_store(prefix=S3_PREFIX):
+    return ArtifactStore(boto3.client('s3'), S3_BUCKET, prefix, cache_dir=ARTIFACT_CACHE_DIR)
+
+
+def record_artifact_sizes(model, paths):
+    if metrics is not None:
+        metrics.observe_artifacts(model, {artifact: os.path.getsize(path) if path else None for artifact, path in paths.items()})
+
+
+def fetch_model(version, prefix=S3_PREFIX, model='champion', timeline=None):
+    # only artifacts whose S3 ETag changed are downloaded, everything else comes from the local cache
+    # the fetch/load phases are timed into timeline when given, start_up passes it for the champion's first load only
+    def phase(name):
+        return timeline.phase(name) if timeline is not None else nullcontext()
+    
+    store = artifact_store(prefix)
+    if USE_BUNDLE:
+        # cached objects are named by content hash, so workers serving the same bundle map one file
+        with phase('fetch'):
+            paths = store.fetch([], optional=['model.bundle', 'drift_reference.joblib'])
+        bundle_path = paths['model.bundle']
+        if bundle_path is not None:
+            record_artifact_sizes(model, paths)
+            print(f"Loading bundle, artifact cache stats: {store.stats}, pruned {store.prune()} stale objects")
+            with phase('load'):
+                drift_reference = joblib.load(paths['drift_reference.joblib']) if paths['drift_reference.joblib'] else None
+                return ModelHandle.from_bundle(bundle_path, engine=INFERENCE_ENGINE, flat_max_rows=FLAT_ENGINE_MAX_ROWS, drift_reference=drift_reference)
+        print("No bundle in S3, loading joblib artifacts instead")
+    
+    with phase('fetch'):
+        paths = store.fetch(ARTIFACTS, optional=[a for a in OPTIONAL_ARTIFACTS if a.endswith('.joblib')])
+    record_artifact_sizes(model, paths)
+    print(f"Loading joblib artifacts, artifact cache stats: {store.stats}, pruned {store.prune()} stale objects")
+    
+    # each version links its files into its own directory so a reload never touches files being read
+    local_dir = os.path.join(ARTIFACT_CACHE_DIR, f'load-{os.getpid()}-{prefix.strip("/")}-{version}')
+    try:
+        with phase('load'):
+            store.materialize(paths, local_dir)
+            return ModelHandle.from_artifacts(local_dir, use_fused=USE_FUSED_MODEL, engine=INFERENCE_ENGINE, flat_max_rows=FLAT_ENGINE_MAX_ROWS)
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+
+
+# Cached probabilities are tagged with their model version and dropped when a new version goes live
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_ENABLED else None
+
+
+def on_champion_status(status):
+    if metrics is not None:
+        metrics.observe_status('champion', status)
+    if status['status'] == 'active':
+        startup.mark('model_active')
+    if prediction_cache is not None and status['status'] == 'active':
+        prediction_cache.clear()
+
+
+# Running summaries of what has been scored, compared with the active model's training data
+drift = DriftMonitor(DRIFT_PSI_THRESHOLD) if DRIFT_ENABLED else None
+
+
+# Active model version, swapped atomically on /reload
+registry = ModelRegistry(listener=on_champion_status, warm_up_rows=WARMUP_ROWS)
+
+
+def fetch_shadow_model(version):
+    return fetch_model(version, prefix=SHADOW_PREFIX, model='shadow')
+
+
+# Challenger scored off the response path, has its own registry so it reloads independently
+shadow_registry = ModelRegistry(listener=partial(metrics.observe_status, 'shadow') if metrics is not None else None)
+shadow = ShadowScorer(shadow_registry, SHADOW_LOG_PATH, max_queue_size=SHADOW_QUEUE_SIZE) if SHADOW_ENABLED else None
+
+if shadow is not None:
+    shadow_registry.reload_async(fetch_shadow_model)
 
 class Transaction(BaseModel):
     features: List[float]  # Expects a list of 30 floats
 
 
+class TransactionBatch(BaseModel):
+    transactions: List[List[float]]  # Expects a list of transactions, each a list of 30 floats
+
+
+def score_current(X):
+    """
+    Scores X with the active version, returns (probability, threshold, version, artifact version) per row.
+    Drift is updated here for the whole micro-batch, with the handle that scored it.
+    """
+    with registry.acquire() as handle:
+        y_proba = handle.score(X)
+        if drift is not None:
+            drift.update(X, y_proba, handle)
+        return [(p, handle.threshold, handle.version, handle.artifact_version) for p in y_proba.tolist()]
+
+
+# Concurrent /predict calls share one score_current() call per batch when enabled
+batcher = MicroBatcher(score_current, MICROBATCH_MAX_SIZE, MICROBATCH_WINDOW_MS) if MICROBATCH_ENABLED else None
+
+
+def warm_request_path(handle, n_rows=WARMUP_ROWS):
+    # first-call costs around scoring (pydantic validation, compact decoding, drift binning) on
+    # synthetic rows, with a scratch DriftMonitor so nothing reaches the live summaries or caches
+    X = np.random.default_rng(0).standard_normal((n_rows, N_FEATURES))
+    Transaction(features=X[0].tolist())
+    TransactionBatch(transactions=X.tolist())
+    decode_features(X.tobytes(), 'application/octet-stream', N_FEATURES)
+    y_proba = handle.score(X)
+    if drift is not None:
+        DriftMonitor(DRIFT_PSI_THRESHOLD).update(X, y_proba, handle)
+    if prediction_cache is not None:
+        feature_key(X[0])
+
+
+def start_up():
+    # heavy imports, S3 fetch, model load and warm-up, while the app already answers / and /ready
+    startup.mark('startup_thread')
+    try:
+        with startup.phase('imports'):
+            boto3.client, joblib.load  # lazy modules execute on their first attribute access
+            importlib.import_module('src.bundle')  # sklearn and the rest of the model stack
+        # on the registry's loader thread, a /reload or shadow load sent meanwhile is not timed
+        handle = registry.load(partial(fetch_model, timeline=startup))
+        startup.record('warm_model', registry.status(handle.version)['warm_seconds'])
+        with startup.phase('warm_request_path'):
+            warm_request_path(handle)
+        print("Models loaded from S3 successfully")
+    except Exception as e:
+        # registry.current stays None so API knows models aren't ready
+        print(f"Could not load models on startup: {e}")
+    startup.finish()
+    if registry.current is not None:
+        startup.mark('ready')
+    report = startup.report()
+    print(f"Startup: {report}")
+    if metrics is not None:
+        metrics.observe_startup(report)
+
+
+startup_thread = None
+
+
+def start_up_in_background():
+    global startup_thread
+    if startup_thread is None:  # once per process, also when the lifespan runs again in tests
+        startup_thread = threading.Thread(target=start_up, name="startup", daemon=True)
+        startup_thread.start()
+
+
+def is_ready():
+    # a failed startup load becomes ready once /reload activated (and warmed) a model
+    return startup.finished and registry.current is not None
+
+
+def record_first_prediction():
+    if startup.mark('first_prediction'):
+        report = startup.report()
+        print(f"First prediction served {report['since_process_start']['first_prediction']:.2f}s after process start")
+        if metrics is not None:
+            metrics.observe_startup(report)
+
+
 @app.get("/")
 def read_root():
     return {"message": "Fraud Detection API"}
 
+@app.get("/ready")
+def readiness():
+    # liveness stays on /, this gates traffic until the model is loaded and warm
+    if not is_ready():
+        raise HTTPException(status_code=503, detail={"ready": False, **startup.report()})
+    startup.mark('ready')
+    return {"ready": True, "model_version": registry.current.version, **startup.report()}
+
+def new_request_id(response, x_request_id=None):
+    # the caller's X-Request-Id or a new one, echoed back so shadow log records can be joined with labels later
+    request_id = x_request_id or uuid.uuid4().hex
+    response.headers['X-Request-Id'] = request_id
+    return request_id
+
+
+def score_row(X, response, idempotency_key, handler_started, request_id=None):
+    # shared by the JSON and compact /predict routes, X is a (1, 30) matrix
+    if not np.isfinite(X).all():
+        raise HTTPException(status_code=400, detail="Features must be finite numbers")  # as /predict/batch answers per item
+    timings = {}  # seconds per stage, reported to metrics at the end
+    handle = registry.current
+    
+    # Retries and re-scored transactions are answered from the cache while the same version is active
+    cached = None
+    if prediction_cache is not None:
+        start = time.perf_counter()
+        cache_key = feature_key(X[0], idempotency_key)
+        cached = prediction_cache.get(cache_key, handle.version)
+        timings['cache'] = time.perf_counter() - start
+        response.headers['X-Cache'] = 'hit' if cached is not None else 'miss'
+    
+    # Get prediction probability, the threshold always comes from the same model version
+    # Drift is updated with the handle that produced y_proba, a reload may have landed since handle was read
+    if cached is not None:
+        y_proba, threshold, version, artifact_version = cached, handle.threshold, handle.version, handle.artifact_version
+        if drift is not None:
+            drift.update(X, [y_proba], handle)  # cached under handle.version, so handle produced it
+    elif batcher is not None:
+        start = time.perf_counter()
+        y_proba, threshold, version, artifact_version = batcher.predict(X[0])  # drift is updated in score_current
+        timings['microbatch'] = time.perf_counter() - start  # queueing + batched transform and predict
+    else:
+        with registry.acquire() as handle:
+            y_proba, threshold, version, artifact_version = handle.score(X, timings)[0], handle.threshold, handle.version, handle.artifact_version
+            if drift is not None:
+                drift.update(X, [y_proba], handle)  # a few vectorised NumPy calls, nothing is logged
+    
+    # Apply threshold
+    start = time.perf_counter()
+    y_pred = 1 if y_proba >= threshold else 0
+    
+    if cached is None:
+        if prediction_cache is not None:
+            prediction_cache.put(cache_key, version, y_proba)
+        if shadow is not None:
+            shadow.submit(X, [y_proba], [y_pred], artifact_version, request_id)  # never blocks, dropped when the shadow queue is full
+    
+    result = {
+        "prediction": "fraud" if y_pred == 1 else "legit",
+        "fraud_probability": float(y_proba),
+        "model_version": version
+    }
+    timings['threshold'] = time.perf_counter() - start
+    
+    if metrics is not None:
+        metrics.observe_prediction('/predict', timings, version, 1, y_pred, handler_started)
+    if 'first_prediction' not in startup.marks:
+        record_first_prediction()
+    return result
+
+
+def score_rows(n, lengths, valid, X, handler_started, request_id=None):
+    """
+    Shared by the JSON and compact /predict/batch routes. X holds the rows of the right
+    length; rows that are not finite are answered with a per-item error here.
+    """
+    timings = {}
+    # Non-finite values are rejected per item as well
+    finite = np.isfinite(X).all(axis=1)
+    valid_idx = np.flatnonzero(valid)
+    valid[valid_idx[~finite]] = False
+    X = X[finite]
+    positions = np.flatnonzero(valid)  # of X's rows in the request
+    timings['assemble'] = time.perf_counter() - handler_started
+    
+    # Score all valid rows with one transform + predict_proba call, skipping rows already in the cache
+    with registry.acquire() as handle:
+        scored = np.ones(len(X), dtype=bool)
+        y_proba = np.empty(len(X))
+        if prediction_cache is not None and len(X):
+            start = time.perf_counter()
+            keys = [feature_key(row) for row in X]
+            for i, key in enumerate(keys):
+                cached = prediction_cache.get(key, handle.version)
+                if cached is not None:
+                    y_proba[i], scored[i] = cached, False
+            timings['cache'] = time.perf_counter() - start
+        if scored.any():
+            y_proba[scored] = handle.score(X[scored], timings)
+        start = time.perf_counter()
+        y_pred = y_proba >= handle.threshold
+        version, artifact_version = handle.version, handle.artifact_version
+        if drift is not None:
+            drift.update(X, y_proba, handle)
+    
+    if prediction_cache is not None:
+        for i in np.flatnonzero(scored):
+            prediction_cache.put(keys[i], version, y_proba[i])
+    if shadow is not None and scored.any():
+        shadow.submit(X[scored], y_proba[scored], y_pred[scored], artifact_version, request_id, rows=positions[scored])
+    
+    # Reassemble results in input order
+    results = []
+    scored = iter(zip(y_pred.tolist(), y_proba.tolist()))
+    for length, ok in zip(lengths.tolist(), valid.tolist()):
+        if ok:
+            is_fraud, proba = next(scored)
+            results.append({"prediction": "fraud" if is_fraud else "legit", "fraud_probability": proba})
+        elif length != N_FEATURES:
+            results.append({"error": f"Expected 30 features, got {length}"})
+        else:
+            results.append({"error": "Features must be finite numbers"})
+    timings['threshold'] = time.perf_counter() - start
+    
+    if metrics is not None:
+        metrics.batch_size.observe(n)
+        metrics.observe_prediction('/predict/batch', timings, version, len(X), int(y_pred.sum()), handler_started)
+    if 'first_prediction' not in startup.marks:
+        record_first_prediction()
+    return {"results": results, "model_version": version}
+
+
+def check_model_loaded():
+    if registry.current is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Call /reload endpoint first.")
+
+
+def check_batch_size(n):
+    if n == 0:
+        raise HTTPException(status_code=400, detail="Expected at least one transaction")
+    if n > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch of {n} transactions exceeds limit of {MAX_BATCH_SIZE}")
+
+
+async def compact_features(request: Request):
+    # raw float32/float64 or bare JSON array body, decoded into a (n, 30) matrix without pydantic
+    body = await request.body()
+    try:
+        return decode_features(body, request.headers.get('content-type'), N_FEATURES)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Compact bodies have their own routes on the same paths, registered first so they are
+# tried before the JSON routes, which keep handling application/json as before
+compact_router = APIRouter(route_class=CompactPayloadRoute)
+
+
+@compact_router.post("/predict", include_in_schema=False)
+def predict_fraud_compact(response: Response, X: np.ndarray = Depends(compact_features), idempotency_key: Optional[str] = Header(None), x_request_id: Optional[str] = Header(None)):
+    handler_started = time.perf_counter()
+    check_model_loaded()
+    if len(X) != 1:
+        raise HTTPException(status_code=400, detail=f"Expected one transaction, got {len(X)}, use /predict/batch")
+    return score_row(X, response, idempotency_key, handler_started, new_request_id(response, x_request_id))
+
+
+@compact_router.post("/predict/batch", include_in_schema=False)
+def predict_fraud_batch_compact(response: Response, X: np.ndarray = Depends(compact_features), x_request_id: Optional[str] = Header(None)):
+    handler_started = time.perf_counter()
+    check_model_loaded()
+    n = len(X)
+    check_batch_size(n)
+    # every row has the right length, decode_features checked the shape
+    return score_rows(n, np.full(n, N_FEATURES), np.ones(n, dtype=bool), X, handler_started, new_request_id(response, x_request_id))
+
+
+app.include_router(compact_router)
+
+
 @app.post("/predict")
-def predict_fraud(transaction: Transaction):
+def predict_fraud(transaction: Transaction, response: Response, idempotency_key: Optional[str] = Header(None), x_request_id: Optional[str] = Header(None)):
+    handler_started = time.perf_counter()
+    
     # Check if models are loaded
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded. Call /reload endpoint first.")
+    check_model_loaded()
     
     # Validate input length
-    if len(transaction.features) != 30:
+    if len(transaction.features) != N_FEATURES:
         raise HTTPException(status_code=400, detail="Expected 30 features")
     
     # Convert to numpy array and reshape for preprocessing
     X = np.array(transaction.features).reshape(1, -1)
+    return score_row(X, response, idempotency_key, handler_started, new_request_id(response, x_request_id))
+
+
+@app.post("/predict/batch")
+def predict_fraud_batch(batch: TransactionBatch, response: Response, x_request_id: Optional[str] = Header(None)):
+    handler_started = time.perf_counter()
     
-    # Preprocess (scale the features)
-    X_scaled = preprocessor.transform(X)
-    
-    # Get prediction probability
-    y_proba = model.predict_proba(X_scaled)[0][1]  # Probability of fraud
+    # Check if models are loaded
+    check_model_loaded()
     
-    # Apply threshold
-    y_pred = 1 if y_proba >= threshold else 0
+    n = len(batch.transactions)
+    check_batch_size(n)
     
-    return {
-        "prediction": "fraud" if y_pred == 1 else "legit",
-        "fraud_probability": float(y_proba)
-    }
+    # Rows with the wrong length get a per-item error, the rest are stacked into one 2-D array
+    lengths = np.fromiter((len(t) for t in batch.transactions), dtype=np.int64, count=n)
+    valid = lengths == N_FEATURES
+    X = np.array([t for t, ok in zip(batch.transactions, valid) if ok], dtype=np.float64).reshape(-1, N_FEATURES)
+    return score_rows(n, lengths, valid, X, handler_started, new_request_id(response, x_request_id))
     
+@app.get("/metrics")
+def prometheus_metrics():
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/drift")
+def drift_report():
+    if drift is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is disabled")
+    return drift.report()
+
+@app.get("/admission/stats")
+def admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission.stats()}
+
+@app.get("/cache/stats")
+def prediction_cache_stats():
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_cache.stats()}
+
+@app.get("/microbatch/stats")
+def microbatch_stats():
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.stats()}
+
+@app.get("/shadow/stats")
+def shadow_stats():
+    if shadow is None:
+        return {"enabled": False}
+    handle = shadow_registry.current
+    return {"enabled": True, "challenger_version": handle.version if handle else None,
+            "challenger_artifact": handle.artifact_version if handle else None, **shadow.stats()}
+
+@app.post("/shadow/reload")
+def reload_shadow_model():
+    # Load the challenger from SHADOW_PREFIX in the background, poll /shadow/reload/{version}
+    if shadow is None:
+        raise HTTPException(status_code=404, detail="Shadow scoring is disabled")
+    version = shadow_registry.reload_async(fetch_shadow_model)
+    return {"status": "loading", "version": version}
+
+@app.get("/shadow/reload/{version}")
+def shadow_reload_status(version: str):
+    status = shadow_registry.status(version)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown shadow model version: {version}")
+    return status
+
+@app.get("/model")
+def model_info():
+    handle = registry.current
+    if handle is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Call /reload endpoint first.")
+    return {"model_version": handle.version, "model_f1_score": float(handle.best_f1)}
+
 @app.post("/reload")
 def reload_model():
-    global model, preprocessor, threshold, best_f1
-    
-    # Download artifacts from S3 to local temp directory
-    s3_client = boto3.client('s3')
-    for artifact in ["model", "preprocessor", "threshold", "best_f1"]:
-        s3_client.download_file(
-            Bucket=S3_BUCKET,
-            Key=f'{S3_PREFIX}{artifact}.joblib',  # Path in S3
-            Filename=f'/tmp/{artifact}.joblib'    # Where to save in container
-        )
-    
-    # Load artifacts from temp directory
-    model, preprocessor, threshold, best_f1 = load_artifacts(input_dir='/tmp')
-    
-    # Return success message
-    return {
-        "status": "model reloaded successfully",
-        "model_f1_score": float(best_f1)
-    }
+    # Download, load and warm the new version in the background, poll /reload/{version} for progress
+    version = registry.reload_async(fetch_model)
+    return {"status": "loading", "version": version}
+
+@app.get("/reload/{version}")
+def reload_status(version: str):
+    status = registry.status(version)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    return status
+
 
 
+startup.mark('app_imported')
 
 # full flow WITH AWS S3: train locally → upload to S3 → call API reload → verify predictions work
@@ -0,0 +1,214 @@
+import asyncio
+import collections
+import threading
+import time
+from starlette.responses import JSONResponse
+from src.metrics import request_started
+
+DEADLINE_HEADER = b'x-deadline-ms'  # milliseconds the caller will wait, counted from when the request arrives
+SHED_STATUS = 429  # distinct from the 503 of a missing model, so gateways can tell load shedding apart
+SERVICE_EWMA_ALPHA = 0.1
+
+
+class Shed(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    def __init__(self, future, endpoint):
+        self.future = future
+        self.endpoint = endpoint  # its expected service time counts towards the wait of those behind it
+        self.granted = False  # set under the lock when a finishing request hands over its slot
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded FIFO queue in front of it.
+
+    At most max_concurrency requests run at a time and at most max_queue wait for a slot,
+    anything past that is shed at once. A request with a deadline is also shed when the
+    expected queue wait plus its expected service time (running averages of recent
+    requests per endpoint) already exceed it, and when it is still queued once its deadline has
+    passed, so callers hear "no" quickly instead of timing out.
+
+    Waiting happens on the event loop, before the request body is read or a threadpool
+    thread is taken.
+    """
+
+    def __init__(self, max_concurrency=32, max_queue=64, default_deadline_ms=None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_deadline = default_deadline_ms / 1000 if default_deadline_ms else None
+        self.in_flight = 0
+        self.counts = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0}
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self._service = {}  # endpoint -> running mean of seconds from admission to response
+        self._service_all = None
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def expected_service(self, endpoint):
+        return self._service.get(endpoint, self._service_all) or 0.0
+
+    def expected_wait(self):
+        # the waiters ahead and one running request have to finish first, spread over
+        # max_concurrency slots (Little's law), each waiter at its own endpoint's service time
+        if self.in_flight < self.max_concurrency:
+            return 0.0
+        ahead = sum(self.expected_service(waiter.endpoint) for waiter in self._waiters)  # at most max_queue
+        return (ahead + (self._service_all or 0.0)) / self.max_concurrency
+
+    async def acquire(self, endpoint, deadline=None):
+        """
+        Waits for a slot, returns the seconds spent queued.
+
+        deadline is the perf_counter() time by which the response is due, or None.
+
+        Raises:
+            Shed: If the queue is full or the request cannot be answered before its deadline
+        """
+        start = time.perf_counter()
+        with self._lock:
+            if deadline is not None and start + self.expected_wait() + self.expected_service(endpoint) > deadline:
+                self.counts["shed_deadline"] += 1
+                raise Shed("deadline")
+            if self.in_flight < self.max_concurrency and not self._waiters:
+                self.in_flight += 1
+                self.counts["admitted"] += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self.counts["shed_queue_full"] += 1
+                raise Shed("queue_full")
+            waiter = _Waiter(asyncio.get_running_loop().create_future(), endpoint)
+            self._waiters.append(waiter)
+            self.counts["queued"] += 1
+
+        try:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - start - self.expected_service(endpoint), 0)
+            await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as e:
+            # timed out or the client went away, a slot handed over meanwhile is passed on
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                if timed_out:
+                    self.counts["shed_deadline"] += 1
+            if waiter.granted:
+                self.release()
+            if timed_out:
+                raise Shed("deadline")
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.counts["admitted"] += 1
+            self.queue_wait_seconds += waited
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, waited)
+        return waited
+
+    def release(self, endpoint=None, seconds=None):
+        """
+        Frees a slot, handing it straight to the oldest waiter. seconds is how long the
+        request held it, fed into the running service time averages.
+        """
+        with self._lock:
+            if seconds is not None:
+                self._service_all = seconds if self._service_all is None else self._service_all + SERVICE_EWMA_ALPHA * (seconds - self._service_all)
+                previous = self._service.get(endpoint)
+                self._service[endpoint] = seconds if previous is None else previous + SERVICE_EWMA_ALPHA * (seconds - previous)
+            if not self._waiters:
+                self.in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True  # in_flight stays the same, the slot changes hands
+        waiter.future.get_loop().call_soon_threadsafe(_grant, waiter.future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queue_depth": len(self._waiters),
+                **self.counts,
+                "mean_queue_wait_ms": 1000 * self.queue_wait_seconds / self.counts["admitted"] if self.counts["admitted"] else 0.0,
+                "max_queue_wait_ms": 1000 * self.max_queue_wait_seconds,
+                "expected_service_ms": {endpoint: 1000 * seconds for endpoint, seconds in self._service.items()},
+            }
+
+
+def _grant(future):
+    if not future.done():  # a waiter cancelled meanwhile passes the slot on itself
+        future.set_result(None)
+
+
+def parse_deadline_ms(headers):
+    """
+    Returns the X-Deadline-Ms header value in milliseconds, or None when absent
+
+    Raises:
+        ValueError: If the value is not a positive number
+    """
+    for name, value in headers:
+        if name == DEADLINE_HEADER:
+            deadline_ms = float(value)
+            if not deadline_ms > 0:
+                raise ValueError(deadline_ms)
+            return deadline_ms
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    Plain ASGI middleware putting the listed paths behind an AdmissionController.
+
+    Shed requests get SHED_STATUS with Retry-After and X-Shed-Reason (queue_full or
+    deadline) without their body being read.
+    """
+
+    def __init__(self, app, controller, paths, metrics=None):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        arrived = time.perf_counter()
+        endpoint = scope['path']
+        try:
+            deadline_ms = parse_deadline_ms(scope['headers'])
+        except ValueError:
+            response = JSONResponse({"detail": "X-Deadline-Ms must be a positive number of milliseconds"}, status_code=400)
+            return await response(scope, receive, send)
+        deadline = arrived + deadline_ms / 1000 if deadline_ms else None
+        if deadline is None and self.controller.default_deadline is not None:
+            deadline = arrived + self.controller.default_deadline
+
+        try:
+            waited = await self.controller.acquire(endpoint, deadline)
+        except Shed as shed:
+            if self.metrics is not None:
+                self.metrics.shed.labels(endpoint, shed.reason).inc()
+            scope['metrics_endpoint'] = endpoint  # never routed, labelled by its path instead
+            response = JSONResponse(
+                {"detail": f"Request shed ({shed.reason}), retry later or fall back"}, status_code=SHED_STATUS,
+                headers={"Retry-After": "1", "X-Shed-Reason": shed.reason})
+            return await response(scope, receive, send)
+
+        if self.metrics is not None:
+            self.metrics.queue_wait_seconds.labels(endpoint).observe(waited)
+        admitted = time.perf_counter()
+        request_started.set(admitted)  # the 'parse' stage starts here, the queue wait is reported on its own
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(endpoint, time.perf_counter() - admitted)
@@ -0,0 +1,215 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from botocore.exceptions import ClientError
+from src.utils import file_sha256
+
+
+def _file_md5(path, chunk_size=1 << 20):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# unreferenced objects younger than this are kept, a worker may be about to index them
+PRUNE_GRACE_SECONDS = 600
+
+
+def _is_missing(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+class ArtifactStore:
+    """
+    Content-addressed local cache in front of the S3 artifact prefix.
+
+    Files live under <cache_dir>/objects/<sha256>, and index.json maps each S3 key to the
+    ETag and hash it was fetched with. fetch() issues one HEAD per artifact and downloads
+    only the keys whose ETag changed, all concurrently. Every download is checked against the
+    sha256 stored in the object metadata on upload (or the MD5 ETag of single-part uploads)
+    before it enters the cache, so a model is never activated from a corrupt file.
+    """
+
+    def __init__(self, s3_client, bucket, prefix='artifacts/', cache_dir='/tmp/artifact-cache', max_workers=4):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.stats = {'hits': 0, 'downloads': 0, 'bytes_downloaded': 0, 'uploads': 0, 'uploads_skipped': 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self._index = self._read_index()
+
+    @contextmanager
+    def _cache_lock(self):
+        # exclusive lock shared by every worker using this cache directory, threads included
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, 'index.json')
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self):
+        # other processes share the cache directory, merge with what they wrote
+        index = self._read_index()
+        index.update(self._index)
+        self._index = index
+        tmp_path = f"{self._index_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path())
+
+    def object_path(self, sha256):
+        return os.path.join(self.cache_dir, 'objects', sha256)
+
+    def fetch(self, artifacts, optional=()):
+        """
+        Returns {artifact: local path} for all artifacts, None for optional ones missing in S3
+
+        Raises:
+            FileNotFoundError: If a required artifact is missing in S3
+            ValueError: If a downloaded file fails its integrity check
+        """
+        names = list(artifacts) + list(optional)
+        # downloads and the index update happen under the cache lock, so a concurrent prune
+        # never sees an object that is downloaded but not indexed yet
+        with self._cache_lock():
+            with self._lock:
+                self._index = {**self._index, **self._read_index()}  # objects other workers fetched meanwhile
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                paths = dict(zip(names, pool.map(lambda name: self._fetch_one(name, name in optional), names)))
+            with self._lock:
+                self._write_index()
+        return paths
+
+    def _fetch_one(self, artifact, optional):
+        key = f'{self.prefix}{artifact}'
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if _is_missing(e) and optional:
+                return None
+            if _is_missing(e):
+                raise FileNotFoundError(f"s3://{self.bucket}/{key} does not exist") from e
+            raise
+        etag = head['ETag'].strip('"')
+
+        # Unchanged remote object that is still in the cache, nothing to download
+        cached = self._index.get(key)
+        if cached and cached['etag'] == etag and os.path.exists(self.object_path(cached['sha256'])):
+            with self._lock:
+                self.stats['hits'] += 1
+            return self.object_path(cached['sha256'])
+
+        tmp_path = os.path.join(self.cache_dir, f'download-{os.getpid()}-{threading.get_ident()}-{artifact}.tmp')
+        try:
+            self.s3_client.download_file(Bucket=self.bucket, Key=key, Filename=tmp_path)
+            sha256 = file_sha256(tmp_path)
+            expected = head.get('Metadata', {}).get('sha256')
+            if expected is not None and expected != sha256:
+                raise ValueError(f"Integrity check failed for {key}: sha256 {sha256} != {expected}")
+            if expected is None and '-' not in etag and _file_md5(tmp_path) != etag:
+                raise ValueError(f"Integrity check failed for {key}: md5 does not match ETag {etag}")
+
+            size = os.path.getsize(tmp_path)
+            if not os.path.exists(self.object_path(sha256)):
+                os.replace(tmp_path, self.object_path(sha256))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._index[key] = {'etag': etag, 'sha256': sha256, 'size': size}
+            self.stats['downloads'] += 1
+            self.stats['bytes_downloaded'] += size
+        return self.object_path(sha256)
+
+    def upload(self, local_paths):
+        """
+        Uploads {artifact: local path} concurrently, skipping files S3 already has
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            list(pool.map(lambda item: self._upload_one(*item), local_paths.items()))
+
+    def _upload_one(self, artifact, path):
+        key = f'{self.prefix}{artifact}'
+        sha256 = file_sha256(path)
+        try:
+            remote = self.s3_client.head_object(Bucket=self.bucket, Key=key).get('Metadata', {}).get('sha256')
+        except ClientError as e:
+            if not _is_missing(e):
+                raise
+            remote = None
+
+        if remote == sha256:
+            with self._lock:
+                self.stats['uploads_skipped'] += 1
+            return
+        self.s3_client.upload_file(Filename=path, Bucket=self.bucket, Key=key, ExtraArgs={'Metadata': {'sha256': sha256}})
+        with self._lock:
+            self.stats['uploads'] += 1
+
+    def delete(self, artifact):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=f'{self.prefix}{artifact}')
+
+    def materialize(self, paths, output_dir):
+        """
+        Links cached objects into output_dir under their artifact names (for load_artifacts)
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        for artifact, path in paths.items():
+            target = os.path.join(output_dir, artifact)
+            if os.path.exists(target):
+                os.remove(target)
+            if path is None:
+                continue
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+
+    def prune(self, grace_seconds=PRUNE_GRACE_SECONDS):
+        """
+        Removes cached objects no S3 key points to anymore and that are older than
+        grace_seconds, returns the number removed.
+
+        Runs under the cache lock. Processes that still map a removed file keep their
+        mapping until they drop it.
+        """
+        removed = 0
+        objects_dir = os.path.join(self.cache_dir, 'objects')
+        with self._cache_lock():
+            with self._lock:
+                referenced = {entry['sha256'] for entry in {**self._read_index(), **self._index}.values()}
+            cutoff = time.time() - grace_seconds
+            for name in os.listdir(objects_dir):
+                if name in referenced:
+                    continue
+                path = os.path.join(objects_dir, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # removed by a worker sharing the cache without the lock
+        return removed
@@ -0,0 +1,181 @@
+# Offline batch scoring of a historical file with the production artifacts
+#   python -m src.batch_score
+# streams SCORE_INPUT in chunks of SCORE_CHUNK_ROWS rows across SCORE_WORKERS processes and appends
+# row,fraud_probability,prediction to SCORE_OUTPUT. An interrupted run picks up after the last chunk
+# written, recorded in <SCORE_OUTPUT>.progress.json.
+
+import collections
+import contextlib
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.data import open_columnar_cache
+from src.utils import load_artifacts, artifact_path, file_sha256
+
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+input_path = os.getenv('SCORE_INPUT', os.getenv('DATA_PATH', './data/creditcard.csv'))
+output_path = os.getenv('SCORE_OUTPUT', './data/scores.csv')
+chunk_rows = int(os.getenv('SCORE_CHUNK_ROWS', '100000'))
+score_workers = int(os.getenv('SCORE_WORKERS', '0')) or None  # defaults to all cores
+score_source = os.getenv('SCORE_SOURCE', 'csv')  # 'csv' streams the file, 'cache' slices the columnar cache
+data_cache_dir = os.getenv('DATA_CACHE_DIR')  # defaults to a cache/ folder next to the input
+
+OUTPUT_HEADER = b"row,fraud_probability,prediction\n"
+
+_artifacts = None  # (model, preprocessor, threshold) loaded once per worker process
+
+
+def _load_worker(input_dir, suffix):
+    global _artifacts
+    model, preprocessor, threshold, _ = load_artifacts(input_dir, suffix)
+    _artifacts = (model, preprocessor, threshold)
+
+
+def _score_chunk(index, first_row, X):
+    # runs in a worker, formatting the CSV there keeps the parent down to writing bytes
+    model, preprocessor, threshold = _artifacts
+    y_proba = model.predict_proba(preprocessor.transform(X))[:, 1]
+    scores = pd.DataFrame({
+        'row': np.arange(first_row, first_row + len(X)),
+        'fraud_probability': y_proba,
+        'prediction': (y_proba >= threshold).astype(np.int8),
+    })
+    return index, len(X), scores.to_csv(header=False, index=False).encode()
+
+
+def iter_chunks(filepath, chunk_rows, source='csv', cache_dir=None, start_chunk=0):
+    """
+    Yields (chunk index, first row, features DataFrame) from start_chunk on, reading one
+    chunk at a time. A 'Class' column, when present, is dropped.
+    """
+    if source == 'cache':
+        # full float64 columns, scores must match the CSV path exactly
+        meta, columns = open_columnar_cache(filepath, cache_dir or os.path.join(os.path.dirname(filepath), 'cache'), downcast=False)
+        features = [column for column in meta['columns'] if column != 'Class']
+        for index in range(start_chunk, -(-meta['n_rows'] // chunk_rows)):
+            first_row = index * chunk_rows
+            yield index, first_row, pd.DataFrame({column: columns[column][first_row:first_row + chunk_rows] for column in features})
+    elif source == 'csv':
+        with open(filepath, newline='') as f:
+            header = next(csv.reader([f.readline()]))
+            # lines of finished chunks are skipped without parsing them
+            collections.deque(itertools.islice(f, start_chunk * chunk_rows), maxlen=0)
+            for offset, chunk in enumerate(pd.read_csv(f, header=None, names=header, chunksize=chunk_rows)):
+                if chunk.empty:  # nothing left past the finished chunks
+                    break
+                index = start_chunk + offset
+                yield index, index * chunk_rows, chunk.drop(columns=['Class'], errors='ignore')
+    else:
+        raise ValueError(f"Unknown source {source!r}, expected 'csv' or 'cache'")
+
+
+def _in_order(pool, chunks, max_in_flight):
+    # keeps at most max_in_flight chunks queued or scoring, yields results in chunk order
+    in_flight = collections.deque()
+    for chunk in chunks:
+        in_flight.append(pool.submit(_score_chunk, *chunk))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def _save_progress(path, progress):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def score_file(filepath=input_path, output=output_path, chunk_rows=chunk_rows, n_workers=score_workers,
+               source=score_source, cache_dir=data_cache_dir, input_dir=artifacts_path, suffix='', max_chunks=None):
+    """
+    Scores every row of filepath with the artifacts in input_dir, returns a run summary.
+
+    Chunks are scored by n_workers processes (in this process when 1) and appended to
+    output in input order. At most 2 * n_workers chunks are held in memory. After each
+    chunk the output is synced and the progress file updated, so a rerun continues
+    from the last complete chunk. max_chunks stops the run early.
+
+    Raises:
+        ValueError: If the progress file belongs to another input, model or chunk size
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    progress_path = f"{output}.progress.json"
+    run = {
+        'input': os.path.abspath(filepath),
+        'input_sha256': file_sha256(filepath),
+        'model_sha256': file_sha256(artifact_path(input_dir, "model.joblib", suffix)),
+        'chunk_rows': chunk_rows,
+        'source': source,
+    }
+
+    progress = None
+    if os.path.exists(progress_path) and os.path.exists(output):
+        with open(progress_path) as f:
+            progress = json.load(f)
+        if progress['run'] != run:
+            raise ValueError(f"{progress_path} belongs to another input, model or chunk size, remove it and {output} to start over")
+    if progress is None:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(OUTPUT_HEADER)
+        progress = {'run': run, 'chunks_done': 0, 'rows_done': 0, 'output_bytes': len(OUTPUT_HEADER)}
+        _save_progress(progress_path, progress)
+    resumed_from = progress['chunks_done']
+    if resumed_from:
+        print(f"Resuming {output} after chunk {resumed_from - 1} ({progress['rows_done']} rows already scored)")
+
+    chunks = iter_chunks(filepath, chunk_rows, source=source, cache_dir=cache_dir, start_chunk=resumed_from)
+    if max_chunks is not None:
+        chunks = itertools.islice(chunks, max_chunks)
+
+    start = time.perf_counter()
+    rows = 0
+    with contextlib.ExitStack() as stack:
+        if n_workers > 1:
+            pool = stack.enter_context(ProcessPoolExecutor(
+                max_workers=n_workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_load_worker, initargs=(input_dir, suffix)))
+            results = _in_order(pool, chunks, max_in_flight=2 * n_workers)
+        else:
+            _load_worker(input_dir, suffix)
+            results = (_score_chunk(*chunk) for chunk in chunks)
+
+        with open(output, 'r+b') as out:
+            out.truncate(progress['output_bytes'])  # drop whatever an interrupted run wrote past its last chunk
+            out.seek(progress['output_bytes'])
+            for index, n_rows, data in results:
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+                rows += n_rows
+                progress.update(chunks_done=index + 1, rows_done=progress['rows_done'] + n_rows, output_bytes=out.tell())
+                _save_progress(progress_path, progress)
+                elapsed = time.perf_counter() - start
+                print(f"Chunk {index}: {progress['rows_done']} rows scored, {rows / elapsed:,.0f} rows/s")
+
+    seconds = time.perf_counter() - start
+    summary = {
+        'output': output,
+        'rows': rows,
+        'rows_total': progress['rows_done'],
+        'chunks': progress['chunks_done'] - resumed_from,
+        'resumed_from_chunk': resumed_from,
+        'workers': n_workers,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0.0,
+    }
+    print(f"Scored {rows} rows in {seconds:.2f}s ({summary['rows_per_second']:,.0f} rows/s, {n_workers} workers), "
+          f"{summary['rows_total']} rows in {output}")
+    return summary
+
+
+if __name__ == "__main__":
+    score_file()
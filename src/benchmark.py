@@ -0,0 +1,198 @@
+# Performance benchmarks for serving and training, run offline against the CI data and committed artifacts
+#   python -m src.benchmark
+# writes BENCHMARK_OUTPUT and compares it against BENCHMARK_BASELINE, exits 1 on a regression
+
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import sklearn
+from src.data import load_data
+from src.utils import load_artifacts
+from src.evaluate import find_optimal_threshold
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+output_path = os.getenv('BENCHMARK_OUTPUT', 'benchmarks/results.json')
+baseline_path = os.getenv('BENCHMARK_BASELINE', 'benchmarks/baseline.json')
+DEFAULT_TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', '0.25'))  # allowed relative slowdown before a result counts as a regression
+CONCURRENCY_LEVELS = [1, 4, 16]
+
+# value compared against the baseline per kind of result, and whether higher is better
+PRIMARY_METRICS = {
+    'latency': ('p95_ms', False),  # p99 of a few hundred requests is too noisy to gate on
+    'throughput': ('throughput_rps', True),
+    'timing': ('median_ms', False),
+}
+
+
+def time_call(fn, repeats=20, warmup=2):
+    """
+    Returns dict with median/min/mean milliseconds of fn() over repeats calls
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'kind': 'timing', 'median_ms': float(np.median(samples)), 'min_ms': float(np.min(samples)),
+            'mean_ms': float(np.mean(samples)), 'repeats': repeats}
+
+
+async def _predict_load(client, rows, n_requests, concurrency):
+    # n_requests /predict calls with at most `concurrency` in flight, returns per-request latencies
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/predict", json={"features": rows[i % len(rows)]})
+            latencies.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    return latencies, time.perf_counter() - start
+
+
+def bench_predict_endpoint(rows, n_requests=200, concurrency_levels=CONCURRENCY_LEVELS):
+    """
+    Returns latency percentiles and throughput of /predict per concurrency level, through
+    an in-process ASGI client (no network, no server process)
+    """
+    import httpx
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts(artifacts_path))
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_module.app)
+        results = {}
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            await _predict_load(client, rows, min(n_requests, 20), 1)  # warm up
+            for concurrency in concurrency_levels:
+                latencies, seconds = await _predict_load(client, rows, n_requests, concurrency)
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                results[f'predict_c{concurrency}'] = {
+                    'kind': 'latency', 'concurrency': concurrency, 'requests': n_requests,
+                    'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'mean_ms': float(np.mean(latencies)),
+                }
+                results[f'predict_c{concurrency}_throughput'] = {
+                    'kind': 'throughput', 'concurrency': concurrency, 'requests': n_requests,
+                    'throughput_rps': n_requests / seconds,
+                }
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_components(filepath=data_path, repeats=20):
+    """
+    Returns timings of the training and serving building blocks
+    """
+    results = {}
+    X, y = load_data(filepath)
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    row, batch = X.iloc[:1], X.iloc[:1000]
+    batch_scaled = preprocessor.transform(batch)
+    y_proba = model.predict_proba(preprocessor.transform(X))[:, 1]
+
+    results['transform_1'] = time_call(lambda: preprocessor.transform(row), repeats)
+    results['transform_1000'] = time_call(lambda: preprocessor.transform(batch), repeats)
+    results['predict_proba_1'] = time_call(lambda: model.predict_proba(batch_scaled[:1]), repeats)
+    results['predict_proba_1000'] = time_call(lambda: model.predict_proba(batch_scaled), repeats)
+    results['find_optimal_threshold'] = time_call(lambda: find_optimal_threshold(y, y_proba), repeats)
+    results['load_artifacts'] = time_call(lambda: load_artifacts(artifacts_path), max(3, repeats // 4))
+    results['load_data_csv'] = time_call(lambda: load_data(filepath), max(3, repeats // 4), warmup=1)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results['load_data_cache'] = time_call(lambda: load_data(filepath, cache_dir=cache_dir), max(3, repeats // 4), warmup=1)
+    return results
+
+
+def run_benchmarks(filepath=data_path, n_requests=200, concurrency_levels=CONCURRENCY_LEVELS, repeats=20):
+    """
+    Runs every benchmark and returns {'meta': ..., 'results': {name: result}}
+    """
+    rows = pd.read_csv(filepath).drop('Class', axis=1).iloc[:100].values.tolist()
+    results = bench_components(filepath, repeats)
+    results.update(bench_predict_endpoint(rows, n_requests, concurrency_levels))
+    return {
+        'meta': {
+            'created_at': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'data_path': filepath,
+            'artifacts_path': artifacts_path,
+        },
+        'results': results,
+    }
+
+
+def compare_to_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE, tolerances=None):
+    """
+    Returns one row per benchmark present in both runs with its primary metric, relative
+    change and whether it regressed beyond its tolerance.
+
+    Tolerances are relative (0.25 = 25% slower, or 25% less throughput, is still fine).
+    Per-benchmark values come from tolerances, then the baseline's own 'tolerances' entry,
+    then the default.
+    """
+    tolerances = {**baseline.get('tolerances', {}), **(tolerances or {})}
+    rows = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        metric, higher_is_better = PRIMARY_METRICS[result['kind']]
+        old, new = baseline['results'][name][metric], result[metric]
+        change = (new - old) / old if old else 0.0
+        allowed = tolerances.get(name, tolerance)
+        regressed = change < -allowed if higher_is_better else change > allowed
+        rows.append({'name': name, 'metric': metric, 'baseline': old, 'current': new,
+                     'change': change, 'tolerance': allowed, 'regressed': regressed})
+    return rows
+
+
+def main(output=output_path, baseline=baseline_path, update_baseline=False):
+    current = run_benchmarks()
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"Wrote benchmark results to {output}")
+
+    if update_baseline or not os.path.exists(baseline):
+        tolerances = {}
+        if os.path.exists(baseline):
+            with open(baseline) as f:
+                tolerances = json.load(f).get('tolerances', {})  # keep hand-tuned tolerances
+        with open(baseline, 'w') as f:
+            json.dump({**current, 'tolerances': tolerances}, f, indent=2)
+        print(f"Stored results as the new baseline {baseline}")
+        return 0
+
+    with open(baseline) as f:
+        comparison = compare_to_baseline(current, json.load(f))
+    for row in comparison:
+        status = "REGRESSED" if row['regressed'] else "ok"
+        print(f"{row['name']:<28} {row['metric']:<15} {row['baseline']:>10.3f} -> {row['current']:>10.3f} "
+              f"({row['change']:+.1%}, tolerance {row['tolerance']:.0%}) {status}")
+    regressions = [row['name'] for row in comparison if row['regressed']]
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(update_baseline=os.getenv('BENCHMARK_UPDATE_BASELINE', 'false').lower() == 'true'))
@@ -0,0 +1,226 @@
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from src.preprocessing import FraudPreprocessor
+from src.tree_engine import FlatForest
+
+# Single-file artifact bundle:
+#   MAGIC | uint64 header length | JSON manifest | padding | payload
+# The payload holds raw arrays (forest node tables, scaler statistics) at 64-byte aligned
+# offsets, so loading is a header parse plus one read-only mmap. Worker processes that map
+# the same file share its pages through the OS page cache instead of each unpickling a copy.
+
+MAGIC = b"FRAUDBND"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+FOREST_ARRAYS = ["feature", "threshold", "left", "right", "value", "roots", "is_leaf"]
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_bundle(model, preprocessor, threshold, best_f1, output_dir='artifacts', suffix='', fused_model=None, include_sklearn=False):
+    """
+    Writes model{suffix}.bundle and returns its manifest.
+
+    The fused model is served when given. Random forests are stored as FlatForest node
+    arrays only, so loading maps them instead of unpickling; include_sklearn also stores
+    the pickled sklearn forest (faster on large batches, but every process unpickles its
+    own copy). Anything else is stored as a pickled blob inside the bundle.
+    """
+    served = fused_model if fused_model is not None else model
+    scaler = preprocessor.scaler
+
+    arrays = {
+        'scaler_mean': scaler.mean_,
+        'scaler_scale': scaler.scale_,
+        'scaler_var': scaler.var_,
+    }
+    blobs = {}
+    if include_sklearn or not isinstance(served, RandomForestClassifier):
+        buffer = io.BytesIO()
+        joblib.dump(served, buffer)
+        blobs['model'] = buffer.getvalue()
+    if isinstance(served, RandomForestClassifier):
+        forest = FlatForest.from_sklearn(served)
+        for name in FOREST_ARRAYS:
+            arrays[f'forest_{name}'] = getattr(forest, name)
+        model_type, max_depth = 'flat_forest', forest.max_depth
+    else:
+        model_type, max_depth = 'pickle', None
+
+    # Lay out the payload, offsets are relative to the start of the payload
+    entries, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = _align(offset)
+        entries[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+        chunks.append((offset, array.tobytes()))
+        offset += array.nbytes
+    blob_entries = {}
+    for name, data in blobs.items():
+        offset = _align(offset)
+        blob_entries[name] = {'offset': offset, 'length': len(data)}
+        chunks.append((offset, data))
+        offset += len(data)
+
+    payload = bytearray(offset)
+    for start, data in chunks:
+        payload[start:start + len(data)] = data
+    checksum = hashlib.sha256(payload).hexdigest()
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': checksum[:12],
+        'checksum': checksum,
+        'created_at': time.time(),
+        'model_type': model_type,
+        'fused': fused_model is not None,
+        'max_depth': max_depth,
+        'threshold': float(threshold),
+        'best_f1': float(best_f1),
+        'scaler': {
+            'n_samples_seen': int(np.max(scaler.n_samples_seen_)),
+            'feature_names': list(getattr(scaler, 'feature_names_in_', [])),
+        },
+        'arrays': entries,
+        'blobs': blob_entries,
+        'payload_size': len(payload),
+    }
+    # The payload starts after the header, which itself records where the payload starts
+    manifest['payload_offset'] = 0
+    while True:
+        header = json.dumps(manifest).encode()
+        payload_offset = _align(len(MAGIC) + 8 + len(header))
+        if payload_offset == manifest['payload_offset']:
+            break
+        manifest['payload_offset'] = payload_offset
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"model{suffix}.bundle")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\0' * (manifest['payload_offset'] - f.tell()))
+        f.write(payload)
+    os.replace(tmp_path, path)  # readers never see a half-written bundle
+
+    return manifest
+
+
+def load_blob(path, manifest, name):
+    """
+    Returns the object pickled in blob name, or None when the bundle has no such blob
+    (forest bundles are written without the sklearn forest unless include_sklearn is set)
+    """
+    entry = manifest['blobs'].get(name)
+    if entry is None:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(manifest['payload_offset'] + entry['offset'])
+        return joblib.load(io.BytesIO(f.read(entry['length'])))
+
+
+class LazyBlob:
+    """
+    Stands in for a pickled model and unpickles it from the bundle on the first
+    predict_proba call, so processes that never need it never pay for it
+    """
+
+    def __init__(self, path, manifest, name='model'):
+        self.path = path
+        self.manifest = manifest
+        self.name = name
+        self.model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def predict_proba(self, X):
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self.model = load_blob(self.path, self.manifest, self.name)
+        return self.model.predict_proba(X)
+
+
+def read_manifest(path):
+    """
+    Returns the bundle manifest without touching the payload
+
+    Raises:
+        ValueError: If the file is not a bundle or has an unsupported format version
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        (header_length,) = struct.unpack('<Q', f.read(8))
+        manifest = json.loads(f.read(header_length))
+
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported bundle format version {manifest['format_version']}")
+    return manifest
+
+
+def verify_bundle(path):
+    """
+    Raises ValueError if the payload does not match the manifest checksum
+    """
+    manifest = read_manifest(path)
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    payload = data[manifest['payload_offset']:manifest['payload_offset'] + manifest['payload_size']]
+    if len(payload) != manifest['payload_size'] or hashlib.sha256(payload).hexdigest() != manifest['checksum']:
+        raise ValueError(f"Checksum mismatch for bundle {path}")
+    return manifest
+
+
+def load_bundle(path, verify=False):
+    """
+    Memory-maps a bundle and returns (model, preprocessor, threshold, best_f1, manifest).
+
+    Random forests come back as a FlatForest whose arrays are read-only views into the
+    mapped file. Verification reads the whole payload, so it is opt-in.
+    """
+    manifest = verify_bundle(path) if verify else read_manifest(path)
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    payload_offset = manifest['payload_offset']
+
+    def array(name):
+        entry = manifest['arrays'][name]
+        dtype = np.dtype(entry['dtype'])
+        start = payload_offset + entry['offset']
+        n_bytes = dtype.itemsize * int(np.prod(entry['shape']))
+        return data[start:start + n_bytes].view(dtype).reshape(entry['shape'])
+
+    if manifest['model_type'] == 'flat_forest':
+        model = FlatForest(**{name: array(f'forest_{name}') for name in FOREST_ARRAYS}, max_depth=manifest['max_depth'])
+    else:
+        model = load_blob(path, manifest, 'model')
+
+    # Rebuild a fitted scaler around the mapped statistics
+    scaler = StandardScaler()
+    scaler.mean_ = array('scaler_mean')
+    scaler.scale_ = array('scaler_scale')
+    scaler.var_ = array('scaler_var')
+    scaler.n_features_in_ = len(scaler.mean_)
+    scaler.n_samples_seen_ = manifest['scaler']['n_samples_seen']
+    if manifest['scaler']['feature_names']:
+        scaler.feature_names_in_ = np.array(manifest['scaler']['feature_names'], dtype=object)
+    preprocessor = FraudPreprocessor()
+    preprocessor.scaler = scaler
+
+    return model, preprocessor, manifest['threshold'], manifest['best_f1'], manifest
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+from src.models import train_logistic_regression, train_random_forest, train_xgboost
+from src.evaluate import threshold_sweep
+from src.model_budget import profile_model, within_budget
+
+TRAINERS = {
+    'logistic_regression': train_logistic_regression,
+    'random_forest': train_random_forest,
+    'xgboost': train_xgboost,
+}
+
+DEFAULT_CANDIDATES = [
+    {'family': 'random_forest', 'params': {'n_estimators': 100}},
+    {'family': 'random_forest', 'params': {'n_estimators': 300}},
+    {'family': 'xgboost', 'params': {'n_estimators': 100}},
+    {'family': 'xgboost', 'params': {'n_estimators': 300}},
+    {'family': 'logistic_regression', 'params': {}},
+]
+
+
+def candidate_name(candidate):
+    params = ', '.join(f"{key}={value}" for key, value in sorted(candidate['params'].items()))
+    return f"{candidate['family']}({params})"
+
+
+def _share_arrays(arrays, directory):
+    # workers memory-map these files, the pages are shared instead of pickled into every process
+    paths = {}
+    for name, array in arrays.items():
+        paths[name] = os.path.join(directory, f"{name}.npy")
+        np.save(paths[name], np.ascontiguousarray(array))
+    return paths
+
+
+def _train_candidate(candidate, data_paths, output_path, n_jobs, random_state, budget):
+    # runs in a fresh worker process, so ru_maxrss below is this candidate's peak
+    start = time.perf_counter()
+    data = {name: np.load(path, mmap_mode='r') for name, path in data_paths.items()}
+
+    trainer = TRAINERS[candidate['family']]
+    params = dict(candidate['params'], random_state=random_state)
+    if candidate['family'] != 'logistic_regression':
+        params['n_jobs'] = n_jobs
+    model = trainer(data['X_train'], data['y_train'], **params)
+    fit_seconds = time.perf_counter() - start
+
+    y_pred_proba = model.predict_proba(data['X_val'])[:, 1]
+    sweep = threshold_sweep(data['y_val'], y_pred_proba)
+    best_threshold, best_f1 = sweep['best_threshold'], sweep['best_fbeta']
+    joblib.dump(model, output_path)
+    profile = profile_model(model, data['X_val'])
+
+    return {
+        'name': candidate_name(candidate),
+        'family': candidate['family'],
+        'params': candidate['params'],
+        'val_threshold': float(best_threshold),
+        'val_f1': float(best_f1),
+        **profile,
+        'within_budget': within_budget(profile, **budget),
+        'fit_seconds': fit_seconds,
+        'wall_seconds': time.perf_counter() - start,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # KiB on Linux
+        'model_path': output_path,
+    }
+
+
+def run_candidate_search(X_train, y_train, candidates=None, n_cores=None, random_state=42, budget=None, validation_size=0.2):
+    """
+    Trains every candidate on a process pool and returns (best_model, results).
+
+    Candidates train on X_train minus a stratified validation_size share and are scored
+    on that share, the test split stays untouched for the final threshold and F1. The
+    winner is then refitted on all of X_train.
+
+    n_cores is the total core budget: min(n_cores, len(candidates)) candidates train at
+    once and each gets an equal share of the cores as n_jobs. Every candidate is profiled
+    for latency and size (see model_budget.profile_model). Results are sorted with the
+    candidates inside budget (max_single_row_ms / max_batch_ms / max_size_bytes) first,
+    then by validation F1 at the optimal threshold, ties in candidate order.
+    """
+    candidates = candidates or DEFAULT_CANDIDATES
+    budget = budget or {}
+    n_cores = n_cores or os.cpu_count() or 1
+    n_workers = max(1, min(n_cores, len(candidates)))
+    n_jobs = max(1, n_cores // n_workers)
+
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=validation_size, random_state=random_state, stratify=y_train)
+
+    work_dir = tempfile.mkdtemp(prefix='candidate-search-')
+    try:
+        data_paths = _share_arrays({
+            'X_train': X_fit, 'y_train': y_fit,
+            'X_val': X_val, 'y_val': y_val,
+        }, work_dir)
+
+        start = time.perf_counter()
+        results = []
+        # one process per candidate, so memory from a big model is returned before the next starts
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context, max_tasks_per_child=1) as pool:
+            futures = {
+                pool.submit(_train_candidate, candidate, data_paths, os.path.join(work_dir, f"candidate-{i}.joblib"), n_jobs, random_state, budget): i
+                for i, candidate in enumerate(candidates)
+            }
+            for future in as_completed(futures):
+                result = dict(future.result(), index=futures[future])
+                print(f"Candidate {result['name']}: validation F1 {result['val_f1']:.4f} at threshold {result['val_threshold']:.2f}, "
+                      f"{result['single_row_ms']:.2f} ms/row, {result['size_bytes'] / 1e6:.1f} MB, "
+                      f"{result['wall_seconds']:.1f}s wall, {result['peak_rss_mb']:.0f} MB peak")
+                results.append(result)
+
+        # latencies are measured while other candidates train, good enough to rank, not to promise
+        results.sort(key=lambda result: (not result['within_budget'], -result['val_f1'], result['index']))  # ties go to the earlier candidate
+        print(f"Searched {len(candidates)} candidates in {time.perf_counter() - start:.1f}s "
+              f"({n_workers} workers x {n_jobs} threads), best: {results[0]['name']}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for result in results:
+        del result['model_path'], result['index']
+
+    # refit the winner on the whole train split, validation rows included
+    best = results[0]
+    params = dict(best['params'], random_state=random_state)
+    if best['family'] != 'logistic_regression':
+        params['n_jobs'] = n_cores
+    best_model = TRAINERS[best['family']](X_train, y_train, **params)
+    return best_model, results
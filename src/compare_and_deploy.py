@@ -4,61 +4,166 @@
 # Production model is model.joblib
 # Training saves new model as model-new.joblib
 # Load both
-# Compare both
-# If new is better: delete model.joblib, rename model-new.joblib → model.joblib, call /reload
-# If new is worse: delete model-new.joblib, keep model.joblib
+# Score both on the same holdout, bootstrap confidence intervals for the F1 difference
+# If new is significantly better: delete model.joblib, rename model-new.joblib → model.joblib, call /reload
+# Otherwise: delete model-new.joblib, keep model.joblib
 
-from src.utils import load_artifacts
+from src.utils import artifact_path, load_holdout, ARTIFACTS, OPTIONAL_ARTIFACTS
+from src.bundle import verify_bundle
+from src.artifact_store import ArtifactStore
+from src.model_handle import ModelHandle
+from src.data import load_data, load_rows
+from src.preprocessing import split_data
+from src.evaluate import bootstrap_compare
 import os
 import requests
+import time
 import boto3
 
 artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
 api_url = os.getenv('API_URL')
+data_path = os.getenv('DATA_PATH', './data/creditcard.csv')
+data_cache_dir = os.getenv('DATA_CACHE_DIR')  # defaults to a cache/ folder next to the CSV
+BOOTSTRAP_SAMPLES = int(os.getenv('BOOTSTRAP_SAMPLES', '2000'))
+CONFIDENCE = float(os.getenv('CONFIDENCE', '0.95'))  # new model must win on the lower bound of this interval
 
 S3_BUCKET = os.getenv('S3_BUCKET', 'fraud-mlops-artifacts-bt') # which S3 bucket
 S3_PREFIX = 'artifacts/'  # folder in S3 bucket
+SHADOW_PREFIX = os.getenv('SHADOW_PREFIX', 'shadow/')  # challenger artifacts the API scores in shadow mode
 
-def main():
+def wait_for_reload(version, timeout=120, poll_interval=2):
+    # /reload loads the new version in the background, poll until it is active or failed
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = requests.get(f"{api_url}/reload/{version}").json()
+        if status.get("status") != "loading":
+            return status
+        time.sleep(poll_interval)
+    return {"version": version, "status": "timed out"}
+
+
+def compare_on_holdout(filepath=data_path, test_size=0.2, random_state=42, cache_dir=data_cache_dir):
+    """
+    Scores the deployed and the new model on the same holdout split, one batched pass
+    each, and returns the bootstrap comparison (see evaluate.bootstrap_compare)
+    
+    The holdout is the new model's saved test rows, which hold the deployed model's own
+    holdout (see train_pipeline.extend_split), so neither model trained on them. Artifact
+    sets without a saved holdout fall back to recomputing the split.
+    """
+    start = time.perf_counter()
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), 'cache')
+    rows = load_holdout(artifacts_path, suffix='-new')
+    if rows is not None:
+        X_test, y_test = load_rows(filepath, cache_dir, rows)
+    else:
+        print("No holdout saved with the new model, recomputing the training split")
+        X, y = load_data(filepath, cache_dir=cache_dir)
+        _, X_test, _, y_test = split_data(X, y, test_size=test_size, random_state=random_state) # same split as training
+    X_test = X_test.to_numpy()
+    
+    decisions = []
+    for suffix in ['', '-new']:
+        handle = ModelHandle.from_artifacts(artifacts_path, suffix=suffix)
+        decisions.append(handle.score(X_test) >= handle.threshold) # each model at its own threshold
+    
+    comparison = bootstrap_compare(y_test, decisions[0], decisions[1], n_bootstrap=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE, random_state=random_state)
+    comparison['seconds'] = time.perf_counter() - start
+    return comparison
+
+
+def main(filepath=data_path):
+    # returns True when the new model was deployed, False when the old one was kept
     
     if os.path.exists(os.path.join(artifacts_path, f"model-new.joblib")):    # if articles exist
         
-        # load old and new models
-        model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
-        model_new, preprocessor_new, threshold_new, best_f1_new = load_artifacts(artifacts_path, suffix='-new')
+        if not os.path.exists(filepath):
+            print(f"Holdout data {filepath} not found, cannot compare models. Keeping old model.")
+            return False
         
-        if best_f1_new > best_f1:  # new model is better, replace old with new
+        comparison = compare_on_holdout(filepath)
+        old, new, difference = comparison['champion']['f1'], comparison['challenger']['f1'], comparison['difference']['f1']
+        print(f"Holdout comparison on {comparison['n_rows']} rows in {comparison['seconds']:.2f}s: "
+              f"old F1 {old['estimate']:.4f} [{old['low']:.4f}, {old['high']:.4f}], "
+              f"new F1 {new['estimate']:.4f} [{new['low']:.4f}, {new['high']:.4f}], "
+              f"difference {difference['estimate']:+.4f} [{difference['low']:+.4f}, {difference['high']:+.4f}]")
+        best_f1, best_f1_new = old['estimate'], new['estimate']
+        
+        if difference['low'] > 0:  # new model is significantly better, replace old with new
+            
+            # never promote a corrupted bundle
+            if os.path.exists(artifact_path(artifacts_path, "model.bundle", suffix='-new')):
+                verify_bundle(artifact_path(artifacts_path, "model.bundle", suffix='-new'))
             
-            for artifact in ["model", "preprocessor", "threshold", "best_f1"]:
-                os.remove(os.path.join(artifacts_path, f"{artifact}.joblib"))
-                os.rename(os.path.join(artifacts_path, f"{artifact}-new.joblib"), os.path.join(artifacts_path, f"{artifact}.joblib"))
-            print(f"New model F1: {best_f1_new} is better than old model F1: {best_f1}. Deploying new model.")
+            for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+                # optional artifacts may be missing on either side, never leave a stale one behind
+                if os.path.exists(artifact_path(artifacts_path, artifact)):
+                    os.remove(artifact_path(artifacts_path, artifact))
+                if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+                    os.rename(artifact_path(artifacts_path, artifact, suffix='-new'), artifact_path(artifacts_path, artifact))
+            print(f"New model F1: {best_f1_new} is significantly better than old model F1: {best_f1}. Deploying new model.")
             
-            # upload artifacts to S3
-            s3_client = boto3.client('s3')
-            for artifact in ["model", "preprocessor", "threshold", "best_f1"]:
-                s3_client.upload_file(
-                    Filename=os.path.join(artifacts_path, f'{artifact}.joblib'),  # Local file path
-                    Bucket=S3_BUCKET,                                              # S3 bucket
-                    Key=f'{S3_PREFIX}{artifact}.joblib'                           # Path in S3
-                )
+            # upload artifacts to S3, concurrently and only those whose content changed
+            store = ArtifactStore(boto3.client('s3'), S3_BUCKET, S3_PREFIX)
+            store.upload({
+                artifact: artifact_path(artifacts_path, artifact)
+                for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS
+                if os.path.exists(artifact_path(artifacts_path, artifact))
+            })
+            for artifact in OPTIONAL_ARTIFACTS:
+                if not os.path.exists(artifact_path(artifacts_path, artifact)):
+                    store.delete(artifact)  # don't serve an old fused model or bundle with the new one
+            print(f"Artifact upload stats: {store.stats}")
             
             # notify API to reload model
             if api_url:
                 try:
                     response = requests.post(f"{api_url}/reload") # Notify inference API to reload model only in Docker mode
                     print(f"Model reload triggered: {response.json()}")
+                    print(f"Model reload finished: {wait_for_reload(response.json()['version'])}")
                 except Exception as e:
                     print(f"Could not notify API: {e}")  
+            return True
         
         else:
-            for artifact in ["model-new", "preprocessor-new", "threshold-new", "best_f1-new"]:
-                os.remove(os.path.join(artifacts_path, f"{artifact}.joblib"))
-            print(f"Old model F1: {best_f1} is better than new model F1: {best_f1_new}. Keeping old model.")
+            for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+                if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+                    os.remove(artifact_path(artifacts_path, artifact, suffix='-new'))
+            print(f"New model F1: {best_f1_new} is not significantly better than old model F1: {best_f1} "
+                  f"at {CONFIDENCE:.0%} confidence. Keeping old model.")
             
     else:     # if articles don't exist, exit gracefully
         print("Artifacts couldn't be loaded")
+    return False
     
 
+def shadow():
+    # publish the -new artifacts as the API's shadow challenger without promoting them
+    if not os.path.exists(os.path.join(artifacts_path, f"model-new.joblib")):
+        print("Artifacts couldn't be loaded")
+        return
+    
+    store = ArtifactStore(boto3.client('s3'), S3_BUCKET, SHADOW_PREFIX)
+    store.upload({
+        artifact: artifact_path(artifacts_path, artifact, suffix='-new')
+        for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS
+        if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new'))
+    })
+    for artifact in OPTIONAL_ARTIFACTS:
+        if not os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+            store.delete(artifact)
+    print(f"Shadow artifact upload stats: {store.stats}")
+    
+    if api_url:
+        try:
+            response = requests.post(f"{api_url}/shadow/reload")
+            print(f"Shadow model reload triggered: {response.json()}")
+        except Exception as e:
+            print(f"Could not notify API: {e}")
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if os.getenv('DEPLOY_MODE', 'compare') == 'shadow':
+        shadow()
+    else:
+        main()
\ No newline at end of file
@@ -1,7 +1,9 @@
 import pandas as pd
+from src.data import load_data
 
-# Load full dataset
-df_full = pd.read_csv('./data/creditcard.csv')
+# Load full dataset, through the columnar cache but at full precision since we write it back out as CSV
+X_full, y_full = load_data('./data/creditcard.csv', cache_dir='./data/cache', downcast=False)
+df_full = X_full.assign(Class=y_full)
 
 # Use ALL fraud cases (492) and proportional legit cases
 fraud = df_full[df_full['Class'] == 1]  # All 492 fraud cases
@@ -1,28 +1,212 @@
+import json
+import os
+import glob
+import shutil
+import tempfile
+import time
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Optional, Tuple
+from src.utils import file_sha256
 
-def load_data(filepath: str) -> Tuple[pd.DataFrame, pd.Series]:
+CACHE_FORMAT_VERSION = 1
+FLOAT32_ATOL = 1e-5  # max absolute round-trip error for a float64 column to be stored as float32
+STALE_BUILD_SECONDS = 3600  # an unfinished cache version older than this is a crashed build
+WATERMARK_COLUMN = 'Time'  # seconds since the first transaction, orders rows for incremental training
+
+
+def _validate(df, allow_empty=False):
+    if df.empty and not allow_empty:
+        raise ValueError("Dataset is empty")
+
+    if 'Class' not in df.columns:
+        raise ValueError("Dataset missing 'Class' column")
+
+
+def load_data(filepath: str, cache_dir: Optional[str] = None, downcast: bool = True,
+              since: Optional[float] = None, watermark_column: str = WATERMARK_COLUMN) -> Tuple[pd.DataFrame, pd.Series]:
     """
     Load fraud detection dataset and split into features and target.
-    
+
     Args:
         filepath: Path to CSV file containing fraud data
-        
+        cache_dir: If set, read from (and build on first use) a columnar cache of the CSV
+        downcast: Store float columns as float32 in the cache where that is safe
+        since: If set, only rows whose watermark column is greater than this (may be empty)
+        watermark_column: Column that orders transactions in time
+
     Returns:
         Tuple of (X, y) where X is features dataframe and y is target series
-        
+
     Raises:
         ValueError: If Class column is missing or dataframe is empty
     """
-    df = pd.read_csv(filepath)
-    
-    if df.empty:
-        raise ValueError("Dataset is empty")
-    
-    if 'Class' not in df.columns:
-        raise ValueError("Dataset missing 'Class' column")
-    
+    if cache_dir is not None:
+        df = load_columnar_cache(filepath, cache_dir, downcast=downcast, since=since, watermark_column=watermark_column)
+    else:
+        start = time.perf_counter()
+        df = pd.read_csv(filepath)
+        print(f"Parsed {filepath} in {time.perf_counter() - start:.2f}s")
+        if since is not None:
+            _validate(df)
+            df = df[df[watermark_column] > since]  # keeps the row positions in the file as index
+
+    _validate(df, allow_empty=since is not None)
+
     X = df.drop(columns=['Class'])
     y = df['Class']
-    
-    return X, y
\ No newline at end of file
+
+    return X, y
+
+
+def iter_csv_chunks(filepath: str, chunk_rows: int, usecols: Optional[list] = None):
+    """
+    Yields the CSV as DataFrames of up to chunk_rows rows, only one chunk is in memory
+
+    Raises:
+        ValueError: If the file has no 'Class' column
+    """
+    for chunk in pd.read_csv(filepath, chunksize=chunk_rows, usecols=usecols):
+        _validate(chunk, allow_empty=True)
+        yield chunk
+
+
+def _cache_path(filepath, cache_dir, downcast):
+    # a symlink to the current version directory, <path>@<random>, swapped atomically on rebuild
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(cache_dir, name if downcast else f"{name}-f64")
+
+
+def _swap_cache(path, version_path):
+    # points path at version_path with one rename, then removes finished versions older than it.
+    # The replaced version stays, a reader that resolved the old link may still be opening its files,
+    # and so do versions another process is still writing (no meta.json yet, or a newer one)
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)  # plain directory from before versioned caches
+    link_path = f"{path}.{os.getpid()}.link"
+    os.symlink(os.path.basename(version_path), link_path)
+    os.replace(link_path, path)
+
+    built = os.path.getmtime(os.path.join(version_path, 'meta.json'))
+    for old in glob.glob(f"{glob.escape(path)}@*"):
+        if os.path.realpath(old) in (os.path.realpath(version_path), previous):
+            continue
+        meta_path = os.path.join(old, 'meta.json')
+        try:
+            finished = os.path.exists(meta_path)
+            stale = os.path.getmtime(meta_path) < built if finished else os.path.getmtime(old) < built - STALE_BUILD_SECONDS  # unfinished: a build that died
+        except OSError:
+            continue  # removed by another process meanwhile
+        if stale:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _column_dtype(values, downcast):
+    if values.dtype.kind in 'iub':
+        # smallest integer type that holds the column (Class fits in int8)
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            if values.min() >= np.iinfo(dtype).min and values.max() <= np.iinfo(dtype).max:
+                return dtype
+    if downcast and values.dtype == np.float64:
+        finite = np.isfinite(values)
+        if np.abs(values[finite].astype(np.float32) - values[finite]).max(initial=0) <= FLOAT32_ATOL:
+            return np.float32
+    return values.dtype
+
+
+def build_columnar_cache(filepath: str, cache_dir: str, downcast: bool = True, source_sha256: Optional[str] = None) -> str:
+    """
+    Parse the CSV once and write one .npy per column plus meta.json, returns the new version's directory
+    """
+    start = time.perf_counter()
+    df = pd.read_csv(filepath)
+    parse_seconds = time.perf_counter() - start
+    _validate(df)
+
+    path = _cache_path(filepath, cache_dir, downcast)
+    os.makedirs(cache_dir, exist_ok=True)
+    version_path = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}@", dir=cache_dir)
+
+    dtypes = {}
+    for i, column in enumerate(df.columns):
+        values = df[column].to_numpy()
+        dtype = _column_dtype(values, downcast)
+        np.save(os.path.join(version_path, f"{i}.npy"), values.astype(dtype, copy=False))
+        dtypes[column] = np.dtype(dtype).str
+
+    meta = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'source': os.path.abspath(filepath),
+        'source_sha256': source_sha256 or file_sha256(filepath),
+        'n_rows': len(df),
+        'columns': list(df.columns),
+        'dtypes': dtypes,
+        'parse_seconds': parse_seconds,
+    }
+    with open(os.path.join(version_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # swap in the finished cache, readers see the old version or the new one, never a partial or missing one
+    _swap_cache(path, version_path)
+
+    print(f"Built columnar cache for {filepath} ({len(df)} rows) in {time.perf_counter() - start:.2f}s, CSV parse took {parse_seconds:.2f}s")
+    return version_path
+
+
+def open_columnar_cache(filepath: str, cache_dir: str, downcast: bool = True) -> Tuple[dict, dict]:
+    """
+    Returns (meta, {column: memory-mapped array}) of the CSV's columnar cache, rebuilding
+    it when the CSV hash changed. Nothing is read until the arrays are sliced.
+    """
+    path = os.path.realpath(_cache_path(filepath, cache_dir, downcast))  # resolved once, a concurrent rebuild swaps the link, not these files
+    source_sha256 = file_sha256(filepath)
+
+    meta = None
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    if meta is None or meta['format_version'] != CACHE_FORMAT_VERSION or meta['source_sha256'] != source_sha256:
+        path = build_columnar_cache(filepath, cache_dir, downcast=downcast, source_sha256=source_sha256)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+    columns = {
+        column: np.load(os.path.join(path, f"{i}.npy"), mmap_mode='r')
+        for i, column in enumerate(meta['columns'])
+    }
+    return meta, columns
+
+
+def load_columnar_cache(filepath: str, cache_dir: str, downcast: bool = True,
+                        since: Optional[float] = None, watermark_column: str = WATERMARK_COLUMN) -> pd.DataFrame:
+    """
+    Returns the dataset from its columnar cache, rebuilding it when the CSV hash changed.
+    With since, only rows past that watermark are copied out of the mapped columns.
+    """
+    start = time.perf_counter()
+    meta, columns = open_columnar_cache(filepath, cache_dir, downcast=downcast)
+    rows = None
+    if since is not None:
+        rows = np.flatnonzero(columns[watermark_column] > since)
+        columns = {column: values[rows] for column, values in columns.items()}
+    df = pd.DataFrame(columns, index=rows)  # indexed by row position in the file, like a full load
+    print(f"Loaded {len(df)} of {meta['n_rows']} rows from columnar cache in {time.perf_counter() - start:.3f}s "
+          f"(including the source hash, CSV parse when built: {meta['parse_seconds']:.2f}s)")
+    return df
+
+
+def load_rows(filepath: str, cache_dir: str, rows, downcast: bool = True) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Returns (X, y) of the given row positions in the file, indexed by them, copied out of
+    the columnar cache. Used for saved holdouts, which assume the CSV is only appended to.
+
+    Raises:
+        ValueError: If a row is past the end of the file
+    """
+    meta, columns = open_columnar_cache(filepath, cache_dir, downcast=downcast)
+    rows = np.asarray(rows, dtype=np.int64)
+    if rows.size and (rows.min() < 0 or rows.max() >= meta['n_rows']):
+        raise ValueError(f"Rows up to {rows.max()} requested but {filepath} has {meta['n_rows']} rows, was it rewritten?")
+    df = pd.DataFrame({column: values[rows] for column, values in columns.items()}, index=rows)
+    return df.drop(columns=['Class']), df['Class']
@@ -0,0 +1,205 @@
+import threading
+from statistics import NormalDist
+import numpy as np
+
+N_BINS = 10
+# fraud probabilities pile up near 0, so the fixed bins are finer there
+PROBA_EDGES = np.array([0.001, 0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 0.9])
+PSI_EPSILON = 1e-4  # floor for empty bins, keeps the log finite
+
+
+def bin_counts(X, edges):
+    """
+    Returns (n_features, n_edges + 1) counts of X's columns in the bins between each
+    column's edges, bin i holds values with exactly i edges below them
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+    n_features, n_bins = edges.shape[0], edges.shape[1] + 1
+    bins = (X[:, :, None] > edges[None, :, :]).sum(axis=2)
+    counts = np.bincount((bins + np.arange(n_features) * n_bins).ravel(), minlength=n_features * n_bins)
+    return counts.reshape(n_features, n_bins)
+
+
+def _moments(X):
+    # (n, mean, sum of squared deviations) per column, the batch side of Welford's update
+    return len(X), X.mean(axis=0), ((X - X.mean(axis=0)) ** 2).sum(axis=0)
+
+
+def build_reference(X, y_proba, n_bins=N_BINS):
+    """
+    Returns the reference distributions drift is measured against: per-feature decile
+    edges of X with the share of rows in each bin, and the probability histogram
+    """
+    feature_names = list(X.columns) if hasattr(X, 'columns') else None
+    X = np.asarray(X, dtype=np.float64)
+    y_proba = np.asarray(y_proba, dtype=np.float64).reshape(-1, 1)
+    edges = np.quantile(X, np.arange(1, n_bins) / n_bins, axis=0).T
+    proba_edges = PROBA_EDGES[None, :]
+    return {
+        'source': 'training',
+        'feature_names': feature_names,
+        'n_rows': len(X),
+        'edges': edges,
+        'proportions': bin_counts(X, edges) / len(X),
+        'mean': X.mean(axis=0),
+        'std': X.std(axis=0),
+        'proba_edges': proba_edges,
+        'proba_proportions': bin_counts(y_proba, proba_edges) / len(y_proba),
+        'proba_mean': float(y_proba.mean()),
+        'proba_std': float(y_proba.std()),
+    }
+
+
+def reference_from_scaler(scaler, n_bins=N_BINS):
+    """
+    Returns a reference that assumes each feature is normal with the scaler's mean and
+    scale, for artifact sets trained before drift references were saved. There is no
+    probability reference then, only its running statistics are reported.
+    """
+    quantiles = np.array([NormalDist().inv_cdf(q) for q in np.arange(1, n_bins) / n_bins])  # stdlib, keeps scipy out of the API's imports
+    feature_names = getattr(scaler, 'feature_names_in_', None)
+    return {
+        'source': 'scaler',
+        'feature_names': list(feature_names) if feature_names is not None else None,
+        'n_rows': int(getattr(scaler, 'n_samples_seen_', 0)),
+        'edges': scaler.mean_[:, None] + scaler.scale_[:, None] * quantiles[None, :],
+        'proportions': np.full((len(scaler.mean_), n_bins), 1 / n_bins),
+        'mean': scaler.mean_,
+        'std': scaler.scale_,
+        'proba_edges': PROBA_EDGES[None, :],
+        'proba_proportions': None,
+        'proba_mean': None,
+        'proba_std': None,
+    }
+
+
+def psi(expected, actual, epsilon=PSI_EPSILON):
+    # population stability index along the last axis
+    expected = np.clip(expected, epsilon, None)
+    actual = np.clip(actual, epsilon, None)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+
+
+def ks(expected, actual):
+    # Kolmogorov-Smirnov distance between the binned CDFs
+    return np.abs(np.cumsum(expected, axis=-1) - np.cumsum(actual, axis=-1)).max(axis=-1)
+
+
+class _Sketch:
+    # running moments and bin counts of the rows seen under one reference
+
+    def __init__(self, reference):
+        self.reference = reference
+        n_features = reference['edges'].shape[0]
+        self.n = 0
+        self.non_finite = 0  # rows with a NaN/inf feature or probability, left out of the summaries
+        self.mean = np.zeros(n_features + 1)  # last column is the fraud probability
+        self.m2 = np.zeros(n_features + 1)
+        self.counts = np.zeros(reference['proportions'].shape, dtype=np.int64)
+        self.proba_counts = np.zeros(PROBA_EDGES.size + 1, dtype=np.int64)
+
+    def merge(self, n, mean, m2, counts, proba_counts, non_finite=0):
+        # Chan et al.'s parallel form of Welford's update, one step per batch
+        self.non_finite += non_finite
+        if n == 0:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+        self.counts += counts
+        self.proba_counts += proba_counts
+
+
+class DriftMonitor:
+    """
+    Streaming summaries of the served inputs and fraud probabilities, compared against
+    the reference of the model version that scored them.
+
+    update() folds a whole request or batch in with a few vectorised NumPy calls, so the
+    memory and the work per request do not grow with traffic. Nothing is logged. The
+    sketches start over whenever a new model version is seen.
+    """
+
+    def __init__(self, psi_threshold=0.2):
+        self.psi_threshold = psi_threshold
+        self._version = None
+        self._sketch = None
+        self._lock = threading.Lock()
+
+    def update(self, X, y_proba, handle):
+        """
+        Adds scored rows (raw features) from the model version behind handle
+        """
+        if len(X) == 0:
+            return
+        with self._lock:
+            if self._version != handle.version:
+                self._version = handle.version
+                reference = handle.drift_reference
+                if reference is None:
+                    reference = reference_from_scaler(handle.preprocessor.scaler)
+                self._sketch = _Sketch(reference)
+            sketch = self._sketch
+
+        # summarise the batch outside the lock, concurrent requests only wait for the merge
+        y_proba = np.asarray(y_proba, dtype=np.float64).reshape(-1, 1)
+        values = np.hstack([np.asarray(X, dtype=np.float64), y_proba])
+        finite = np.isfinite(values).all(axis=1)
+        non_finite = len(values) - int(finite.sum())
+        if non_finite:
+            values = values[finite]  # one NaN would turn every running mean and PSI into NaN
+        if len(values):
+            n, mean, m2 = _moments(values)
+            counts = bin_counts(values[:, :-1], sketch.reference['edges'])
+            proba_counts = bin_counts(values[:, -1:], sketch.reference['proba_edges'])[0]
+        else:
+            n, mean, m2, counts, proba_counts = 0, None, None, 0, 0
+        with self._lock:
+            if self._sketch is sketch:  # dropped when a reload started a new sketch meanwhile
+                sketch.merge(n, mean, m2, counts, proba_counts, non_finite)
+
+    def report(self):
+        """
+        Returns the PSI and binned KS distance per feature and for the fraud probability,
+        next to their running and reference mean/std
+        """
+        with self._lock:
+            sketch = self._sketch
+            if sketch is None or sketch.n == 0:
+                non_finite = sketch.non_finite if sketch is not None else 0
+                return {"model_version": self._version, "rows": 0, "non_finite_rows": non_finite, "features": {}, "fraud_probability": None}
+            n, non_finite, mean, std = sketch.n, sketch.non_finite, sketch.mean.copy(), np.sqrt(sketch.m2 / sketch.n)
+            observed = sketch.counts / n
+            proba_observed = sketch.proba_counts / n
+        reference = sketch.reference
+
+        feature_psi, feature_ks = psi(reference['proportions'], observed), ks(reference['proportions'], observed)
+        names = reference['feature_names'] or [f"feature_{i}" for i in range(len(feature_psi))]
+        features = {
+            name: {
+                "mean": float(mean[i]), "std": float(std[i]),
+                "reference_mean": float(reference['mean'][i]), "reference_std": float(reference['std'][i]),
+                "psi": float(feature_psi[i]), "ks": float(feature_ks[i]),
+            }
+            for i, name in enumerate(names)
+        }
+
+        probability = {"mean": float(mean[-1]), "std": float(std[-1]), "reference_mean": reference['proba_mean'],
+                       "reference_std": reference['proba_std'], "psi": None, "ks": None}
+        if reference['proba_proportions'] is not None:
+            probability["psi"] = float(psi(reference['proba_proportions'][0], proba_observed))
+            probability["ks"] = float(ks(reference['proba_proportions'][0], proba_observed))
+
+        return {
+            "model_version": self._version,
+            "reference": reference['source'],
+            "rows": n,
+            "non_finite_rows": non_finite,
+            "psi_threshold": self.psi_threshold,
+            "max_psi": float(feature_psi.max()),
+            "drifted": [name for name, stats in features.items() if stats["psi"] > self.psi_threshold],
+            "features": features,
+            "fraud_probability": probability,
+        }
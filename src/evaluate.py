@@ -2,6 +2,25 @@ from sklearn.metrics import precision_score, recall_score, f1_score, classificat
 import numpy as np
 
 
+def _positive_counts(y_true, y_pred_proba, thresholds):
+    # (tp, fp) when predicting fraud for proba >= t, for every t at once via binary search
+    y_true = np.asarray(y_true).astype(bool)
+    scores = np.asarray(y_pred_proba, dtype=np.float64)
+    pos_scores = np.sort(scores[y_true])
+    neg_scores = np.sort(scores[~y_true])
+    tp = len(pos_scores) - np.searchsorted(pos_scores, thresholds, side='left')
+    fp = len(neg_scores) - np.searchsorted(neg_scores, thresholds, side='left')
+    return tp, fp, len(pos_scores)
+
+
+def _fbeta(tp, fp, fn, beta=1.0):
+    # same formula as sklearn's fbeta_score, 0 where it would divide by zero
+    beta2 = beta ** 2
+    numerator = (1 + beta2) * tp
+    denominator = numerator + beta2 * fn + fp
+    return np.divide(numerator, denominator, out=np.zeros(len(tp)), where=denominator > 0)
+
+
 def find_optimal_threshold(y_true, y_pred_proba, n_thresholds=100):
     """
     Returns best_threshold, best_f1
@@ -9,19 +28,76 @@ def find_optimal_threshold(y_true, y_pred_proba, n_thresholds=100):
         
     threshold_samples = np.linspace(0, 1, n_thresholds) # Sample thresholds (e.g., 100 evenly spaced from 0 to 1)
 
-    f1_scores = []
-    for threshold in threshold_samples:
-        y_pred_threshold = (y_pred_proba >= threshold).astype(int)
-        f1 = f1_score(y_true, y_pred_threshold)
-        f1_scores.append(f1)
+    # counts for all thresholds from two sorts instead of one f1_score call per threshold
+    tp, fp, n_pos = _positive_counts(y_true, y_pred_proba, threshold_samples)
+    f1_scores = _fbeta(tp, fp, n_pos - tp)
 
     best_idx = np.argmax(f1_scores)
     best_threshold = threshold_samples[best_idx]
-    best_f1 = f1_scores[best_idx]
+    best_f1 = float(f1_scores[best_idx])
     
     return best_threshold, best_f1
 
 
+def threshold_sweep(y_true, y_pred_proba, beta=1.0, cost_fp=None, cost_fn=None, return_curves=False):
+    """
+    Exact threshold search: every distinct score is a candidate threshold, evaluated in
+    one sort + cumulative sum pass (O(n log n)). Fraud is predicted for proba >= threshold.
+
+    Returns dict with best_threshold and best_fbeta (ties go to the higher threshold).
+    With cost_fp and cost_fn also min_cost_threshold and min_cost, where predicting
+    nothing as fraud (threshold inf) is a candidate too. With return_curves also the
+    thresholds, precision, recall and fbeta arrays (thresholds in descending order).
+
+    Raises:
+        ValueError: If the inputs are empty, differ in length or hold NaN scores
+    """
+    y_true = np.asarray(y_true).astype(bool).ravel()
+    scores = np.asarray(y_pred_proba, dtype=np.float64).ravel()
+    if len(scores) == 0:
+        raise ValueError("threshold_sweep needs at least one score")
+    if len(y_true) != len(scores):
+        raise ValueError(f"y_true has {len(y_true)} labels but y_pred_proba has {len(scores)} scores")
+    if np.isnan(scores).any():
+        raise ValueError("y_pred_proba contains NaN")
+
+    order = np.argsort(-scores, kind='mergesort')
+    sorted_scores = scores[order]
+    tp = np.cumsum(y_true[order])
+    fp = np.arange(1, len(scores) + 1) - tp
+
+    # rows with equal scores fall on the same side of any threshold, keep the last of each run
+    last_of_run = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    thresholds = sorted_scores[last_of_run]
+    tp, fp = tp[last_of_run], fp[last_of_run]
+    n_pos = int(y_true.sum())
+    fn = n_pos - tp
+
+    fbeta = _fbeta(tp, fp, fn, beta)
+    best_idx = np.argmax(fbeta)
+    result = {
+        'best_threshold': float(thresholds[best_idx]),
+        'best_fbeta': float(fbeta[best_idx]),
+        'n_candidates': len(thresholds),
+    }
+
+    if cost_fp is not None and cost_fn is not None:
+        costs = cost_fp * fp + cost_fn * fn
+        cost_idx = np.argmin(costs)
+        if costs[cost_idx] <= cost_fn * n_pos:
+            result['min_cost_threshold'], result['min_cost'] = float(thresholds[cost_idx]), float(costs[cost_idx])
+        else:
+            result['min_cost_threshold'], result['min_cost'] = float('inf'), float(cost_fn * n_pos)
+
+    if return_curves:
+        result['thresholds'] = thresholds
+        result['precision'] = tp / (tp + fp)
+        result['recall'] = tp / n_pos if n_pos else np.zeros(len(tp))
+        result['fbeta'] = fbeta
+
+    return result
+
+
 def evaluate_model(y_true, y_pred):
     """
     Returns dict with precision, recall, f1, and classification report
@@ -32,4 +108,58 @@ def evaluate_model(y_true, y_pred):
         'recall': recall_score(y_true, y_pred),
         'f1': f1_score(y_true, y_pred),
         'classification_report': classification_report(y_true, y_pred)
-    }
\ No newline at end of file
+    }
+
+
+# Bootstrap categories: code = 4 * label + 2 * champion decision + challenger decision
+_CODES = np.arange(8)
+_LABEL, _CHAMPION, _CHALLENGER = _CODES >> 2 & 1, _CODES >> 1 & 1, _CODES & 1
+
+
+def _metrics_from_counts(counts, decision):
+    # precision/recall/F1 per row of a (n, 8) category count matrix, 0 where undefined
+    tp = counts[:, (_LABEL == 1) & (decision == 1)].sum(axis=1)
+    fp = counts[:, (_LABEL == 0) & (decision == 1)].sum(axis=1)
+    fn = counts[:, (_LABEL == 1) & (decision == 0)].sum(axis=1)
+    zeros = np.zeros(len(counts))
+    return {
+        'precision': np.divide(tp, tp + fp, out=zeros.copy(), where=(tp + fp) > 0),
+        'recall': np.divide(tp, tp + fn, out=zeros.copy(), where=(tp + fn) > 0),
+        'f1': _fbeta(tp, fp, fn),
+    }
+
+
+def bootstrap_compare(y_true, champion_pred, challenger_pred, n_bootstrap=1000, confidence=0.95, random_state=42):
+    """
+    Returns dict with precision, recall and F1 of both models and of their difference
+    (challenger - champion), each as {'estimate', 'low', 'high'} percentile intervals.
+
+    Both prediction arrays must come from the same rows. Each row falls into one of 8
+    categories (label x champion decision x challenger decision), and resampling n rows
+    with replacement is the same as drawing the 8 category counts from a multinomial, so
+    all replicates are drawn at once as an (n_bootstrap, 8) matrix. Replicates stay paired:
+    both models are always scored on the same resampled rows.
+    """
+    codes = 4 * np.asarray(y_true).astype(int) + 2 * np.asarray(champion_pred).astype(int) + np.asarray(challenger_pred).astype(int)
+    observed = np.bincount(codes, minlength=8)
+    rng = np.random.default_rng(random_state)
+    replicates = rng.multinomial(len(codes), observed / len(codes), size=n_bootstrap)
+
+    counts = np.vstack([observed, replicates])  # row 0 is the observed sample
+    champion = _metrics_from_counts(counts, _CHAMPION)
+    challenger = _metrics_from_counts(counts, _CHALLENGER)
+    difference = {name: challenger[name] - champion[name] for name in champion}
+
+    alpha = (1 - confidence) / 2
+    def interval(values):
+        low, high = np.quantile(values[1:], [alpha, 1 - alpha])
+        return {'estimate': float(values[0]), 'low': float(low), 'high': float(high)}
+
+    return {
+        'n_rows': len(codes),
+        'n_bootstrap': n_bootstrap,
+        'confidence': confidence,
+        'champion': {name: interval(values) for name, values in champion.items()},
+        'challenger': {name: interval(values) for name, values in challenger.items()},
+        'difference': {name: interval(values) for name, values in difference.items()},
+    }
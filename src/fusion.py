@@ -0,0 +1,57 @@
+import copy
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+
+def _scaler_params(preprocessor):
+    scaler = preprocessor.scaler
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return mean, scale
+
+
+def fuse_model(model, preprocessor):
+    """
+    Returns a copy of model that takes raw (unscaled) features.
+
+    StandardScaler is a per-feature affine map x' = (x - mean) / scale with scale > 0, so
+    tree splits x' <= t become x <= t * scale + mean, and logistic regression weights
+    absorb 1 / scale with the mean shift moved into the intercept.
+
+    Raises:
+        ValueError: If the model type cannot be fused
+    """
+    mean, scale = _scaler_params(preprocessor)
+    fused = copy.deepcopy(model)
+
+    if isinstance(fused, RandomForestClassifier):
+        for estimator in fused.estimators_:
+            tree = estimator.tree_
+            internal = tree.children_left != -1
+            features = tree.feature[internal]
+            tree.threshold[internal] = tree.threshold[internal] * scale[features] + mean[features]  # writes through to the tree
+
+    elif isinstance(fused, LogisticRegression):
+        fused.coef_ = model.coef_ / scale
+        fused.intercept_ = model.intercept_ - (model.coef_ * mean / scale).sum(axis=1)
+
+    else:
+        raise ValueError(f"Cannot fuse preprocessing into {type(model).__name__}")
+
+    return fused
+
+
+def verify_fused_model(model, preprocessor, fused_model, X, threshold):
+    """
+    Returns dict comparing the fused model on raw X with the two-stage path
+    """
+    expected = model.predict_proba(preprocessor.transform(X))[:, 1]
+    actual = fused_model.predict_proba(np.asarray(X))[:, 1]
+
+    return {
+        'n_rows': len(X),
+        'max_abs_diff': float(np.abs(expected - actual).max()),
+        'decision_mismatches': int(((expected >= threshold) != (actual >= threshold)).sum())
+    }
@@ -0,0 +1,147 @@
+import contextvars
+import time
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+
+# Start of the current request, set by MetricsMiddleware before body parsing and validation,
+# and again by AdmissionMiddleware once the request leaves the admission queue
+request_started = contextvars.ContextVar('request_started', default=None)
+
+# Scoring a row takes well under a millisecond up to a few hundred for large batches
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Metrics:
+    """
+    Prometheus metrics for the serving path, in their own registry.
+
+    Handlers collect stage timings in a plain dict while they run and report them with a
+    single observe_prediction() call, so the hot path only pays for a few perf_counter()
+    calls and histogram updates.
+    """
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        self.stage_seconds = Histogram(
+            'fraud_api_stage_seconds', 'Latency per serving stage',
+            ['endpoint', 'stage'], buckets=STAGE_BUCKETS, registry=self.registry)
+        self.request_seconds = Histogram(
+            'fraud_api_request_seconds', 'End-to-end request latency inside the app',
+            ['endpoint'], buckets=STAGE_BUCKETS, registry=self.registry)
+        self.requests = Counter(
+            'fraud_api_requests', 'HTTP requests by endpoint and status code',
+            ['endpoint', 'status'], registry=self.registry)
+        self.rows = Counter(
+            'fraud_api_rows_scored', 'Transactions scored',
+            ['endpoint', 'model_version'], registry=self.registry)
+        self.predictions = Counter(
+            'fraud_api_predictions', 'Scored transactions by decision',
+            ['model_version', 'prediction'], registry=self.registry)
+        self.batch_size = Histogram(
+            'fraud_api_batch_size', 'Transactions per /predict/batch call',
+            buckets=BATCH_BUCKETS, registry=self.registry)
+        self.model_active = Gauge(
+            'fraud_api_model_active', '1 for the model version serving traffic',
+            ['model', 'version'], registry=self.registry)
+        self.reload_seconds = Histogram(
+            'fraud_api_reload_seconds', 'Time to download, load and warm a model version',
+            ['model'], buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120), registry=self.registry)
+        self.reloads = Counter(
+            'fraud_api_reloads', 'Finished model loads by outcome',
+            ['model', 'status'], registry=self.registry)
+        self.artifact_bytes = Gauge(
+            'fraud_api_artifact_bytes', 'Size of the artifacts behind the last load',
+            ['model', 'artifact'], registry=self.registry)
+        self.startup_phase_seconds = Gauge(
+            'fraud_api_startup_phase_seconds', 'Duration of each startup phase',
+            ['phase'], registry=self.registry)
+        self.startup_event_seconds = Gauge(
+            'fraud_api_startup_event_seconds', 'Seconds from process start to each startup event',
+            ['event'], registry=self.registry)
+        self.queue_wait_seconds = Histogram(
+            'fraud_api_queue_wait_seconds', 'Time admitted requests waited for a scoring slot',
+            ['endpoint'], buckets=STAGE_BUCKETS, registry=self.registry)
+        self.shed = Counter(
+            'fraud_api_shed', 'Requests rejected by admission control',
+            ['endpoint', 'reason'], registry=self.registry)
+
+    def observe_prediction(self, endpoint, timings, version, n_rows, n_fraud, handler_started=None):
+        """
+        Records stage timings (seconds) and row counts of one scoring request.
+
+        With handler_started, the time between the request being admitted (or, without
+        admission control, the middleware seeing it) and the handler starting is recorded
+        as the 'parse' stage (body read, JSON, pydantic).
+        """
+        started = request_started.get()
+        if started is not None and handler_started is not None:
+            self.stage_seconds.labels(endpoint, 'parse').observe(handler_started - started)
+        for stage, seconds in timings.items():
+            self.stage_seconds.labels(endpoint, stage).observe(seconds)
+        self.rows.labels(endpoint, version).inc(n_rows)
+        self.predictions.labels(version, 'fraud').inc(n_fraud)
+        self.predictions.labels(version, 'legit').inc(n_rows - n_fraud)
+
+    def observe_status(self, model, status):
+        """
+        ModelRegistry status listener: reload outcome and duration, active version gauge
+        """
+        if status['status'] == 'active':
+            self.reloads.labels(model, 'active').inc()
+            self.reload_seconds.labels(model).observe(status['load_seconds'])
+            self.model_active.labels(model, status['version']).set(1)
+        elif status['status'] == 'failed':
+            self.reloads.labels(model, 'failed').inc()
+        elif status['status'] in ('draining', 'released'):
+            try:
+                self.model_active.remove(model, status['version'])
+            except KeyError:
+                pass
+
+    def observe_startup(self, report):
+        # report: StartupTimeline.report(), set again when the first prediction is served
+        for phase, seconds in report['phases'].items():
+            self.startup_phase_seconds.labels(phase).set(seconds)
+        for event, seconds in report['since_process_start'].items():
+            self.startup_event_seconds.labels(event).set(seconds)
+
+    def observe_artifacts(self, model, sizes):
+        # sizes: {artifact: bytes}, missing optional artifacts are None
+        for artifact, size in sizes.items():
+            if size is not None:
+                self.artifact_bytes.labels(model, artifact).set(size)
+
+    def render(self):
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware timing every HTTP request, labelled by route template
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        request_started.set(start)
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            # templates keep label cardinality bounded, shed requests never reach the router
+            endpoint = route.path if route is not None else scope.get('metrics_endpoint', 'unmatched')
+            self.metrics.request_seconds.labels(endpoint).observe(time.perf_counter() - start)
+            self.metrics.requests.labels(endpoint, str(status['code'])).inc()
@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row scoring calls into one batched call.
+
+    Callers submit one feature row and block on a Future. A background thread drains
+    whatever is queued (up to max_batch_size), scores it with a single score_fn(X) call
+    and hands each caller its own row of the result. When recent batches show concurrent
+    traffic it also waits up to max_wait_ms for more rows; under light load requests are
+    dispatched immediately, so the window only costs latency when it buys throughput.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = Counter()
+        self._avg_batch_size = 1.0
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()  # batch_sizes gets new keys on the worker thread
+        self._stopped = threading.Event()
+        self._submit_lock = threading.Lock()  # a row is either queued before stop() drains, or refused
+        self._thread = threading.Thread(target=self._run, name="microbatcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        row, future = np.asarray(row, dtype=np.float64), Future()
+        with self._submit_lock:
+            if self._stopped.is_set():
+                raise RuntimeError("MicroBatcher stopped")
+            self._queue.put((row, future))
+        return future
+
+    def predict(self, row, timeout=None):
+        """
+        Scores one row through the shared batch and returns its result
+        """
+        return self.submit(row).result(timeout=timeout)
+
+    def stop(self):
+        """
+        Stops the worker, rows still queued fail with RuntimeError instead of waiting forever
+        """
+        with self._submit_lock:
+            self._stopped.set()
+        self._thread.join()
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("MicroBatcher stopped"))
+
+    def stats(self):
+        with self._stats_lock:
+            batch_sizes = dict(self.batch_sizes)
+        n_batches = sum(batch_sizes.values())
+        n_rows = sum(size * count for size, count in batch_sizes.items())
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": n_batches,
+            "rows": n_rows,
+            "mean_batch_size": n_rows / n_batches if n_batches else 0.0,
+            "batch_size_distribution": {str(size): count for size, count in sorted(batch_sizes.items())},
+        }
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+
+        # Only hold the batch open when traffic is actually concurrent
+        deadline = time.monotonic() + (self.max_wait if self._avg_batch_size >= 2 else 0)
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            rows, futures = zip(*batch)
+            with self._stats_lock:
+                self.batch_sizes[len(batch)] += 1
+            self._avg_batch_size = 0.9 * self._avg_batch_size + 0.1 * len(batch)
+            try:
+                results = self.score_fn(np.vstack(rows))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
@@ -0,0 +1,130 @@
+import copy
+import io
+import time
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from src.models import train_random_forest, n_trees
+from src.evaluate import threshold_sweep
+
+DEPTH_CAPS = (16, 12, 8)  # tried in order when trimming trees alone cannot meet the budget
+
+
+def serialized_size(model):
+    # bytes of the joblib artifact the model would be saved as
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.tell()
+
+
+def profile_model(model, X, n_single=50, batch_rows=1000, repeats=3):
+    """
+    Returns dict with median single-row and batch predict_proba latency (ms) and serialized size
+    """
+    X = np.asarray(X)
+    model.predict_proba(X[:1])  # first call pays lazy initialisation
+
+    single = []
+    for row in X[:n_single]:
+        start = time.perf_counter()
+        model.predict_proba(row.reshape(1, -1))
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = X[:batch_rows]
+    batch_times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(batch)
+        batch_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'single_row_ms': float(np.median(single)),
+        'batch_ms': float(np.median(batch_times)),
+        'batch_rows': len(batch),
+        'size_bytes': serialized_size(model),
+    }
+
+
+def within_budget(profile, max_single_row_ms=None, max_batch_ms=None, max_size_bytes=None):
+    return ((max_single_row_ms is None or profile['single_row_ms'] <= max_single_row_ms)
+            and (max_batch_ms is None or profile['batch_ms'] <= max_batch_ms)
+            and (max_size_bytes is None or profile['size_bytes'] <= max_size_bytes))
+
+
+def trim_forest(model, n_estimators, newest=False):
+    # forest made of the first (or, with newest, the last) n_estimators trees, the trees themselves are shared, not copied
+    trimmed = copy.copy(model)
+    trimmed.estimators_ = model.estimators_[-n_estimators:] if newest else model.estimators_[:n_estimators]
+    trimmed.n_estimators = n_estimators
+    return trimmed
+
+
+def _tree_counts(n):
+    # n, 3n/4, n/2, n/4, ... down to 5 trees
+    counts = [n, n * 3 // 4]
+    while counts[-1] // 2 >= 5:
+        counts.append(counts[-1] // 2)
+    return sorted(set(c for c in counts if c >= 1), reverse=True)
+
+
+def fit_budget(model, X_train, y_train, X_val, y_val, max_single_row_ms=None, max_batch_ms=None,
+               max_size_bytes=None, max_f1_drop=0.01, depth_caps=DEPTH_CAPS, random_state=42, keep_newest=False):
+    """
+    Returns (model, record): the model shrunk to fit the latency/size budget, and a record
+    of the trade-off for the artifact metadata.
+
+    Random forests are first trimmed to fewer trees, which needs no retraining; keep_newest
+    keeps the last trees, for forests extended with warm_start. If the largest forest that
+    fits loses more than max_f1_drop F1 on X_val, forests retrained on X_train with capped
+    depth are tried as well, and the best in-budget F1 wins. X_val must not be the split
+    the final threshold and F1 are reported on. Other model types are only profiled. When
+    nothing fits, the original model is kept and the record says so.
+    """
+    budget = {'max_single_row_ms': max_single_row_ms, 'max_batch_ms': max_batch_ms, 'max_size_bytes': max_size_bytes}
+
+    def evaluate(candidate, max_depth):
+        best_f1 = threshold_sweep(y_val, candidate.predict_proba(X_val)[:, 1])['best_fbeta']
+        profile = profile_model(candidate, X_val)
+        return {'n_trees': n_trees(candidate), 'max_depth': max_depth, 'f1': float(best_f1),
+                **profile, 'within_budget': within_budget(profile, **budget)}
+
+    original = evaluate(model, getattr(model, 'max_depth', None))
+    chosen, chosen_model, tried = original, model, 1
+
+    if not original['within_budget'] and isinstance(model, RandomForestClassifier):
+        best = None
+        for max_depth in (model.max_depth,) + tuple(depth_caps):
+            if max_depth != model.max_depth and model.max_depth is not None and max_depth >= model.max_depth:
+                continue
+            base = model if max_depth == model.max_depth else train_random_forest(
+                X_train, y_train, n_estimators=len(model.estimators_), random_state=random_state, max_depth=max_depth)
+            # latency and size shrink with the tree count, so the first fit is the best this depth can do
+            for count in _tree_counts(len(base.estimators_)):
+                candidate = trim_forest(base, count, newest=keep_newest)
+                result = evaluate(candidate, max_depth)
+                tried += 1
+                if result['within_budget']:
+                    if best is None or result['f1'] > best[0]['f1']:
+                        best = (result, candidate)
+                    break
+            if best is not None and original['f1'] - best[0]['f1'] <= max_f1_drop:
+                break
+        if best is not None:
+            chosen, chosen_model = best
+
+    record = {
+        'budget': budget,
+        'max_f1_drop': max_f1_drop,
+        'original': original,
+        'chosen': chosen,
+        'f1_drop': original['f1'] - chosen['f1'],
+        'within_budget': chosen['within_budget'],
+        'candidates_tried': tried,
+    }
+    if not chosen['within_budget']:
+        print(f"No model variant fits the budget {budget}, keeping the original model")
+    elif chosen is not original:
+        print(f"Shrunk model to {chosen['n_trees']} trees (max_depth {chosen['max_depth']}) for budget {budget}: "
+              f"F1 {original['f1']:.4f} -> {chosen['f1']:.4f}, single row {original['single_row_ms']:.2f} -> {chosen['single_row_ms']:.2f} ms, "
+              f"size {original['size_bytes']} -> {chosen['size_bytes']} bytes")
+    return chosen_model, record
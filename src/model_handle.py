@@ -0,0 +1,249 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+# joblib, sklearn and the bundle reader are imported when the first model is loaded, not
+# with this module, so the API can bind its port while the model stack loads in the background
+
+N_FEATURES = 30
+
+
+class ModelHandle:
+    """
+    One loaded artifact set. Everything a prediction needs lives on the handle, so a
+    request that holds a handle never mixes a new model with an old threshold.
+    """
+
+    def __init__(self, model, preprocessor, threshold, best_f1, fused_model=None, engine=None, flat_max_rows=256, version=None, drift_reference=None, artifact_version=None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.threshold = threshold
+        self.best_f1 = best_f1
+        self.fused_model = fused_model
+        self.engine = engine
+        self.flat_max_rows = flat_max_rows
+        self.version = version  # registry version, "v{n}" in this process only
+        self.artifact_version = artifact_version  # what was loaded (bundle version or sha256 prefix of model.joblib), the same in every process
+        self.drift_reference = drift_reference  # see src/drift.py, None for artifact sets without one
+        self.active_requests = 0
+        self.retired = False
+
+    @classmethod
+    def from_artifacts(cls, input_dir='artifacts', suffix='', use_fused=True, engine='sklearn', flat_max_rows=256, version=None):
+        from src.utils import load_artifacts, load_fused_model, load_drift_reference, artifact_path, file_sha256
+        from src.tree_engine import build_engine
+        model, preprocessor, threshold, best_f1 = load_artifacts(input_dir, suffix)
+        fused_model = load_fused_model(input_dir, suffix) if use_fused else None
+        return cls(
+            model, preprocessor, threshold, best_f1,
+            fused_model=fused_model,
+            engine=build_engine(fused_model if fused_model is not None else model, engine),
+            flat_max_rows=flat_max_rows,
+            version=version,
+            drift_reference=load_drift_reference(input_dir, suffix),
+            artifact_version=file_sha256(artifact_path(input_dir, "model.joblib", suffix))[:12],  # same length as a bundle version
+        )
+
+    @classmethod
+    def from_bundle(cls, path, verify=False, engine='sklearn', flat_max_rows=256, version=None, drift_reference=None):
+        from src.bundle import load_bundle, LazyBlob
+        from src.tree_engine import FlatForest, build_engine
+        model, preprocessor, threshold, best_f1, manifest = load_bundle(path, verify=verify)
+        if isinstance(model, FlatForest):
+            # the mapped node arrays serve everything. A bundle saved with include_sklearn also
+            # carries the sklearn forest: with engine='sklearn' it takes batches above
+            # flat_max_rows and is unpickled on the first one, not at load time
+            if engine == 'sklearn' and 'model' in manifest['blobs']:
+                engine, model = model, LazyBlob(path, manifest, 'model')
+            else:
+                engine = model
+        else:
+            engine = build_engine(model, engine)
+        fused_model = model if manifest['fused'] else None
+        return cls(model, preprocessor, threshold, best_f1, fused_model=fused_model, engine=engine, flat_max_rows=flat_max_rows, version=version, drift_reference=drift_reference, artifact_version=manifest['version'])
+
+    def score(self, X, timings=None):
+        """
+        Returns fraud probabilities for a raw (n, 30) feature matrix, optionally recording
+        'transform' and 'predict' seconds in the timings dict
+        """
+        start = time.perf_counter()
+        if self.fused_model is None:
+            X = self.preprocessor.transform(X)  # Preprocess (scale the features), the fused model does this itself
+            if timings is not None:
+                timings['transform'] = time.perf_counter() - start
+        predict_start = time.perf_counter()
+
+        # The flat engine wins on small batches, sklearn's compiled predict on large ones
+        if self.engine is not None and len(X) <= self.flat_max_rows:
+            scorer = self.engine
+        else:
+            scorer = self.fused_model if self.fused_model is not None else self.model
+        y_proba = scorer.predict_proba(X)[:, 1]  # Probability of fraud
+        if timings is not None:
+            timings['predict'] = time.perf_counter() - predict_start
+        return y_proba
+
+    def warm_up(self, n_rows=64, seed=0):
+        """
+        Scores synthetic rows in each batch shape the engines see, so first calls pay
+        sklearn/numpy's lazy initialisation before taking traffic. Rows are drawn around
+        the scaler's mean and scale, so trees are walked down realistic paths.
+        """
+        sizes = {1, n_rows}
+        if self.engine is not None and self.engine is not self.model and self.engine is not self.fused_model:
+            sizes.add(self.flat_max_rows)
+            if getattr(self.model, 'loaded', True):
+                sizes.add(self.flat_max_rows + 1)  # both sides of the flat/sklearn switch, a lazy sklearn forest stays unloaded
+        X = np.random.default_rng(seed).standard_normal((max(sizes), N_FEATURES))
+        scaler = getattr(self.preprocessor, 'scaler', None)
+        if scaler is not None and hasattr(scaler, 'mean_'):
+            X = X * scaler.scale_ + scaler.mean_
+        for n in sorted(sizes):
+            self.score(X[:n])
+
+    def release(self):
+        self.model = self.preprocessor = self.fused_model = self.engine = None
+
+
+class ModelRegistry:
+    """
+    Holds the active ModelHandle and swaps it atomically.
+
+    New versions are loaded and warmed on a background thread, then published with a
+    single reference change. Requests pin the handle they started with via acquire();
+    a replaced handle is released only once its last request has finished.
+    """
+
+    def __init__(self, history_size=20, listener=None, warm_up_rows=64):
+        self.history_size = history_size
+        self.listener = listener  # called with a copy of a version's status whenever it changes, outside the lock
+        self.warm_up_rows = warm_up_rows
+        self._current = None
+        self._lock = threading.Lock()
+        self._versions = OrderedDict()
+        self._counter = itertools.count(1)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")  # one load at a time
+
+    @property
+    def current(self):
+        return self._current
+
+    @contextmanager
+    def acquire(self):
+        """
+        Yields the active handle (None if nothing is loaded) and keeps it alive until exit
+        """
+        with self._lock:
+            handle = self._current
+            if handle is not None:
+                handle.active_requests += 1
+        try:
+            yield handle
+        finally:
+            if handle is not None:
+                with self._lock:
+                    handle.active_requests -= 1
+                    drained = handle.retired and handle.active_requests == 0
+                if drained:
+                    self._release(handle)
+
+    def load(self, loader):
+        """
+        Loads, warms and activates a new version and returns the handle once it is active.
+        Runs on the loader thread like reload_async, so loads happen one at a time and in
+        the order they were requested.
+        """
+        version = self._new_version()
+        return self._executor.submit(self._load, loader, version).result()
+
+    def reload_async(self, loader):
+        """
+        Starts loading a new version in the background and returns its version id
+        """
+        version = self._new_version()
+        self._executor.submit(self._load_quietly, loader, version)
+        return version
+
+    def status(self, version):
+        return self._versions.get(version)
+
+    def unload(self):
+        """
+        Deactivates the current version, it is released once its last request has finished
+        """
+        with self._lock:
+            old, self._current = self._current, None
+            drained, updates = False, []
+            if old is not None:
+                old.retired = True
+                drained = old.active_requests == 0
+                updates.append(self._set_status(old.version, status="draining"))
+        self._notify(updates)
+        if drained:
+            self._release(old)
+
+    def _new_version(self):
+        version = f"v{next(self._counter)}"
+        with self._lock:
+            self._versions[version] = {"version": version, "status": "loading", "requested_at": time.time()}
+            while len(self._versions) > self.history_size:
+                self._versions.popitem(last=False)
+        return version
+
+    def _set_status(self, version, **fields):
+        # called with self._lock held, returns a copy of the new status for _notify (None once out of the history)
+        if version in self._versions:
+            self._versions[version].update(fields)
+            return dict(self._versions[version])
+        return None
+
+    def _notify(self, updates):
+        # the listener runs after the lock is released, so it may call back into the registry
+        if self.listener is not None:
+            for status in updates:
+                if status is not None:
+                    self.listener(status)
+
+    def _load(self, loader, version):
+        start = time.perf_counter()
+        try:
+            handle = loader(version)
+            handle.version = version
+            warm_start = time.perf_counter()
+            handle.warm_up(self.warm_up_rows)
+            warm_seconds = time.perf_counter() - warm_start
+        except Exception as e:
+            with self._lock:
+                updates = [self._set_status(version, status="failed", error=str(e))]
+            self._notify(updates)
+            raise
+
+        with self._lock:
+            old, self._current = self._current, handle
+            updates = [self._set_status(version, status="active", best_f1=float(handle.best_f1), load_seconds=time.perf_counter() - start, warm_seconds=warm_seconds)]
+            drained = False
+            if old is not None:
+                old.retired = True
+                drained = old.active_requests == 0
+                updates.append(self._set_status(old.version, status="draining"))
+        self._notify(updates)
+        if drained:
+            self._release(old)
+        return handle
+
+    def _load_quietly(self, loader, version):
+        try:
+            self._load(loader, version)
+        except Exception as e:
+            print(f"Could not load model {version}: {e}")
+
+    def _release(self, handle):
+        handle.release()
+        with self._lock:
+            updates = [self._set_status(handle.version, status="released")]
+        self._notify(updates)
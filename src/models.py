@@ -1,5 +1,6 @@
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.utils.class_weight import compute_class_weight
 from xgboost import XGBClassifier
 
 
@@ -13,26 +14,66 @@ def train_logistic_regression(X_train, y_train, max_iter=100, random_state=42):
     return model
     
     
-def train_random_forest(X_train, y_train, n_estimators=100, random_state=42):
+def train_random_forest(X_train, y_train, n_estimators=100, random_state=42, n_jobs=None, max_depth=None):
     
     rf_model = RandomForestClassifier(
         class_weight='balanced',
         random_state=random_state,
-        n_estimators=n_estimators
+        n_estimators=n_estimators,
+        n_jobs=n_jobs,
+        max_depth=max_depth
     )
     rf_model = rf_model.fit(X_train, y_train)
     
     return rf_model
     
     
-def train_xgboost(X_train, y_train, n_estimators=100, random_state=42):
+def train_xgboost(X_train, y_train, n_estimators=100, random_state=42, n_jobs=None):
     
     scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
     xgb_model = XGBClassifier(
         scale_pos_weight=scale_pos_weight,
         random_state=random_state,
-        n_estimators=n_estimators
+        n_estimators=n_estimators,
+        n_jobs=n_jobs
     )
     xgb_model = xgb_model.fit(X_train, y_train)
     
-    return xgb_model
\ No newline at end of file
+    return xgb_model
+
+
+def continue_training(model, X_train, y_train, n_estimators=50):
+    """
+    Returns the model extended with n_estimators trees/rounds fitted on X_train only.
+    
+    Random forests keep their trees and add new ones (warm_start), XGBoost keeps
+    boosting from the existing booster.
+    
+    Raises:
+        ValueError: If the model type cannot be trained incrementally
+    """
+    if isinstance(model, RandomForestClassifier):
+        # 'balanced' weights for the new rows, computed explicitly as warm_start requires
+        class_weight = model.class_weight
+        weights = compute_class_weight('balanced', classes=model.classes_, y=y_train)
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_estimators, class_weight=dict(zip(model.classes_, weights)))
+        model = model.fit(X_train, y_train)
+        model.set_params(warm_start=False, class_weight=class_weight)
+        return model
+    
+    if isinstance(model, XGBClassifier):
+        scale_pos_weight = (y_train == 0).sum() / (y_train == 1).sum()
+        xgb_model = XGBClassifier(**{**model.get_params(), 'n_estimators': n_estimators, 'scale_pos_weight': scale_pos_weight})
+        xgb_model = xgb_model.fit(X_train, y_train, xgb_model=model.get_booster())
+        return xgb_model
+    
+    raise ValueError(f"Cannot continue training {type(model).__name__}")
+
+
+def n_trees(model):
+    # total trees in a forest / boosting rounds in a booster, None for linear models
+    if isinstance(model, RandomForestClassifier):
+        return len(model.estimators_)
+    if isinstance(model, XGBClassifier):
+        return model.get_booster().num_boosted_rounds()
+    return None
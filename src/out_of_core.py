@@ -0,0 +1,180 @@
+import os
+import resource
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBClassifier
+from src.data import iter_csv_chunks, WATERMARK_COLUMN
+from src.preprocessing import FraudPreprocessor
+
+# Training on a CSV larger than memory, one chunk at a time:
+#   pass 1  reads Class and the watermark column only, plans the stratified holdout
+#   pass 2  fits the scaler with partial_fit on the training rows, copies out the holdout
+#   xgboost builds its external-memory pages from a DataIter over the training rows
+# Peak memory is a few chunks plus the holdout, which max_holdout_rows caps.
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def plan_holdout(class_counts, test_size=0.2, max_holdout_rows=None, random_state=42):
+    """
+    Returns (n_chunks, 2) holdout rows to draw from each chunk and class.
+
+    Each class gives up round(test_size * rows) rows, scaled down together when that is
+    more than max_holdout_rows. They are spread over the chunks with sequential
+    hypergeometric draws, so the holdout is a uniform sample of each class without
+    replacement, as train_test_split(stratify=y) would pick.
+    """
+    class_counts = np.asarray(class_counts, dtype=np.int64)
+    totals = class_counts.sum(axis=0)
+    wanted = np.round(totals * test_size).astype(np.int64)
+    if max_holdout_rows is not None and wanted.sum() > max_holdout_rows:
+        wanted = np.floor(wanted * max_holdout_rows / wanted.sum()).astype(np.int64)
+
+    rng = np.random.default_rng(random_state)
+    plan = np.zeros_like(class_counts)
+    remaining, remaining_wanted = totals.copy(), wanted.copy()
+    for i, counts in enumerate(class_counts):
+        for c in (0, 1):
+            if counts[c] and remaining_wanted[c]:
+                plan[i, c] = rng.hypergeometric(remaining_wanted[c], remaining[c] - remaining_wanted[c], counts[c])
+        remaining -= counts
+        remaining_wanted -= plan[i]
+    return plan
+
+
+def holdout_mask(y, plan_row, chunk_index, random_state=42):
+    # the same rows of a chunk on every pass, seeded by the chunk's position
+    rng = np.random.default_rng([random_state, chunk_index])
+    mask = np.zeros(len(y), dtype=bool)
+    for c in (0, 1):
+        rows = np.flatnonzero(y == c)
+        mask[rng.choice(rows, size=plan_row[c], replace=False)] = True
+    return mask
+
+
+class _TrainingChunks(xgb.DataIter):
+    # scaled training rows of each chunk, re-read from the CSV on every pass xgboost makes
+
+    def __init__(self, filepath, chunk_rows, plan, preprocessor, random_state, cache_prefix):
+        self.filepath = filepath
+        self.chunk_rows = chunk_rows
+        self.plan = plan
+        self.preprocessor = preprocessor
+        self.random_state = random_state
+        self.passes = 0
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix, release_data=True)
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = enumerate(iter_csv_chunks(self.filepath, self.chunk_rows))
+            self.passes += 1
+        try:
+            i, chunk = next(self._chunks)
+        except StopIteration:
+            return False
+        y = chunk['Class'].to_numpy()
+        train = ~holdout_mask(y, self.plan[i], i, self.random_state)
+        X = self.preprocessor.transform(chunk.drop(columns=['Class'])[train]).astype(np.float32)
+        input_data(data=X, label=y[train])
+        return True
+
+    def reset(self):
+        self._chunks = None
+
+
+def train_xgboost_out_of_core(filepath, chunk_rows=100000, test_size=0.2, max_holdout_rows=1000000,
+                              n_estimators=100, random_state=42, n_jobs=None, work_dir=None):
+    """
+    Trains an XGBClassifier on a CSV streamed in chunks of chunk_rows rows, returns
+    (model, preprocessor, X_test, y_test, info).
+
+    X_test/y_test is the stratified holdout as a DataFrame/Series indexed by row position
+    in the file. info has the row
+    counts, the watermark, seconds per phase and the peak RSS after each phase.
+    """
+    info = {'chunk_rows': chunk_rows, 'seconds': {}, 'peak_rss_mb': {}}
+
+    # Pass 1: labels and watermark only
+    start = time.perf_counter()
+    class_counts, watermark = [], -np.inf
+    for chunk in iter_csv_chunks(filepath, chunk_rows, usecols=['Class', WATERMARK_COLUMN]):
+        y = chunk['Class'].to_numpy()
+        class_counts.append([(y == 0).sum(), (y == 1).sum()])
+        watermark = max(watermark, float(chunk[WATERMARK_COLUMN].max()))
+    plan = plan_holdout(class_counts, test_size, max_holdout_rows, random_state)
+    info['seconds']['plan'] = time.perf_counter() - start
+    info['peak_rss_mb']['plan'] = peak_rss_mb()
+
+    # Pass 2: scaler statistics over the training rows, holdout rows into preallocated arrays
+    start = time.perf_counter()
+    preprocessor = FraudPreprocessor()
+    n_test = int(plan.sum())
+    X_test, y_test, columns, filled = None, np.empty(n_test, dtype=np.int64), None, 0
+    test_rows = np.empty(n_test, dtype=np.int64)
+    for i, chunk in enumerate(iter_csv_chunks(filepath, chunk_rows)):
+        y = chunk['Class'].to_numpy()
+        features = chunk.drop(columns=['Class'])
+        test = holdout_mask(y, plan[i], i, random_state)
+        if X_test is None:
+            columns = features.columns
+            X_test = np.empty((n_test, len(columns)))
+        X_test[filled:filled + test.sum()] = features.to_numpy()[test]
+        y_test[filled:filled + test.sum()] = y[test]
+        test_rows[filled:filled + test.sum()] = i * chunk_rows + np.flatnonzero(test)
+        filled += test.sum()
+        if (~test).any():
+            preprocessor.partial_fit(features[~test])
+    info['seconds']['scaler'] = time.perf_counter() - start
+    info['peak_rss_mb']['scaler'] = peak_rss_mb()
+
+    counts = np.asarray(class_counts).sum(axis=0)
+    n_legit, n_fraud = counts - plan.sum(axis=0)  # training rows per class
+    info.update(rows=int(counts.sum()), train_rows=int(n_legit + n_fraud), test_rows=n_test,
+                chunks=len(class_counts), watermark=watermark)
+
+    # External memory: xgboost keeps its quantised pages on disk in work_dir, not the raw chunks
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='xgb-external-')
+    try:
+        start = time.perf_counter()
+        chunks = _TrainingChunks(filepath, chunk_rows, plan, preprocessor, random_state, os.path.join(work_dir, 'train'))
+        dtrain = xgb.ExtMemQuantileDMatrix(chunks, max_bin=256)
+        info['seconds']['pages'] = time.perf_counter() - start
+        info['peak_rss_mb']['pages'] = peak_rss_mb()
+
+        # same settings as models.train_xgboost
+        start = time.perf_counter()
+        params = {
+            'objective': 'binary:logistic',
+            'tree_method': 'hist',
+            'scale_pos_weight': n_legit / n_fraud,
+            'seed': random_state,
+        }
+        if n_jobs is not None:
+            params['nthread'] = n_jobs
+        booster = xgb.train(params, dtrain, num_boost_round=n_estimators)
+        info['seconds']['train'] = time.perf_counter() - start
+        info['peak_rss_mb']['train'] = peak_rss_mb()
+        info['data_passes'] = 2 + chunks.passes
+        del dtrain
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # back into the sklearn wrapper the rest of the pipeline (and continue_training) expects
+    model = XGBClassifier(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs)
+    model.load_model(bytearray(booster.save_raw('ubj')))
+
+    X_test = pd.DataFrame(X_test, columns=columns, index=test_rows)
+    y_test = pd.Series(y_test, name='Class', index=test_rows)
+    print(f"Out-of-core training on {info['rows']} rows in {info['chunks']} chunks, {info['data_passes']} passes over the file, "
+          f"peak RSS {max(info['peak_rss_mb'].values()):.0f} MB, phases: "
+          + ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in info['seconds'].items()))
+    return model, preprocessor, X_test, y_test, info
@@ -0,0 +1,80 @@
+import numpy as np
+import orjson
+from fastapi.routing import APIRoute
+from starlette.routing import Match
+
+# Compact request bodies for the predict endpoints, next to the regular JSON contract:
+#   application/octet-stream[; dtype=float32|float64]  raw little-endian row-major matrix, float64 by default
+#   application/x-array+json                           bare JSON array (one row or a list of rows), decoded with orjson
+OCTET_STREAM = 'application/octet-stream'
+ARRAY_JSON = 'application/x-array+json'
+DTYPES = {'float32': np.dtype('<f4'), 'float64': np.dtype('<f8')}
+
+
+def parse_content_type(value):
+    """
+    Returns (media type, {parameter: value}) of a Content-Type header, lower-cased
+    """
+    media_type, *params = (value or '').split(';')
+    parameters = {}
+    for param in params:
+        name, _, param_value = param.partition('=')
+        parameters[name.strip().lower()] = param_value.strip().strip('"').lower()
+    return media_type.strip().lower(), parameters
+
+
+def is_compact(content_type):
+    return parse_content_type(content_type)[0] in (OCTET_STREAM, ARRAY_JSON)
+
+
+def decode_features(body, content_type, n_features):
+    """
+    Returns an (n, n_features) float64 matrix decoded from a compact request body.
+
+    float64 bodies are wrapped without copying (the result is read-only), float32 bodies
+    are widened in one copy so scoring sees the same values as the JSON path.
+
+    Raises:
+        ValueError: If the media type or dtype is unsupported, or the body is not a whole number of rows
+    """
+    media_type, params = parse_content_type(content_type)
+    if media_type == OCTET_STREAM:
+        dtype = DTYPES.get(params.get('dtype', 'float64'))
+        if dtype is None:
+            raise ValueError(f"Unsupported dtype {params['dtype']!r}, expected one of {', '.join(DTYPES)}")
+        row_bytes = dtype.itemsize * n_features
+        if not body or len(body) % row_bytes:
+            raise ValueError(f"Expected a multiple of {n_features} {dtype.name} values ({row_bytes} bytes), got {len(body)} bytes")
+        X = np.frombuffer(body, dtype=dtype).reshape(-1, n_features)
+        return X if dtype == DTYPES['float64'] else X.astype(np.float64)
+
+    if media_type == ARRAY_JSON:
+        try:
+            X = np.asarray(orjson.loads(body), dtype=np.float64)  # orjson.JSONDecodeError is a ValueError
+        except TypeError:
+            raise ValueError("Expected an array of numbers")
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2 or X.shape[1] != n_features or len(X) == 0:
+            raise ValueError(f"Expected rows of {n_features} features, got shape {X.shape}")
+        return X
+
+    raise ValueError(f"Unsupported content type {media_type!r}")
+
+
+class CompactPayloadRoute(APIRoute):
+    """
+    Route that only matches requests with a compact Content-Type.
+
+    Registered ahead of the JSON route on the same path, it takes the binary and array
+    bodies and lets everything else fall through to the JSON route unchanged.
+    """
+
+    def matches(self, scope):
+        match, child_scope = super().matches(scope)
+        if match == Match.NONE:
+            return match, child_scope
+        content_type = next((value.decode('latin-1') for name, value in scope.get('headers', ()) if name == b'content-type'), '')
+        if not is_compact(content_type):
+            return Match.NONE, {}
+        return match, child_scope
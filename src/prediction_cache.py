@@ -0,0 +1,93 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Rough per-entry overhead of the OrderedDict slot and its linked-list node
+_SLOT_BYTES = 100
+
+
+def feature_key(row, idempotency_key=None):
+    """
+    Returns the cache key of one feature vector: a 16-byte digest of its float64 bytes,
+    plus the idempotency key when the caller sent one
+    """
+    digest = hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(), digest_size=16).digest()
+    return (digest, idempotency_key)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of fraud probabilities with a TTL.
+
+    Entries are tagged with the model version that produced them. A lookup for another
+    version is a miss and drops the entry, and clear() empties the cache when a new
+    version is activated, so a reload never serves results from the previous model.
+    """
+
+    def __init__(self, max_entries=100000, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidated": 0}
+        self._entries = OrderedDict()  # key -> (expires_at, version, probability)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _entry_bytes(key, value):
+        return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(value) + sum(sys.getsizeof(part) for part in value) + _SLOT_BYTES
+
+    def _drop(self, key):
+        value = self._entries.pop(key)
+        self._bytes -= self._entry_bytes(key, value)
+
+    def get(self, key, version):
+        """
+        Returns the cached probability for key under this model version, or None
+        """
+        now = time.monotonic()
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.counts["misses"] += 1
+                return None
+            expires_at, cached_version, probability = value
+            if cached_version != version or expires_at <= now:
+                self.counts["invalidated" if cached_version != version else "expired"] += 1
+                self.counts["misses"] += 1
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            self.counts["hits"] += 1
+            return probability
+
+    def put(self, key, version, probability):
+        value = (time.monotonic() + self.ttl, version, float(probability))
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = value
+            self._bytes += self._entry_bytes(key, value)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))  # least recently used
+                self.counts["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.counts["invalidated"] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counts["hits"] + self.counts["misses"]
+            return {
+                **self.counts,
+                "hit_rate": self.counts["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "memory_bytes": self._bytes,
+            }
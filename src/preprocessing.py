@@ -9,6 +9,11 @@ class FraudPreprocessor:
         self.scaler.fit(X_train)
         return self
     
+    def partial_fit(self, X_chunk):
+        # running mean/variance over chunks, for data that does not fit in memory at once
+        self.scaler.partial_fit(X_chunk)
+        return self
+    
     def transform(self, X):
         return self.scaler.transform(X)
     
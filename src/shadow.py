@@ -0,0 +1,175 @@
+import os
+import queue
+import struct
+import threading
+import time
+import numpy as np
+
+# Append-only shadow log:
+#   MAGIC | uint64 record size | fixed-size records
+# One record per scored row, read back with read_shadow_log() as a NumPy structured array.
+
+MAGIC = b"FRAUDSHD"
+ARTIFACT_ID_SIZE = 12
+REQUEST_ID_SIZE = 32
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('request_id', f'S{REQUEST_ID_SIZE}'),              # X-Request-Id of the scoring request, truncated
+    ('row', '<u4'),                                      # row within the request
+    ('champion_artifact', f'S{ARTIFACT_ID_SIZE}'),      # ModelHandle.artifact_version, the same in every process
+    ('challenger_artifact', f'S{ARTIFACT_ID_SIZE}'),
+    ('champion', '<f4'),            # fraud probabilities
+    ('challenger', '<f4'),
+    ('flags', 'u1'),                # bit 0: champion says fraud, bit 1: challenger says fraud
+])
+HEADER_SIZE = len(MAGIC) + 8
+
+
+def _encode(value, size):
+    return (value or '').encode()[:size]
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a shadow log")
+        (record_size,) = struct.unpack('<Q', f.read(8))
+    if record_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f"Unsupported shadow log record size {record_size}")
+
+
+def read_shadow_log(path):
+    """
+    Returns all records of a shadow log as a structured array
+
+    Raises:
+        ValueError: If the file is not a shadow log or was written with another record layout
+    """
+    _check_header(path)
+    record_size = RECORD_DTYPE.itemsize
+
+    # a crash can leave a partial last record, ignore it
+    n_records = (os.path.getsize(path) - HEADER_SIZE) // record_size
+    return np.fromfile(path, dtype=RECORD_DTYPE, count=n_records, offset=HEADER_SIZE)
+
+
+class ShadowScorer:
+    """
+    Scores requests with a challenger model off the response path.
+
+    Request handlers hand over their rows and the champion's probabilities with submit(),
+    which never blocks: when the bounded queue is full the rows are dropped and counted.
+    A background thread scores queued rows in batches of up to max_batch_size with the
+    challenger from its own ModelRegistry and appends one record per row to the log.
+    Records name both models by artifact version and carry the request id, so logs of
+    several workers can be joined with each other and with the labels that arrive later.
+
+    Raises:
+        ValueError: If log_path exists but is not a shadow log with the current record layout
+    """
+
+    def __init__(self, registry, log_path, max_queue_size=1024, max_batch_size=256):
+        self.registry = registry
+        self.log_path = log_path
+        self.max_batch_size = max_batch_size
+        self.counts = {"submitted": 0, "scored": 0, "dropped": 0, "no_challenger": 0, "errors": 0}
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._log = self._open_log(log_path)
+        self._log_bytes = self._log.tell()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _open_log(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            _check_header(path)  # never append records of another layout
+        log = open(path, 'ab')
+        if log.tell() == 0:
+            log.write(MAGIC + struct.pack('<Q', RECORD_DTYPE.itemsize))
+            log.flush()
+        return log
+
+    def submit(self, X, champion_proba, champion_pred, champion_artifact, request_id=None, rows=None):
+        """
+        Queues rows for shadow scoring, returns False if they were dropped. rows are the
+        positions of X's rows in the request, 0..len(X) - 1 by default.
+        """
+        X = np.asarray(X)
+        rows = np.arange(len(X)) if rows is None else np.asarray(rows)
+        item = (time.time(), X, np.asarray(champion_proba), np.asarray(champion_pred), champion_artifact, request_id, rows)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.counts["dropped"] += len(item[1])
+            return False
+        with self._lock:
+            self.counts["submitted"] += len(item[1])
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self._log.close()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {**counts, "queue_depth": self._queue.qsize(), "log_path": self.log_path, "log_bytes": self._log_bytes}
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        n_rows = len(batch[0][1])
+        while n_rows < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            n_rows += len(batch[-1][1])
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._score(batch)
+            except Exception as e:
+                with self._lock:
+                    self.counts["errors"] += sum(len(item[1]) for item in batch)
+                print(f"Shadow scoring failed: {e}")
+
+    def _score(self, batch):
+        timestamps, rows, champion_proba, champion_pred, champion_artifacts, request_ids, positions = zip(*batch)
+        X = np.vstack(rows)
+        with self.registry.acquire() as handle:
+            if handle is None:
+                with self._lock:
+                    self.counts["no_challenger"] += len(X)
+                return
+            challenger_proba = handle.score(X)
+            challenger_pred = challenger_proba >= handle.threshold
+            challenger_artifact = handle.artifact_version
+
+        records = np.empty(len(X), dtype=RECORD_DTYPE)
+        sizes = [len(r) for r in rows]
+        records['timestamp'] = np.repeat(timestamps, sizes)
+        records['request_id'] = np.repeat([_encode(r, REQUEST_ID_SIZE) for r in request_ids], sizes)
+        records['row'] = np.concatenate(positions)
+        records['champion_artifact'] = np.repeat([_encode(a, ARTIFACT_ID_SIZE) for a in champion_artifacts], sizes)
+        records['challenger_artifact'] = _encode(challenger_artifact, ARTIFACT_ID_SIZE)
+        records['champion'] = np.concatenate(champion_proba)
+        records['challenger'] = challenger_proba
+        records['flags'] = np.concatenate(champion_pred).astype(np.uint8) | (challenger_pred.astype(np.uint8) << 1)
+        self._log.write(records.tobytes())
+        self._log.flush()
+        with self._lock:
+            self.counts["scored"] += len(X)
+            self._log_bytes += records.nbytes
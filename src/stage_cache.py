@@ -0,0 +1,114 @@
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+import joblib
+
+_NOT_LOADED = object()
+
+
+def code_version(package_dir=os.path.dirname(os.path.abspath(__file__))):
+    # sha256 over the package's source files, editing any of them invalidates every stage
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(package_dir, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+class StageResult:
+    """
+    Output of one stage. A cached value stays on disk until a later stage that has to
+    run reads it, so a run where nothing changed loads nothing.
+    """
+
+    def __init__(self, stage, key, path, value=_NOT_LOADED):
+        self.stage = stage
+        self.key = key
+        self.path = path
+        self._value = value
+
+    @property
+    def value(self):
+        if self._value is _NOT_LOADED:
+            self._value = joblib.load(self.path)
+        return self._value
+
+
+class StageCache:
+    """
+    Caches pipeline stage outputs on disk under a hash of their inputs.
+
+    A stage's key covers its name, parameters, optional fingerprint (e.g. the sha256 of
+    the data file), the keys of the stages it reads and the package's source code. When
+    the key is unchanged the stage is skipped. Only the latest output of each stage is
+    kept. Every run() is timed, summary() returns the timings of this run.
+
+    Runs that share a cache directory must hold lock() for their whole pipeline, so one
+    never deletes an output the other has yet to load.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.code_version = code_version()
+        self.timings = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @contextmanager
+    def lock(self):
+        # exclusive per cache directory, across processes and threads, released when the run ends
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def key(self, stage, params=None, deps=(), fingerprint=None):
+        payload = json.dumps({
+            'stage': stage,
+            'params': params or {},
+            'fingerprint': fingerprint,
+            'inputs': [dep.key for dep in deps],
+            'code': self.code_version,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def run(self, stage, fn, params=None, deps=(), fingerprint=None):
+        """
+        Returns the StageResult of fn(*dep values, **params), computed only when no output
+        is cached under the same key
+        """
+        start = time.perf_counter()
+        params = params or {}
+        key = self.key(stage, params, deps, fingerprint)
+        path = os.path.join(self.cache_dir, f"{stage}-{key[:16]}.joblib")
+
+        if os.path.exists(path):
+            result = StageResult(stage, key, path)
+        else:
+            value = fn(*[dep.value for dep in deps], **params)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            joblib.dump(value, tmp_path)
+            os.replace(tmp_path, path)  # a crash never leaves a partial output under a valid key
+            for old in glob.glob(os.path.join(self.cache_dir, f"{stage}-*.joblib")):
+                if old != path:
+                    try:
+                        os.remove(old)
+                    except FileNotFoundError:
+                        pass  # removed by another run meanwhile
+            result = StageResult(stage, key, path, value)
+
+        self.timings.append({'stage': stage, 'cached': result._value is _NOT_LOADED,
+                             'seconds': time.perf_counter() - start, 'key': key[:16]})
+        return result
+
+    def summary(self):
+        total = sum(timing['seconds'] for timing in self.timings)
+        for timing in self.timings:
+            print(f"{timing['stage']:<12} {'cached' if timing['cached'] else 'ran':<7} {timing['seconds']:>8.2f}s  {timing['key']}")
+        print(f"{'total':<12} {'':<7} {total:>8.2f}s, {sum(t['cached'] for t in self.timings)}/{len(self.timings)} stages cached")
+        return self.timings
@@ -0,0 +1,95 @@
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def lazy_import(name):
+    """
+    Returns module name, executed on its first attribute access instead of now.
+
+    Keeps heavy imports (boto3, joblib) off the path to binding the port while the
+    module-level name stays patchable in tests.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def process_age():
+    """
+    Returns seconds since this process started, from /proc. In a container the server is
+    (close to) PID 1, so this is the time since the container started.
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            started_ticks = int(f.read().rsplit(')', 1)[1].split()[19])  # field 22, starttime
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - started_ticks / os.sysconf('SC_CLK_TCK'), 0.0)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimeline:
+    """
+    Durations of the startup phases and the moments (seconds since process start) the
+    app was imported, became ready and served its first prediction.
+
+    Phases are only recorded until the timeline is finished, so reloads later on reuse
+    the same instrumented code without overwriting the startup numbers.
+    """
+
+    def __init__(self):
+        age = process_age()
+        self._offset = time.perf_counter() - (age if age is not None else 0.0)  # perf_counter() at process start
+        self.phases = {}
+        self.marks = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def since_start(self):
+        return time.perf_counter() - self._offset
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            if not self.finished:
+                self.phases[name] = seconds
+
+    def mark(self, name):
+        """
+        Records the first time name happened, returns True when that was now
+        """
+        with self._lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = self.since_start()
+            return True
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+
+    def report(self):
+        with self._lock:
+            return {
+                "phases": dict(self.phases),
+                "since_process_start": dict(self.marks),
+            }
@@ -1,35 +1,293 @@
-from src.data import load_data
+from src.data import load_data, load_rows, WATERMARK_COLUMN
 from src.preprocessing import FraudPreprocessor, split_data
-from src.models import train_random_forest
-from src.evaluate import find_optimal_threshold, evaluate_model
-from src.utils import save_artifacts
+from src.models import train_random_forest, continue_training, n_trees
+from src.evaluate import threshold_sweep, evaluate_model
+from src.fusion import fuse_model, verify_fused_model
+from src.utils import save_artifacts, save_fused_model, load_artifacts, save_metadata, load_metadata, save_drift_reference, save_holdout, load_holdout, file_sha256
+from src.bundle import save_bundle
+from src.candidate_search import run_candidate_search
+from src.model_budget import fit_budget
+from src.drift import build_reference
+from src.out_of_core import train_xgboost_out_of_core
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+import numpy as np
+import pandas as pd
 import os
+import time
 
 artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
 data_path = os.getenv('DATA_PATH', './data/creditcard.csv')
+data_cache_dir = os.getenv('DATA_CACHE_DIR')  # defaults to a cache/ folder next to the CSV
+candidate_search = os.getenv('CANDIDATE_SEARCH', 'false').lower() == 'true'
+train_cores = int(os.getenv('TRAIN_CORES', '0')) or None  # core budget for the search, defaults to all cores
+bundle_sklearn = os.getenv('BUNDLE_SKLEARN_FOREST', 'false').lower() == 'true'  # also pickle the sklearn forest into model.bundle
 
-def main(filepath=data_path, test_size=0.2, random_state=42, n_estimators=100):
+def _optional_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+# serving budget for the trained model, unset means no limit
+model_budget = {
+    'max_single_row_ms': _optional_float('MAX_SINGLE_ROW_MS'),  # median predict_proba latency of one row
+    'max_batch_ms': _optional_float('MAX_BATCH_MS'),            # median predict_proba latency of 1000 rows
+    'max_size_bytes': _optional_float('MAX_MODEL_BYTES'),       # joblib-serialized model
+}
+max_f1_drop = float(os.getenv('MAX_F1_DROP', '0.01'))  # test F1 we accept to lose before retraining with capped depth
+train_chunk_rows = int(os.getenv('TRAIN_CHUNK_ROWS', '100000'))  # rows per chunk in out-of-core training
+max_holdout_rows = int(os.getenv('MAX_HOLDOUT_ROWS', '1000000'))  # caps the in-memory holdout of out-of-core training
+min_holdout_frauds = int(os.getenv('MIN_HOLDOUT_FRAUDS', '10'))  # frauds an incremental holdout needs to pick a new threshold on
+
+def main(filepath=data_path, test_size=0.2, random_state=42, n_estimators=100, cache_dir=data_cache_dir, search=candidate_search, candidates=None, n_cores=train_cores, budget=None, holdout_dir=artifacts_path):
     
-    X, y = load_data(filepath) # load data, get features/target
+    # the same stages src/workflow.py runs (and caches) one by one
+    data = load_stage(filepath, cache_dir) # load data from the columnar cache, get features/target
+    split = split_stage(data, test_size, random_state, holdout_dir) # split dataset, the deployed model's holdout stays held out
+    fraud_processor = fit_preprocessor(split) # standardize features
+    trained = train_stage(split, fraud_processor, n_estimators, random_state, search, candidates, n_cores, budget)
+    threshold = threshold_stage(trained, split, fraud_processor)
+    return publish(filepath, data, split, fraud_processor, trained, threshold)
+
+
+def load_stage(filepath, cache_dir=data_cache_dir):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), 'cache')
+    return load_data(filepath, cache_dir=cache_dir)
+
+
+def split_stage(data, test_size=0.2, random_state=42, holdout_dir=None):
+    # with holdout_dir, the deployed model's saved holdout stays in the test split (see extend_split)
+    X, y = data
+    deployed = deployed_holdout(holdout_dir) if holdout_dir else None
+    if deployed is None:
+        return split_data(X, y, test_size=test_size, random_state=random_state)
+    rows, watermark = deployed
+    return extend_split(X, y, rows, watermark, test_size=test_size, random_state=random_state)
+
+
+def deployed_holdout(input_dir=artifacts_path):
+    # (holdout row positions, watermark) of the deployed model, None for artifact sets without them
+    metadata = load_metadata(input_dir)
+    rows = load_holdout(input_dir)
+    if rows is None or metadata is None or metadata.get('watermark') is None:
+        return None
+    return rows, metadata['watermark']
+
+
+def extend_split(X, y, rows, watermark, test_size=0.2, random_state=42):
+    """
+    Returns (X_train, X_test, y_train, y_test) where the test split is the deployed model's
+    holdout rows plus a stratified test_size share of the rows past its watermark, so no
+    test row was trained on by either model. X/y are indexed by row position in the file.
+    New rows with fewer than 2 of either class all go to training.
     
-    X_train, X_test, y_train, y_test = split_data(X, y, test_size=test_size, random_state=random_state) # split dataset
+    Raises:
+        ValueError: If a holdout row is not in X (the data file was rewritten)
+    """
+    if not np.isin(rows, X.index).all():
+        raise ValueError("Deployed holdout rows are missing from the data, was the file rewritten?")
+    test = X.index.isin(rows)
+    new = X.index[(X[WATERMARK_COLUMN] > watermark).to_numpy()]
+    y_new = y.loc[new]
+    if (y_new == 1).sum() >= 2 and (y_new == 0).sum() >= 2:
+        _, new_test = train_test_split(new, test_size=test_size, random_state=random_state, stratify=y_new)
+        test |= X.index.isin(new_test)
+    print(f"Test split: {len(rows)} rows of the deployed holdout and {test.sum() - len(rows)} of {len(new)} rows past watermark {watermark}")
+    return X[~test], X[test], y[~test], y[test]
+
+
+def fit_preprocessor(split):
+    X_train = split[0]
+    return FraudPreprocessor().fit(X_train)
+
+
+def train_stage(split, fraud_processor, n_estimators=100, random_state=42, search=candidate_search, candidates=None, n_cores=train_cores, budget=None, max_f1_drop=max_f1_drop, validation_size=0.2):
+    # returns (model, selection), the model fitted to the latency/size budget
+    budget = model_budget if budget is None else budget
+    X_train, X_test, y_train, y_test = split
+    X_train_scaled = fraud_processor.transform(X_train)
+    X_test_scaled = fraud_processor.transform(X_test)
+    
+    if search:
+        # train several model families/settings in parallel and keep the best on a validation split of train
+        model, results = run_candidate_search(X_train_scaled, y_train.to_numpy(), candidates=candidates, n_cores=n_cores, random_state=random_state, budget=budget)
+    else:
+        model = train_random_forest(X_train_scaled, y_train, n_estimators=n_estimators, random_state=42) # train model
+    
+    if not isinstance(model, RandomForestClassifier) or all(limit is None for limit in budget.values()):
+        # nothing to trim or no budget, the model is only profiled
+        return fit_budget(model, X_train_scaled, y_train, X_test_scaled, y_test, max_f1_drop=max_f1_drop, random_state=random_state, **budget)
+    
+    # trim trees / cap depth until the model meets the latency and size budget. Variants are
+    # compared on a validation split of train, the test split stays for the threshold and F1
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train_scaled, y_train, test_size=validation_size, random_state=random_state, stratify=y_train)
+    _, selection = fit_budget(clone(model).fit(X_fit, y_fit), X_fit, y_fit, X_val, y_val, max_f1_drop=max_f1_drop, random_state=random_state, **budget)
+    chosen = selection['chosen']
+    if chosen is not selection['original']:
+        # refit the chosen variant on the whole train split, as candidate search refits its winner
+        model = clone(model).set_params(n_estimators=chosen['n_trees'], max_depth=chosen['max_depth']).fit(X_train_scaled, y_train)
+    return model, selection
+
+
+def threshold_stage(trained, split, fraud_processor):
+    model = trained[0]
+    X_test, y_test = split[1], split[3]
+    return search_threshold(model, fraud_processor.transform(X_test), y_test)
+
+
+def publish(filepath, data, split, fraud_processor, trained, threshold):
+    # write the -new artifacts of a full run, returns the best F1
+    X, y = data
+    X_test, y_test = split[1], split[3]
+    model, selection = trained
+    metadata = lineage(None, filepath, 'full', len(X), float(X[WATERMARK_COLUMN].max()), model)
+    metadata['model_selection'] = selection # budget, profile of the trained and the chosen model, F1 given up
+    return save_outputs(model, fraud_processor, X_test, fraud_processor.transform(X_test), y_test, metadata, threshold=threshold)
+
 
-    fraud_processor = FraudPreprocessor()
-    X_train_scaled = fraud_processor.fit_transform(X_train) # standardize features
+def incremental(filepath=data_path, n_new_estimators=50, test_size=0.2, random_state=42, cache_dir=data_cache_dir, input_dir=artifacts_path, min_holdout_frauds=min_holdout_frauds, budget=None):
+    """
+    Continues training the deployed model on rows past its watermark, returns the new
+    best F1 or None when there is not enough new data.
+    
+    The deployed preprocessor is kept as is, its scaling is what the existing trees split on.
+    The threshold and F1 come from the deployed model's saved holdout plus the test split
+    of the new rows. Without a saved holdout and with fewer than min_holdout_frauds frauds
+    in the new test split, the deployed threshold and F1 are kept. The continued model is
+    fitted to the serving budget like a full run's, by trimming the oldest trees only.
+    
+    Raises:
+        ValueError: If the deployed artifacts carry no watermark (run a full training first)
+    """
+    metadata = load_metadata(input_dir)
+    if metadata is None or metadata.get('watermark') is None:
+        raise ValueError("Deployed model has no data watermark, run a full training first")
+    
+    cache_dir = cache_dir or os.path.join(os.path.dirname(filepath), 'cache')
+    X, y = load_data(filepath, cache_dir=cache_dir, since=metadata['watermark']) # only rows newer than the deployed model's data
+    if y.sum() < 2 or (y == 0).sum() < 2:
+        print(f"Only {len(y)} new rows ({int(y.sum())} fraud) past watermark {metadata['watermark']}, skipping incremental training")
+        return None
+    
+    X_train, X_test, y_train, y_test = split_data(X, y, test_size=test_size, random_state=random_state) # indexed by row position in the file
+    deployed = deployed_holdout(input_dir)
+    if deployed is not None:
+        # the new rows alone may hold a fraud or two, neither model trained on the deployed holdout
+        X_holdout, y_holdout = load_rows(filepath, cache_dir, deployed[0])
+        X_test, y_test = pd.concat([X_holdout, X_test]), pd.concat([y_holdout, y_test])
+    
+    model, fraud_processor, threshold, best_f1 = load_artifacts(input_dir)
+    X_train_scaled = fraud_processor.transform(X_train)
     X_test_scaled = fraud_processor.transform(X_test)
+    
+    start = time.perf_counter()
+    model = continue_training(model, X_train_scaled, y_train, n_estimators=n_new_estimators) # add trees/rounds fitted on the new rows
+    print(f"Added {n_new_estimators} estimators on {len(X_train)} new rows in {time.perf_counter() - start:.2f}s, {n_trees(model)} in total")
+    
+    # no depth caps, retraining a capped forest on the new rows alone would drop what the deployed trees learned.
+    # Trimming keeps the newest trees, the ones fitted on the new rows. The tree count is then the only
+    # choice and it follows from the budget alone, the test split's F1 is only recorded
+    budget = model_budget if budget is None else budget
+    model, selection = fit_budget(model, X_train_scaled, y_train, X_test_scaled, y_test, max_f1_drop=max_f1_drop, depth_caps=(), random_state=random_state, keep_newest=True, **budget)
+    
+    watermark = max(metadata['watermark'], float(X[WATERMARK_COLUMN].max()))
+    new_metadata = lineage(metadata, filepath, 'incremental', len(X), watermark, model, base_model=os.path.join(input_dir, "model.joblib"))
+    new_metadata['model_selection'] = selection
+    
+    kept = None
+    if deployed is None and y_test.sum() < min_holdout_frauds:
+        print(f"Only {int(y_test.sum())} frauds in the test split and no saved holdout, keeping threshold {threshold} and F1 {best_f1}")
+        kept = (threshold, best_f1, model.predict_proba(X_test_scaled)[:, 1])
+    return save_outputs(model, fraud_processor, X_test, X_test_scaled, y_test, new_metadata, threshold=kept)
 
-    model = train_random_forest(X_train_scaled, y_train, n_estimators=n_estimators, random_state=42) # train model
+
+def out_of_core(filepath=data_path, chunk_rows=train_chunk_rows, test_size=0.2, random_state=42, n_estimators=100, max_holdout_rows=max_holdout_rows, n_cores=train_cores):
+    """
+    Trains XGBoost on a CSV streamed in chunks (see src/out_of_core.py) for data that
+    does not fit in memory, returns the best F1. Only the capped holdout is held in memory.
+    """
+    model, fraud_processor, X_test, y_test, info = train_xgboost_out_of_core(
+        filepath, chunk_rows=chunk_rows, test_size=test_size, max_holdout_rows=max_holdout_rows,
+        n_estimators=n_estimators, random_state=random_state, n_jobs=n_cores)
+    X_test_scaled = fraud_processor.transform(X_test)
     
+    metadata = lineage(None, filepath, 'out_of_core', info['rows'], info['watermark'], model)
+    metadata['out_of_core'] = info # passes over the data, seconds and peak RSS per phase
+    return save_outputs(model, fraud_processor, X_test, X_test_scaled, y_test, metadata)
+
+
+def lineage(parent, filepath, mode, n_rows, watermark, model, base_model=None):
+    # append this run to the parent's lineage, the newest entry describes the current model
+    entry = {
+        'mode': mode,
+        'trained_at': time.time(),
+        'data_source': os.path.abspath(filepath),
+        'rows': n_rows,
+        'watermark_from': parent['watermark'] if parent else None,
+        'watermark_to': watermark,
+        'model_type': type(model).__name__,
+        'n_trees': n_trees(model),
+        'base_model_sha256': file_sha256(base_model) if base_model else None,
+    }
+    return {
+        'watermark_column': WATERMARK_COLUMN,
+        'watermark': watermark,
+        'lineage': (parent['lineage'] if parent else []) + [entry],
+    }
+
+
+def search_threshold(model, X_test_scaled, y_test):
+    # threshold with the best F1 on the test split, returns (best_threshold, best_f1, y_pred_proba)
     y_pred = model.predict(X_test_scaled) # Get class predictions
     y_pred_proba = model.predict_proba(X_test_scaled)[:, 1] # Get fraud probabilities
     
-    best_threshold, best_f1 = find_optimal_threshold(y_test, y_pred_proba, n_thresholds=100)
+    sweep = threshold_sweep(y_test, y_pred_proba)  # exact optimum over every distinct score
+    best_threshold, best_f1 = sweep['best_threshold'], sweep['best_fbeta']
     evaluation = evaluate_model(y_test, y_pred)
     print(f"Best threshold: {best_threshold} \n Best F1 score: {best_f1}")
     print(f"Evaluation report: {evaluation}")
+    return best_threshold, best_f1, y_pred_proba
+
+
+def save_outputs(model, fraud_processor, X_test, X_test_scaled, y_test, metadata, threshold=None):
+    # write every -new artifact, the threshold is searched on the test split unless given, returns the best F1
+    best_threshold, best_f1, y_pred_proba = threshold if threshold is not None else search_threshold(model, X_test_scaled, y_test)
     
     save_artifacts(model, fraud_processor, best_threshold, best_f1, output_dir=artifacts_path, suffix='-new') # save artifacts with -new suffix
+    save_metadata(metadata, output_dir=artifacts_path, suffix='-new') # watermark and lineage for the next incremental run
+    save_holdout(X_test.index.to_numpy(), output_dir=artifacts_path, suffix='-new') # X_test is indexed by row position, compare_and_deploy scores both models on these rows
+    save_drift_reference(build_reference(X_test, y_pred_proba), output_dir=artifacts_path, suffix='-new') # what serving inputs are compared against
+    
+    fused_model = export_fused(model, fraud_processor, X_test, best_threshold)
+    
+    # single memory-mappable file for serving, holds the fused model when there is one
+    manifest = save_bundle(model, fraud_processor, best_threshold, best_f1, output_dir=artifacts_path, suffix='-new', fused_model=fused_model, include_sklearn=bundle_sklearn)
+    print(f"Saved bundle {manifest['version']} ({manifest['model_type']}, {manifest['payload_size']} bytes)")
+    return best_f1
+
+
+def export_fused(model, fraud_processor, X_test, threshold, atol=1e-9):
+    # fold the scaler into the model so serving can skip preprocessor.transform
+    try:
+        fused_model = fuse_model(model, fraud_processor)
+    except ValueError as e:
+        print(f"Skipping fused model export: {e}")
+        return None
+    
+    check = verify_fused_model(model, fraud_processor, fused_model, X_test, threshold) # compare against the two-stage path
+    print(f"Fused model check: {check}")
+    if check['max_abs_diff'] > atol or check['decision_mismatches'] > 0:
+        print("Fused model predictions differ from preprocessor + model, not exporting it")
+        return None
+    
+    save_fused_model(fused_model, output_dir=artifacts_path, suffix='-new')
+    return fused_model
     
 
 if __name__ == "__main__":
-    main()
+    if os.getenv('TRAIN_MODE', 'full') == 'incremental':
+        incremental()
+    elif os.getenv('TRAIN_MODE', 'full') == 'out_of_core':
+        out_of_core()
+    else:
+        main()
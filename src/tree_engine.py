@@ -0,0 +1,110 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+
+class FlatForest:
+    """
+    Random forest flattened into contiguous node arrays for low-latency predict_proba.
+
+    All trees share one set of arrays (feature, threshold, left, right, value) and are
+    traversed together, one vectorized step per tree level, for a single row or a batch.
+    Leaves point back to themselves, and (row, tree) pairs that reach a leaf are dropped
+    from the active set so each step only touches paths that are still descending.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, is_leaf=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value          # fraud probability at each node (only read at leaves)
+        self.roots = roots          # offset of each tree's root node
+        self.max_depth = max_depth
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+
+    @classmethod
+    def from_sklearn(cls, model):
+        if not isinstance(model, RandomForestClassifier):
+            raise ValueError(f"FlatForest only supports RandomForestClassifier, got {type(model).__name__}")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(offset, offset + n_nodes)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            counts = tree.value[:, 0, :]
+            values.append(counts[:, 1] / counts.sum(axis=1))
+
+            roots.append(offset)
+            offset += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def predict_fraud_proba(self, X):
+        """
+        Returns the fraud probability for each row of X, shape (n,)
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+
+        # One entry per (row, tree) pair, row-major so the final mean is over trees
+        nodes = np.tile(self.roots, n_rows)
+        rows = np.repeat(np.arange(n_rows), n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        for _ in range(self.max_depth):
+            if len(active) == 0:
+                break
+            current = nodes[active]
+            go_left = X[rows[active], self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+
+        return self.value[nodes].reshape(n_rows, n_trees).mean(axis=1)
+
+    def predict_proba(self, X):
+        """
+        Drop-in replacement for model.predict_proba, returns shape (n, 2)
+        """
+        proba = self.predict_fraud_proba(X)
+        return np.column_stack([1 - proba, proba])
+
+
+def build_engine(model, engine='sklearn'):
+    """
+    Returns the object used for predict_proba in serving: the model itself for 'sklearn',
+    a FlatForest for 'flat' (falls back to the model if it is not a random forest)
+    """
+    if engine == 'sklearn':
+        return model
+    if engine == 'flat':
+        try:
+            return FlatForest.from_sklearn(model)
+        except ValueError as e:
+            print(f"Falling back to sklearn engine: {e}")
+            return model
+    raise ValueError(f"Unknown inference engine: {engine}")
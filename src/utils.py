@@ -1,8 +1,37 @@
-import joblib
+import hashlib
+import json
 import os
+import numpy as np
+
+# joblib is imported inside the functions that use it, the API imports this module before
+# binding its port and only needs joblib once the startup thread loads a model
+
+ARTIFACTS = ["model.joblib", "preprocessor.joblib", "threshold.joblib", "best_f1.joblib"]
+OPTIONAL_ARTIFACTS = [
+    "model_fused.joblib",  # raw-input model with the scaler folded in, see src/fusion.py
+    "model.bundle",        # single memory-mappable file for serving, see src/bundle.py
+    "metadata.json",       # data watermark and training lineage, see train_pipeline.incremental
+    "drift_reference.joblib",  # feature/probability distributions on the test split, see src/drift.py
+    "holdout.npy",         # row positions of the test split in the data file, see compare_and_deploy.compare_on_holdout
+]
+
+
+def artifact_path(directory, artifact, suffix=''):
+    # model.joblib with suffix '-new' -> <directory>/model-new.joblib
+    name, ext = os.path.splitext(artifact)
+    return os.path.join(directory, f"{name}{suffix}{ext}")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 def save_artifacts(model, preprocessor, threshold, best_f1, output_dir='artifacts', suffix=''):
+    import joblib
     
     os.makedirs(output_dir, exist_ok=True)
     
@@ -18,6 +47,7 @@ def save_artifacts(model, preprocessor, threshold, best_f1, output_dir='artifact
 
 
 def load_artifacts(input_dir='artifacts', suffix=''):
+    import joblib
     
     model_name = f"model{suffix}.joblib"
     preprocessor_name = f"preprocessor{suffix}.joblib"
@@ -29,4 +59,70 @@ def load_artifacts(input_dir='artifacts', suffix=''):
     threshold = joblib.load(os.path.join(input_dir, threshold_name))
     best_f1 = joblib.load(os.path.join(input_dir, best_f1_name))
 
-    return model, preprocessor, threshold, best_f1
\ No newline at end of file
+    return model, preprocessor, threshold, best_f1
+
+
+def save_fused_model(fused_model, output_dir='artifacts', suffix=''):
+    import joblib
+    
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(fused_model, os.path.join(output_dir, f"model_fused{suffix}.joblib"))
+
+
+def load_fused_model(input_dir='artifacts', suffix=''):
+    import joblib
+    
+    # Older artifact sets have no fused model, callers fall back to preprocessor + model
+    path = artifact_path(input_dir, "model_fused.joblib", suffix)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def save_drift_reference(reference, output_dir='artifacts', suffix=''):
+    import joblib
+    
+    os.makedirs(output_dir, exist_ok=True)
+    joblib.dump(reference, artifact_path(output_dir, "drift_reference.joblib", suffix))
+
+
+def load_drift_reference(input_dir='artifacts', suffix=''):
+    import joblib
+    
+    # Older artifact sets have no drift reference, the API derives one from the scaler
+    path = artifact_path(input_dir, "drift_reference.joblib", suffix)
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+
+def save_metadata(metadata, output_dir='artifacts', suffix=''):
+    
+    os.makedirs(output_dir, exist_ok=True)
+    with open(artifact_path(output_dir, "metadata.json", suffix), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+
+def load_metadata(input_dir='artifacts', suffix=''):
+    
+    # Artifact sets trained before lineage tracking have no metadata
+    path = artifact_path(input_dir, "metadata.json", suffix)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_holdout(rows, output_dir='artifacts', suffix=''):
+    
+    os.makedirs(output_dir, exist_ok=True)
+    np.save(artifact_path(output_dir, "holdout.npy", suffix), np.asarray(rows, dtype=np.int64))
+
+
+def load_holdout(input_dir='artifacts', suffix=''):
+    
+    # Older artifact sets have no saved holdout, callers recompute the split
+    path = artifact_path(input_dir, "holdout.npy", suffix)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
@@ -1,23 +1,88 @@
 from prefect import flow, task
-from src.train_pipeline import main as train_pipeline
+from prefect.cache_policies import NO_CACHE
+import os
+from src.train_pipeline import (
+    incremental as incremental_train_pipeline, load_stage, split_stage, fit_preprocessor, train_stage,
+    threshold_stage, publish, data_path, data_cache_dir, candidate_search, train_cores, model_budget, max_f1_drop, artifacts_path,
+)
 from src.compare_and_deploy import main as compare_and_deploy
+from src.stage_cache import StageCache
+from src.utils import file_sha256
 
 # Training happens locally so this module is not used
 # if we were to run the workflow in ECS (decided not to to save money) then Prefect would orchestrate scheduled retraining
 
+stage_cache_dir = os.getenv('STAGE_CACHE_DIR', './data/stage-cache')  # outputs of the full run's stages, keyed by input hash
+
+# Stage outputs are cached by StageCache under a hash of the data, parameters, upstream
+# keys and code. Prefect's own input hashing would pickle whole DataFrames every run, so
+# it is turned off for these tasks.
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def load_task(cache, filepath):
+    return cache.run('load', load_stage, {'filepath': filepath, 'cache_dir': data_cache_dir}, fingerprint=file_sha256(filepath))
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def split_task(cache, data, test_size=0.2, random_state=42):
+    # resplits when the deployed holdout changed, it stays in the test split
+    holdout = os.path.join(artifacts_path, "holdout.npy")
+    fingerprint = file_sha256(holdout) if os.path.exists(holdout) else None
+    return cache.run('split', split_stage, {'test_size': test_size, 'random_state': random_state, 'holdout_dir': artifacts_path}, deps=[data], fingerprint=fingerprint)
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def preprocess_task(cache, split):
+    return cache.run('preprocess', fit_preprocessor, deps=[split])
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def train_task(cache, split, preprocessor, n_estimators=100, random_state=42):
+    params = {'n_estimators': n_estimators, 'random_state': random_state, 'search': candidate_search, 'n_cores': train_cores, 'budget': model_budget, 'max_f1_drop': max_f1_drop}
+    return cache.run('train', train_stage, params, deps=[split, preprocessor])
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def threshold_task(cache, trained, split, preprocessor):
+    return cache.run('threshold', threshold_stage, deps=[trained, split, preprocessor])
+
+def publish_and_compare(filepath, data, split, preprocessor, trained, threshold):
+    publish(filepath, data, split, preprocessor, trained, threshold)
+    return compare_and_deploy(filepath)
+
+@task(log_prints=True, cache_policy=NO_CACHE)
+def compare_task(cache, filepath, data, split, preprocessor, trained, threshold):
+    # reruns when the candidate or the deployed model changed, the new model is never compared twice against the same one
+    deployed = os.path.join(artifacts_path, "model.joblib")
+    fingerprint = file_sha256(deployed) if os.path.exists(deployed) else None
+    return cache.run('compare', lambda *values: publish_and_compare(filepath, *values),
+                     deps=[data, split, preprocessor, trained, threshold], fingerprint=fingerprint)
+    
 @task(log_prints=True)
-def train_pipeline_task():
-    train_pipeline()
+def incremental_train_pipeline_task():
+    incremental_train_pipeline()
     
 @task(log_prints=True)
 def compare_and_deploy_task():
     compare_and_deploy()
 
 @flow(log_prints=True)
-def main_workflow():
-    train_pipeline_task()
-    compare_and_deploy_task()
-    print("Trained, compared, and deployed!")
+def main_workflow(incremental=False, filepath=data_path):
+    # incremental runs only read rows past the deployed model's watermark
+    if incremental:
+        incremental_train_pipeline_task()
+        compare_and_deploy_task()
+        print("Trained, compared, and deployed!")
+        return None
+    
+    # full runs skip every stage whose inputs are unchanged since the last run, an overlapping
+    # scheduled run waits for this one instead of deleting outputs it still has to load
+    cache = StageCache(stage_cache_dir)
+    with cache.lock():
+        data = load_task(cache, filepath)
+        split = split_task(cache, data)
+        preprocessor = preprocess_task(cache, split)
+        trained = train_task(cache, split, preprocessor)
+        threshold = threshold_task(cache, trained, split, preprocessor)
+        deployed = compare_task(cache, filepath, data, split, preprocessor, trained, threshold)
+        print(f"Trained, compared, and {'deployed' if deployed.value else 'kept the old model'}! Stage timings:")
+    return cache.summary()
 
 
 if __name__ == "__main__":
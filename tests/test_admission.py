@@ -0,0 +1,132 @@
+import asyncio
+import time
+import pytest
+from src.admission import AdmissionController, AdmissionMiddleware, Shed, parse_deadline_ms
+from src.metrics import Metrics, MetricsMiddleware, request_started
+
+# this test verifies admission control bounds concurrency and queue length and sheds requests that would miss their deadline
+
+
+def test_admission_bounds_concurrency_and_queue():
+    controller = AdmissionController(max_concurrency=2, max_queue=2)
+    running, peak = 0, 0
+    
+    async def request():
+        nonlocal running, peak
+        try:
+            await controller.acquire('/predict')
+        except Shed as shed:
+            return shed.reason
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        controller.release('/predict', 0.02)
+        return 'ok'
+    
+    async def burst():
+        return await asyncio.gather(*[request() for _ in range(6)])
+    
+    results = asyncio.run(burst())
+    assert results.count('ok') == 4 and results.count('queue_full') == 2
+    assert peak == 2
+    
+    stats = controller.stats()
+    assert stats["admitted"] == 4 and stats["queued"] == 2 and stats["shed_queue_full"] == 2
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert stats["max_queue_wait_ms"] >= 15  # the queued pair waited for the first pair to finish
+
+
+def test_admission_sheds_requests_that_would_miss_their_deadline():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    
+    async def scenario():
+        # learn a 50 ms service time, then hold the only slot
+        await controller.acquire('/predict')
+        controller.release('/predict', 0.05)
+        await controller.acquire('/predict')
+        
+        # cannot finish within 20 ms even with a free slot ahead, shed before queueing
+        with pytest.raises(Shed, match='deadline'):
+            await controller.acquire('/predict', deadline=time.perf_counter() + 0.02)
+        
+        # queued with 120 ms to spare, gives up once 50 ms of service no longer fit
+        start = time.perf_counter()
+        with pytest.raises(Shed, match='deadline'):
+            await controller.acquire('/predict', deadline=start + 0.12)
+        assert time.perf_counter() - start >= 0.05  # no upper bound, a busy machine may wake the loop late
+        assert controller.stats()["queue_depth"] == 0
+        
+        # a waiter with time left gets the slot when it is released
+        waiter = asyncio.ensure_future(controller.acquire('/predict', deadline=time.perf_counter() + 1))
+        await asyncio.sleep(0.01)
+        controller.release('/predict', 0.05)
+        assert await waiter > 0
+        controller.release('/predict', 0.05)
+    
+    asyncio.run(scenario())
+    stats = controller.stats()
+    assert stats["shed_deadline"] == 2 and stats["admitted"] == 3 and stats["in_flight"] == 0
+
+
+def test_expected_wait_uses_the_endpoints_queued_ahead():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    
+    async def scenario():
+        # /predict takes 10 ms, /predict/batch 200 ms
+        await controller.acquire('/predict')
+        controller.release('/predict', 0.01)
+        await controller.acquire('/predict/batch')
+        controller.release('/predict/batch', 0.2)
+        await controller.acquire('/predict')
+        
+        # two batch requests queued ahead cost a /predict request far more than two /predict requests would
+        waiters = [asyncio.ensure_future(controller.acquire('/predict/batch')) for _ in range(2)]
+        await asyncio.sleep(0)
+        running = controller._service_all
+        assert controller.expected_wait() == pytest.approx(2 * 0.2 + running)
+        with pytest.raises(Shed, match='deadline'):
+            await controller.acquire('/predict', deadline=time.perf_counter() + 0.3)
+        
+        for waiter in waiters:
+            controller.release('/predict', 0.01)
+            await waiter
+        controller.release('/predict/batch', 0.2)
+    
+    asyncio.run(scenario())
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_queue_wait_is_not_counted_as_parse_time():
+    controller = AdmissionController(max_concurrency=1, max_queue=10)
+    metrics = Metrics()
+    seen = {}
+    
+    async def endpoint(scope, receive, send):
+        seen['started'] = request_started.get()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+    
+    # metrics outermost, as in api/app.py
+    app = MetricsMiddleware(AdmissionMiddleware(endpoint, controller, ['/predict'], metrics=metrics), metrics=metrics)
+    
+    async def send(message):
+        pass
+    
+    async def queued_request():
+        await controller.acquire('/predict')  # holds the only slot for 50 ms
+        released = time.perf_counter() + 0.05
+        asyncio.get_running_loop().call_later(0.05, controller.release, '/predict', 0.05)
+        await app({'type': 'http', 'path': '/predict', 'headers': []}, None, send)
+        return released
+    
+    released = asyncio.run(queued_request())
+    assert seen['started'] >= released
+
+
+def test_parse_deadline_ms():
+    assert parse_deadline_ms([(b'x-deadline-ms', b'250')]) == 250
+    assert parse_deadline_ms([(b'content-type', b'application/json')]) is None
+    for value in (b'0', b'-5', b'soon', b'nan'):
+        with pytest.raises(ValueError):
+            parse_deadline_ms([(b'x-deadline-ms', value)])
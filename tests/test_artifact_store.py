@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+from src.artifact_store import ArtifactStore
+from src.bundle import save_bundle
+from src.utils import load_artifacts, ARTIFACTS
+
+# this test verifies artifacts are only downloaded when their content changed, against a local S3 stand-in
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+class LocalS3:
+    """Directory-backed stand-in for the boto3 S3 client calls the store uses"""
+    
+    def __init__(self, root):
+        self.root = root
+        self.downloads = []
+    
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, key)
+    
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        with open(path, 'rb') as f:
+            etag = hashlib.md5(f.read()).hexdigest()
+        metadata = {}
+        if os.path.exists(f"{path}.meta"):
+            with open(f"{path}.meta") as f:
+                metadata = json.load(f)
+        return {'ETag': f'"{etag}"', 'Metadata': metadata}
+    
+    def download_file(self, Bucket, Key, Filename):
+        self.downloads.append(Key)
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+    
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None):
+        os.makedirs(os.path.dirname(self._path(Bucket, Key)), exist_ok=True)
+        shutil.copyfile(Filename, self._path(Bucket, Key))
+        with open(f"{self._path(Bucket, Key)}.meta", 'w') as f:
+            json.dump((ExtraArgs or {}).get('Metadata', {}), f)
+    
+    def delete_object(self, Bucket, Key):
+        for path in [self._path(Bucket, Key), f"{self._path(Bucket, Key)}.meta"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def make_store(tmp_path, s3, bucket='bucket'):
+    return ArtifactStore(s3, bucket, 'artifacts/', cache_dir=str(tmp_path / 'cache'))
+
+
+def test_fetch_skips_unchanged_artifacts(tmp_path):
+    s3 = LocalS3(str(tmp_path / 's3'))
+    store = make_store(tmp_path, s3)
+    store.upload({artifact: os.path.join(artifacts_path, artifact) for artifact in ARTIFACTS})
+    
+    paths = store.fetch(ARTIFACTS, optional=['model.bundle'])
+    assert paths['model.bundle'] is None
+    assert sorted(s3.downloads) == sorted(f'artifacts/{a}' for a in ARTIFACTS)
+    
+    # A fresh store (new process) reuses the cache, nothing is downloaded again
+    s3.downloads.clear()
+    store = make_store(tmp_path, s3)
+    assert store.fetch(ARTIFACTS) == {a: paths[a] for a in ARTIFACTS}
+    assert s3.downloads == []
+    assert store.stats['hits'] == len(ARTIFACTS)
+    
+    # Only the artifact that changed is fetched
+    threshold_path = tmp_path / 'threshold.joblib'
+    shutil.copyfile(os.path.join(artifacts_path, 'best_f1.joblib'), threshold_path)
+    store.upload({'threshold.joblib': str(threshold_path)})
+    store.fetch(ARTIFACTS)
+    assert s3.downloads == ['artifacts/threshold.joblib']
+    assert store.prune() == 0  # the old threshold object is unreferenced but inside the grace period
+    assert store.prune(grace_seconds=0) == 1
+    
+    # Unchanged files are not uploaded again
+    store.upload({artifact: os.path.join(artifacts_path, artifact) for artifact in ARTIFACTS[:2]})
+    assert store.stats['uploads_skipped'] == 2
+
+
+def test_prune_waits_for_concurrent_fetch(tmp_path):
+    class SlowS3(LocalS3):
+        def download_file(self, Bucket, Key, Filename):
+            if Key.endswith('threshold.joblib'):
+                time.sleep(0.3)  # the model object is already in the cache, not indexed yet
+            super().download_file(Bucket, Key, Filename)
+    
+    s3 = SlowS3(str(tmp_path / 's3'))
+    make_store(tmp_path, s3).upload({a: os.path.join(artifacts_path, a) for a in ['model.joblib', 'threshold.joblib']})
+    
+    # two workers on one host: one fetching, the other pruning the shared cache
+    fetcher = threading.Thread(target=lambda: paths.update(make_store(tmp_path, s3).fetch(['model.joblib', 'threshold.joblib'])))
+    paths = {}
+    fetcher.start()
+    time.sleep(0.15)
+    assert make_store(tmp_path, s3).prune(grace_seconds=0) == 0
+    fetcher.join()
+    assert os.path.exists(paths['model.joblib'])
+    
+    os.remove(paths['model.joblib'])  # gone behind the store's back, prune and fetch cope
+    assert make_store(tmp_path, s3).prune(grace_seconds=0) == 0
+    assert os.path.exists(make_store(tmp_path, s3).fetch(['model.joblib'])['model.joblib'])
+
+
+def test_fetch_rejects_corrupted_download(tmp_path):
+    s3 = LocalS3(str(tmp_path / 's3'))
+    store = make_store(tmp_path, s3)
+    store.upload({'model.joblib': os.path.join(artifacts_path, 'model.joblib')})
+    
+    # Content changes in S3 without its recorded sha256
+    with open(s3._path('bucket', 'artifacts/model.joblib'), 'ab') as f:
+        f.write(b'garbage')
+    
+    with pytest.raises(ValueError, match="Integrity check failed"):
+        store.fetch(['model.joblib'])
+    assert os.listdir(tmp_path / 'cache' / 'objects') == []
+    
+    with pytest.raises(FileNotFoundError):
+        store.fetch(['preprocessor.joblib'])
+
+
+def test_api_fetch_model_from_local_s3(tmp_path):
+    from api import app as app_module
+    
+    s3 = LocalS3(str(tmp_path / 's3'))
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    save_bundle(model, preprocessor, threshold, best_f1, output_dir=str(tmp_path))
+    make_store(tmp_path, s3, bucket=app_module.S3_BUCKET).upload({
+        **{artifact: os.path.join(artifacts_path, artifact) for artifact in ARTIFACTS},
+        'model.bundle': str(tmp_path / 'model.bundle'),
+    })
+    
+    X = pd.read_csv(data_path).drop('Class', axis=1).to_numpy()[:100]
+    expected = model.predict_proba(preprocessor.transform(X))[:, 1]
+    
+    with patch.object(app_module.boto3, 'client', return_value=s3), \
+         patch.object(app_module, 'ARTIFACT_CACHE_DIR', str(tmp_path / 'cache')):
+        for use_bundle in [True, False]:
+            with patch.object(app_module, 'USE_BUNDLE', use_bundle):
+                handle = app_module.fetch_model('v1')
+            np.testing.assert_array_equal(handle.score(X), expected)
+        
+        # Reloading an unchanged model downloads nothing
+        s3.downloads.clear()
+        app_module.fetch_model('v2')
+        assert s3.downloads == []
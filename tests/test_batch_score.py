@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.batch_score import score_file
+from src.utils import load_artifacts
+
+# this test verifies offline batch scoring matches the model and resumes after an interruption
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def test_batch_score(tmp_path):
+    df = pd.read_csv(data_path)
+    model, preprocessor, threshold, _ = load_artifacts()
+    expected = model.predict_proba(preprocessor.transform(df.drop('Class', axis=1)))[:, 1]
+    
+    output = str(tmp_path / "scores.csv")
+    summary = score_file(filepath=data_path, output=output, chunk_rows=1500, n_workers=2)
+    scores = pd.read_csv(output)
+    assert summary['rows'] == summary['rows_total'] == len(df) and summary['chunks'] == 7
+    assert (scores['row'] == np.arange(len(df))).all()
+    assert (scores['fraud_probability'] == expected).all()
+    assert (scores['prediction'] == (expected >= threshold)).all()
+    
+    # Rerunning a finished run scores nothing
+    assert score_file(filepath=data_path, output=output, chunk_rows=1500, n_workers=2)['rows'] == 0
+
+
+def test_batch_score_resume(tmp_path):
+    output = str(tmp_path / "scores.csv")
+    first = score_file(filepath=data_path, output=output, chunk_rows=1500, n_workers=1, max_chunks=3)
+    assert first['rows_total'] == 4500
+    
+    # A run killed mid-write leaves a partial chunk behind, the resumed run drops it
+    with open(output, 'a') as f:
+        f.write("4500,0.12")
+    second = score_file(filepath=data_path, output=output, chunk_rows=1500, n_workers=1)
+    assert second['resumed_from_chunk'] == 3 and second['rows'] == len(pd.read_csv(data_path)) - 4500
+    
+    full_output = str(tmp_path / "full.csv")
+    score_file(filepath=data_path, output=full_output, chunk_rows=1500, n_workers=1)
+    with open(output) as f, open(full_output) as g:
+        assert f.read() == g.read()
+    
+    # Progress from another chunk size cannot be resumed
+    with pytest.raises(ValueError):
+        score_file(filepath=data_path, output=output, chunk_rows=1000, n_workers=1)
+
+
+def test_batch_score_from_cache(tmp_path):
+    output = str(tmp_path / "scores.csv")
+    summary = score_file(filepath=data_path, output=output, chunk_rows=4000, n_workers=1, source='cache', cache_dir=str(tmp_path / "cache"))
+    csv_output = str(tmp_path / "scores_csv.csv")
+    score_file(filepath=data_path, output=csv_output, chunk_rows=4000, n_workers=1)
+    
+    # the cache keeps float64 columns for scoring, so scores are identical to the CSV path
+    cached, parsed = pd.read_csv(output), pd.read_csv(csv_output)
+    assert summary['rows'] == len(parsed) and (cached['row'] == parsed['row']).all()
+    assert (cached['fraud_probability'] == parsed['fraud_probability']).all()
+    assert (cached['prediction'] == parsed['prediction']).all()
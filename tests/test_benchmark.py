@@ -0,0 +1,32 @@
+import os
+import copy
+from src.benchmark import run_benchmarks, compare_to_baseline
+
+# this test verifies the benchmark suite runs end to end and flags regressions against a baseline
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def test_benchmark_suite_and_comparison():
+    current = run_benchmarks(data_path, n_requests=10, concurrency_levels=[2], repeats=2)
+    results = current['results']
+    
+    assert {'transform_1', 'predict_proba_1000', 'find_optimal_threshold', 'load_data_csv', 'load_data_cache', 'load_artifacts'} <= set(results)
+    assert results['predict_c2']['p50_ms'] <= results['predict_c2']['p95_ms'] <= results['predict_c2']['p99_ms']
+    assert results['predict_c2_throughput']['throughput_rps'] > 0
+    
+    # Same numbers as the baseline: nothing regressed
+    assert not any(row['regressed'] for row in compare_to_baseline(current, current))
+    
+    # Twice as slow and half the throughput, caught unless that benchmark's tolerance allows it
+    slower = copy.deepcopy(current)
+    slower['results']['transform_1']['median_ms'] *= 2
+    slower['results']['predict_c2']['p95_ms'] *= 2
+    slower['results']['predict_c2_throughput']['throughput_rps'] /= 2
+    rows = {row['name']: row for row in compare_to_baseline(slower, {**current, 'tolerances': {'predict_c2': 1.5}})}
+    
+    assert rows['transform_1']['regressed']
+    assert rows['predict_c2_throughput']['regressed']
+    assert not rows['predict_c2']['regressed']
+    assert not rows['find_optimal_threshold']['regressed']
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.bundle import save_bundle, load_bundle, read_manifest, verify_bundle
+from src.fusion import fuse_model
+from src.model_handle import ModelHandle
+from src.models import train_logistic_regression
+from src.utils import load_artifacts
+
+# this test verifies the memory-mapped bundle serves the same predictions as the joblib artifacts
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+def test_bundle_round_trip(tmp_path):
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = pd.read_csv(data_path).drop('Class', axis=1)
+    expected = model.predict_proba(preprocessor.transform(X))[:, 1]
+    
+    manifest = save_bundle(model, preprocessor, threshold, best_f1, output_dir=tmp_path, suffix='-new')
+    assert read_manifest(tmp_path / "model-new.bundle")["checksum"] == manifest["checksum"]
+    
+    bundle_model, bundle_preprocessor, bundle_threshold, bundle_f1, manifest = load_bundle(tmp_path / "model-new.bundle", verify=True)
+    assert manifest["model_type"] == "flat_forest" and not manifest["fused"]
+    assert bundle_threshold == threshold and bundle_f1 == best_f1
+    
+    # Node tables and scaler statistics are views into the mapped file, not copies
+    assert isinstance(bundle_model.threshold.base, np.memmap)
+    assert isinstance(bundle_preprocessor.scaler.mean_.base, np.memmap)
+    
+    np.testing.assert_array_equal(bundle_model.predict_proba(bundle_preprocessor.transform(X))[:, 1], expected)
+
+
+def test_fused_bundle_in_model_handle(tmp_path):
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = pd.read_csv(data_path).drop('Class', axis=1)
+    
+    save_bundle(model, preprocessor, threshold, best_f1, output_dir=tmp_path, fused_model=fuse_model(model, preprocessor))
+    handle = ModelHandle.from_bundle(tmp_path / "model.bundle")
+    
+    # Raw features go straight into the fused forest
+    np.testing.assert_array_equal(handle.score(X.to_numpy()), model.predict_proba(preprocessor.transform(X))[:, 1])
+
+
+def test_bundle_serves_mapped_forest(tmp_path):
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = pd.read_csv(data_path).drop('Class', axis=1).to_numpy()
+    expected = model.predict_proba(preprocessor.transform(X))[:, 1]
+    manifest = save_bundle(model, preprocessor, threshold, best_f1, output_dir=tmp_path)
+    
+    # no pickled forest by default, the mapped flat forest serves every batch size
+    assert manifest["blobs"] == {}
+    handle = ModelHandle.from_bundle(tmp_path / "model.bundle")
+    assert handle.engine is handle.model and isinstance(handle.engine.threshold.base, np.memmap)
+    np.testing.assert_array_equal(handle.score(X), expected)
+    
+    # with include_sklearn the sklearn forest takes large batches, unpickled on the first one
+    save_bundle(model, preprocessor, threshold, best_f1, output_dir=tmp_path, include_sklearn=True)
+    handle = ModelHandle.from_bundle(tmp_path / "model.bundle", flat_max_rows=64)
+    handle.warm_up()
+    assert not handle.model.loaded
+    np.testing.assert_array_equal(handle.score(X[:64]), expected[:64])
+    assert not handle.model.loaded
+    np.testing.assert_array_equal(handle.score(X), expected)
+    assert type(handle.model.model).__name__ == "RandomForestClassifier"
+    
+    # engine='flat' never loads it
+    handle = ModelHandle.from_bundle(tmp_path / "model.bundle", engine='flat', flat_max_rows=64)
+    assert handle.engine is handle.model
+    np.testing.assert_array_equal(handle.score(X), expected)
+
+
+def test_bundle_pickled_model(tmp_path):
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = np.random.default_rng(0).normal(size=(200, 30))
+    lr_model = train_logistic_regression(X, (X[:, 0] > 1).astype(int))
+    
+    save_bundle(lr_model, preprocessor, 0.5, 0.9, output_dir=tmp_path)
+    bundle_model, _, _, _, manifest = load_bundle(tmp_path / "model.bundle")
+    
+    assert manifest["model_type"] == "pickle"
+    np.testing.assert_array_equal(bundle_model.predict_proba(X), lr_model.predict_proba(X))
+
+
+def test_corrupted_bundle_is_rejected(tmp_path):
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    manifest = save_bundle(model, preprocessor, threshold, best_f1, output_dir=tmp_path)
+    
+    path = tmp_path / "model.bundle"
+    data = bytearray(path.read_bytes())
+    data[manifest["payload_offset"] + 100] ^= 0xFF
+    path.write_bytes(bytes(data))
+    
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        verify_bundle(path)
+    
+    path.write_bytes(b"not a bundle")
+    with pytest.raises(ValueError):
+        read_manifest(path)
@@ -0,0 +1,37 @@
+import os
+import pandas as pd
+from src.candidate_search import run_candidate_search
+from src.preprocessing import FraudPreprocessor, split_data
+
+# this test verifies the candidate search trains every candidate in worker processes and returns the best
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def test_candidate_search():
+    df = pd.read_csv(data_path)
+    X_train, X_test, y_train, y_test = split_data(df.drop('Class', axis=1), df['Class'])
+    preprocessor = FraudPreprocessor()
+    X_train_scaled = preprocessor.fit_transform(X_train)
+    X_test_scaled = preprocessor.transform(X_test)
+    
+    candidates = [
+        {'family': 'random_forest', 'params': {'n_estimators': 10}},
+        {'family': 'xgboost', 'params': {'n_estimators': 10}},
+        {'family': 'logistic_regression', 'params': {}},
+    ]
+    model, results = run_candidate_search(X_train_scaled, y_train.to_numpy(), candidates=candidates, n_cores=2)
+    
+    assert len(results) == 3
+    assert {result['family'] for result in results} == {'random_forest', 'xgboost', 'logistic_regression'}
+    assert results[0]['val_f1'] == max(result['val_f1'] for result in results)
+    for result in results:
+        assert result['wall_seconds'] > 0
+        assert result['peak_rss_mb'] > 0
+        assert result['single_row_ms'] > 0 and result['size_bytes'] > 0 and result['within_budget']
+        assert 0 <= result['val_threshold'] <= 1
+    
+    # The returned model is the winning candidate, refitted on the whole train split
+    assert type(model).__name__ == {'random_forest': 'RandomForestClassifier', 'xgboost': 'XGBClassifier', 'logistic_regression': 'LogisticRegression'}[results[0]['family']]
+    assert model.predict_proba(X_test_scaled).shape == (len(X_test), 2)
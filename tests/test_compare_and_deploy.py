@@ -1,13 +1,29 @@
 import joblib
 import os
-from src.compare_and_deploy import main as compare_and_deploy
+import numpy as np
+import pandas as pd
+from src.compare_and_deploy import main as compare_and_deploy, compare_on_holdout
 from src.utils import load_artifacts
+from src.models import train_random_forest
 import shutil
 import pytest
 from unittest.mock import patch, MagicMock
 
 
 artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def save_bad_model(suffix):
+    # forest trained on shuffled labels, far worse than the baseline on any holdout
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    df = pd.read_csv(data_path)
+    X = preprocessor.transform(df.drop('Class', axis=1))
+    y = np.random.default_rng(0).permutation(df['Class'].to_numpy())
+    joblib.dump(train_random_forest(X, y, n_estimators=5), f'artifacts/model{suffix}.joblib')
+    joblib.dump(0.5, f'artifacts/threshold{suffix}.joblib')
+    joblib.dump(0.95, f'artifacts/best_f1{suffix}.joblib')  # stored F1 no longer decides anything
+    shutil.copy('artifacts/preprocessor.backup', f'artifacts/preprocessor{suffix}.joblib')
 
 @pytest.fixture
 def backup_baseline_artifacts():
@@ -39,18 +55,19 @@ def test_compare_and_deploy_better_model(mock_boto3, backup_baseline_artifacts):
     mock_s3 = MagicMock()
     mock_boto3.return_value = mock_s3
     
-    # Copy baseline artifacts to create -new versions
-    shutil.copy('artifacts/model.joblib', 'artifacts/model-new.joblib')
-    shutil.copy('artifacts/preprocessor.joblib', 'artifacts/preprocessor-new.joblib')
-    shutil.copy('artifacts/threshold.joblib', 'artifacts/threshold-new.joblib')
-    
-    # Override F1 score to make it better
-    joblib.dump(0.95, 'artifacts/best_f1-new.joblib')
+    # Baseline becomes the -new challenger, a bad model is deployed
+    shutil.copy('artifacts/model.backup', 'artifacts/model-new.joblib')
+    shutil.copy('artifacts/preprocessor.backup', 'artifacts/preprocessor-new.joblib')
+    shutil.copy('artifacts/threshold.backup', 'artifacts/threshold-new.joblib')
+    shutil.copy('artifacts/best_f1.backup', 'artifacts/best_f1-new.joblib')
+    save_bad_model(suffix='')
     
-    compare_and_deploy()
+    compare_and_deploy(filepath=data_path)
     model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
     
-    assert best_f1 == 0.95
+    assert best_f1 == joblib.load('artifacts/best_f1.backup')
+    assert not os.path.exists('artifacts/model-new.joblib')
+    assert mock_s3.upload_file.called
     
 
 @patch('src.compare_and_deploy.boto3.client')
@@ -59,15 +76,54 @@ def test_compare_and_deploy_worse_model(mock_boto3, backup_baseline_artifacts):
     mock_s3 = MagicMock()
     mock_boto3.return_value = mock_s3
     
-    # Copy baseline artifacts to create -new versions
+    # Bad challenger, even though its stored F1 claims 0.95
+    save_bad_model(suffix='-new')
+    
+    compare_and_deploy(filepath=data_path)
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    
+    assert best_f1 != 0.95
+    assert not os.path.exists('artifacts/model-new.joblib')
+    assert not mock_s3.upload_file.called
+
+
+@patch('src.compare_and_deploy.boto3.client')
+def test_compare_and_deploy_no_significant_difference(mock_boto3, backup_baseline_artifacts):
+    # Mock S3 client
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    # Same model with a higher stored F1, the holdout comparison finds no difference
     shutil.copy('artifacts/model.joblib', 'artifacts/model-new.joblib')
     shutil.copy('artifacts/preprocessor.joblib', 'artifacts/preprocessor-new.joblib')
     shutil.copy('artifacts/threshold.joblib', 'artifacts/threshold-new.joblib')
+    joblib.dump(0.99, 'artifacts/best_f1-new.joblib')
     
-    # Override F1 score to make it worse
-    joblib.dump(0.70, 'artifacts/best_f1-new.joblib')
-    
-    compare_and_deploy()
+    compare_and_deploy(filepath=data_path)
     model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
     
-    assert best_f1 != 0.70
\ No newline at end of file
+    assert best_f1 != 0.99
+    assert not mock_s3.upload_file.called
+
+
+def test_compare_on_saved_holdout(backup_baseline_artifacts):
+    # The new model's saved test rows are the holdout, not a split recomputed from the grown CSV
+    shutil.copy('artifacts/model.joblib', 'artifacts/model-new.joblib')
+    shutil.copy('artifacts/preprocessor.joblib', 'artifacts/preprocessor-new.joblib')
+    shutil.copy('artifacts/threshold.joblib', 'artifacts/threshold-new.joblib')
+    shutil.copy('artifacts/best_f1.joblib', 'artifacts/best_f1-new.joblib')
+    y = pd.read_csv(data_path)['Class'].to_numpy()
+    rows = np.concatenate([np.flatnonzero(y == 1)[:20], np.flatnonzero(y == 0)[:980]])
+    np.save('artifacts/holdout-new.npy', rows)
+    
+    try:
+        comparison = compare_on_holdout(data_path)
+        assert comparison['n_rows'] == 1000
+        
+        # rows past the end of the file mean the CSV was rewritten, not appended to
+        np.save('artifacts/holdout-new.npy', np.array([len(y)]))
+        with pytest.raises(ValueError):
+            compare_on_holdout(data_path)
+    finally:
+        for artifact in ['model-new.joblib', 'preprocessor-new.joblib', 'threshold-new.joblib', 'best_f1-new.joblib', 'holdout-new.npy']:
+            os.remove(os.path.join(artifacts_path, artifact))
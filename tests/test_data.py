@@ -0,0 +1,71 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.data import load_data, open_columnar_cache
+
+# this test verifies the columnar cache returns the CSV's data and is rebuilt when the CSV changes
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def test_columnar_cache_round_trip(tmp_path):
+    csv_path = tmp_path / "creditcard.csv"
+    pd.read_csv(data_path).iloc[:500].to_csv(csv_path, index=False)
+    X_csv, y_csv = load_data(str(csv_path))
+    
+    X, y = load_data(str(csv_path), cache_dir=str(tmp_path / "cache"))
+    assert list(X.columns) == list(X_csv.columns)
+    np.testing.assert_allclose(X.to_numpy(np.float64), X_csv.to_numpy(), rtol=0, atol=1e-5)
+    np.testing.assert_array_equal(y, y_csv)
+    assert y.dtype == np.int8
+    
+    # Second load comes from the cache without parsing the CSV
+    with patch('src.data.pd.read_csv', side_effect=AssertionError("CSV parsed again")):
+        X_cached, y_cached = load_data(str(csv_path), cache_dir=str(tmp_path / "cache"))
+    pd.testing.assert_frame_equal(X_cached, X)
+    
+    # Full precision variant keeps the exact CSV values
+    X_exact, _ = load_data(str(csv_path), cache_dir=str(tmp_path / "cache"), downcast=False)
+    pd.testing.assert_frame_equal(X_exact, X_csv)
+
+
+def test_columnar_cache_invalidated_by_source_hash(tmp_path):
+    csv_path = tmp_path / "creditcard.csv"
+    df = pd.read_csv(data_path).iloc[:200]
+    df.to_csv(csv_path, index=False)
+    load_data(str(csv_path), cache_dir=str(tmp_path / "cache"))
+    
+    df.iloc[:100].to_csv(csv_path, index=False)
+    X, y = load_data(str(csv_path), cache_dir=str(tmp_path / "cache"))
+    assert len(X) == 100
+    
+    df.drop(columns=['Class']).to_csv(csv_path, index=False)
+    with pytest.raises(ValueError, match="Class"):
+        load_data(str(csv_path), cache_dir=str(tmp_path / "cache"))
+
+
+def test_columnar_cache_rebuild_swaps_versions(tmp_path):
+    csv_path, cache_dir = tmp_path / "creditcard.csv", tmp_path / "cache"
+    df = pd.read_csv(data_path).iloc[:200]
+    df.to_csv(csv_path, index=False)
+    meta, columns = open_columnar_cache(str(csv_path), str(cache_dir))
+    link = cache_dir / "creditcard"
+    assert link.is_symlink()
+    first = os.path.realpath(link)
+    
+    # a rebuild points the link at a new version, the replaced one stays for readers that resolved it
+    df.iloc[:100].to_csv(csv_path, index=False)
+    open_columnar_cache(str(csv_path), str(cache_dir))
+    second = os.path.realpath(link)
+    assert second != first and os.path.exists(os.path.join(first, "meta.json"))
+    assert len(columns['Class']) == 200 and meta['n_rows'] == 200
+    
+    # the next rebuild removes the versions before the replaced one
+    df.iloc[:50].to_csv(csv_path, index=False)
+    meta, _ = open_columnar_cache(str(csv_path), str(cache_dir))
+    assert meta['n_rows'] == 50
+    versions = sorted(os.path.realpath(path) for path in cache_dir.glob("creditcard@*"))
+    assert versions == sorted([second, os.path.realpath(link)])
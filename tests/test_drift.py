@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from types import SimpleNamespace
+from src.data import load_data
+from src.preprocessing import FraudPreprocessor
+from src.drift import DriftMonitor, build_reference
+
+# this test verifies streaming drift sketches match batch statistics and flag shifted features
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def test_drift_monitor():
+    X, y = load_data(data_path)
+    preprocessor = FraudPreprocessor().fit(X)
+    y_proba = np.random.default_rng(0).beta(0.2, 5, size=len(X))
+    reference = build_reference(X, y_proba)
+    handle = SimpleNamespace(version="v1", drift_reference=reference, preprocessor=preprocessor)
+    
+    # Same data streamed in uneven batches: running moments are exact and nothing drifts
+    monitor = DriftMonitor()
+    values = X.to_numpy()
+    for start, stop in [(0, 1), (1, 500), (500, 4321), (4321, len(X))]:
+        monitor.update(values[start:stop], y_proba[start:stop], handle)
+    report = monitor.report()
+    assert report["rows"] == len(X) and report["reference"] == "training"
+    assert report["drifted"] == [] and report["max_psi"] < 1e-6
+    np.testing.assert_allclose(report["features"]["Amount"]["mean"], X["Amount"].mean())
+    np.testing.assert_allclose(report["features"]["V1"]["std"], X["V1"].std(ddof=0))
+    np.testing.assert_allclose(report["fraud_probability"]["mean"], y_proba.mean())
+    assert report["fraud_probability"]["psi"] < 1e-6
+    
+    # Rows with a NaN or inf are counted but kept out of the moments and bins
+    bad = values[:3].copy()
+    bad[0, 0], bad[1, 5] = np.nan, np.inf
+    monitor.update(bad, [0.1, 0.1, np.nan], handle)
+    report = monitor.report()
+    assert report["rows"] == len(X) and report["non_finite_rows"] == 3
+    assert np.isfinite(report["max_psi"]) and np.isfinite(report["fraud_probability"]["mean"])
+    
+    # A new version restarts the sketches, a shifted feature and probability are flagged
+    shifted = values.copy()
+    shifted[:, X.columns.get_loc("V1")] += 2 * X["V1"].std()
+    monitor.update(shifted, np.clip(y_proba * 3, 0, 1), SimpleNamespace(version="v2", drift_reference=reference, preprocessor=preprocessor))
+    report = monitor.report()
+    assert report["model_version"] == "v2" and report["rows"] == len(X)
+    assert report["drifted"] == ["V1"] and report["features"]["V1"]["ks"] > 0.5
+    assert report["fraud_probability"]["psi"] > 0.2
+    
+    # Without a saved reference the scaler's mean and scale are used
+    monitor.update(values, y_proba, SimpleNamespace(version="v3", drift_reference=None, preprocessor=preprocessor))
+    report = monitor.report()
+    assert report["reference"] == "scaler" and report["fraud_probability"]["psi"] is None
+    assert set(report["features"]) == set(X.columns)
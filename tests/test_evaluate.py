@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from sklearn.metrics import f1_score, fbeta_score
+from src.evaluate import find_optimal_threshold, threshold_sweep, bootstrap_compare
+
+# this test verifies the sorted threshold sweeps agree with sklearn and the bootstrap comparison is consistent
+
+
+def f1_loop(y_true, y_pred_proba, n_thresholds=100):
+    # the original implementation, one f1_score call per threshold
+    threshold_samples = np.linspace(0, 1, n_thresholds)
+    f1_scores = [f1_score(y_true, (y_pred_proba >= t).astype(int)) for t in threshold_samples]
+    best_idx = np.argmax(f1_scores)
+    return threshold_samples[best_idx], f1_scores[best_idx]
+
+
+def make_scores(seed, n=2000, decimals=None):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < 0.05).astype(int)
+    proba = np.clip(rng.random(n) * 0.6 + y * rng.random(n) * 0.5, 0, 1)
+    if decimals is not None:
+        proba = np.round(proba, decimals)  # many tied scores, like a forest's vote fractions
+    return y, proba
+
+
+def test_find_optimal_threshold_matches_f1_loop():
+    for seed in range(10):
+        y, proba = make_scores(seed, decimals=2 if seed % 2 else None)
+        expected_threshold, expected_f1 = f1_loop(y, proba)
+        best_threshold, best_f1 = find_optimal_threshold(y, proba)
+
+        assert best_threshold == expected_threshold
+        assert abs(best_f1 - expected_f1) < 1e-12
+
+
+def test_find_optimal_threshold_without_positives():
+    y = np.zeros(100, dtype=int)
+    best_threshold, best_f1 = find_optimal_threshold(y, np.linspace(0, 1, 100))
+
+    assert best_threshold == 0
+    assert best_f1 == 0
+
+
+def test_threshold_sweep_exact_optimum():
+    y, proba = make_scores(0, decimals=2)
+    result = threshold_sweep(y, proba, return_curves=True)
+
+    # Reported optimum is what sklearn gets at that threshold, and no distinct score does better
+    assert abs(f1_score(y, proba >= result['best_threshold']) - result['best_fbeta']) < 1e-12
+    assert result['n_candidates'] == len(np.unique(proba))
+    assert max(f1_score(y, proba >= t) for t in np.unique(proba)) <= result['best_fbeta'] + 1e-12
+    assert result['best_fbeta'] >= find_optimal_threshold(y, proba)[1] - 1e-12
+
+    # Curves line up with the thresholds
+    t = result['thresholds'][5]
+    predicted = proba >= t
+    assert abs(result['precision'][5] - y[predicted].mean()) < 1e-12
+    assert abs(result['recall'][5] - predicted[y == 1].mean()) < 1e-12
+
+
+def test_threshold_sweep_fbeta_and_cost():
+    y, proba = make_scores(1)
+    result = threshold_sweep(y, proba, beta=2, cost_fp=1, cost_fn=20)
+
+    assert abs(fbeta_score(y, proba >= result['best_threshold'], beta=2) - result['best_fbeta']) < 1e-12
+
+    costs = [((proba >= t) & (y == 0)).sum() + 20 * ((proba < t) & (y == 1)).sum() for t in np.unique(proba)]
+    assert result['min_cost'] == min(costs)
+    predicted = proba >= result['min_cost_threshold']
+    assert (predicted & (y == 0)).sum() + 20 * (~predicted & (y == 1)).sum() == result['min_cost']
+
+
+def test_threshold_sweep_rejects_bad_input():
+    with pytest.raises(ValueError, match="at least one"):
+        threshold_sweep([], [])
+    with pytest.raises(ValueError, match="labels"):
+        threshold_sweep([0, 1], [0.5])
+    with pytest.raises(ValueError, match="NaN"):
+        threshold_sweep([0, 1], [0.5, np.nan])
+
+
+def test_bootstrap_compare():
+    rng = np.random.default_rng(0)
+    y = rng.random(20000) < 0.02
+    champion = np.where(rng.random(len(y)) < 0.8, y, rng.random(len(y)) < 0.02)
+    challenger = np.where(rng.random(len(y)) < 0.95, y, rng.random(len(y)) < 0.02)
+    result = bootstrap_compare(y, champion, challenger, n_bootstrap=500)
+    
+    # Point estimates are the plain metrics on the full sample
+    assert abs(result['champion']['f1']['estimate'] - f1_score(y, champion)) < 1e-12
+    assert abs(result['challenger']['f1']['estimate'] - f1_score(y, challenger)) < 1e-12
+    for side in ['champion', 'challenger', 'difference']:
+        for metric in ['precision', 'recall', 'f1']:
+            interval = result[side][metric]
+            assert interval['low'] <= interval['estimate'] <= interval['high']
+    
+    assert result['difference']['f1']['low'] > 0
+    # Identical decisions never differ in any replicate
+    same = bootstrap_compare(y, champion, champion, n_bootstrap=500)
+    assert same['difference']['f1'] == {'estimate': 0.0, 'low': 0.0, 'high': 0.0}
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.fusion import fuse_model, verify_fused_model
+from src.models import train_logistic_regression, train_xgboost
+from src.utils import load_artifacts
+
+# this test verifies folding the scaler into the model keeps predictions identical
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+def test_fuse_random_forest():
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = pd.read_csv(data_path).drop('Class', axis=1)
+    
+    fused_model = fuse_model(model, preprocessor)
+    check = verify_fused_model(model, preprocessor, fused_model, X, threshold)
+    
+    assert check['n_rows'] == len(X)
+    assert check['max_abs_diff'] == 0
+    assert check['decision_mismatches'] == 0
+    
+    # The deployed model must be left untouched
+    np.testing.assert_array_equal(model.predict_proba(preprocessor.transform(X)), fused_model.predict_proba(X.to_numpy()))
+
+
+def test_fuse_logistic_regression():
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    df = pd.read_csv(data_path)
+    X, y = df.drop('Class', axis=1), df['Class']
+    
+    lr_model = train_logistic_regression(preprocessor.transform(X), y)
+    check = verify_fused_model(lr_model, preprocessor, fuse_model(lr_model, preprocessor), X, 0.5)
+    
+    assert check['max_abs_diff'] < 1e-9
+    assert check['decision_mismatches'] == 0
+
+
+def test_fuse_unsupported_model():
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    X = np.random.default_rng(0).normal(size=(100, 30))
+    y = (X[:, 0] > 0).astype(int)
+    
+    with pytest.raises(ValueError):
+        fuse_model(train_xgboost(X, y, n_estimators=5), preprocessor)
@@ -0,0 +1,98 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.train_pipeline import main as train_pipeline, incremental
+from src.models import train_xgboost, continue_training, n_trees
+from src.model_budget import serialized_size
+from src.utils import load_artifacts, load_metadata, artifact_path, file_sha256, ARTIFACTS, OPTIONAL_ARTIFACTS
+
+# this test verifies incremental training extends the deployed model using only rows past its watermark
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+def test_incremental_training(tmp_path):
+    df = pd.read_csv(data_path).sort_values('Time')
+    old, new = df.iloc[:len(df) // 2], df.iloc[len(df) // 2:]
+    temp_data_path = './data/creditcard_incremental.csv'
+    
+    # Full run on the older half, then "deploy" its -new artifacts into tmp_path
+    old.to_csv(temp_data_path, index=False)
+    train_pipeline(filepath=temp_data_path, n_estimators=20)
+    for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+        if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+            shutil.move(artifact_path(artifacts_path, artifact, suffix='-new'), artifact_path(str(tmp_path), artifact))
+    deployed_sha256 = file_sha256(os.path.join(tmp_path, "model.joblib"))
+    
+    # Newer rows arrive, the incremental run only reads those
+    df.to_csv(temp_data_path, index=False)
+    best_f1 = incremental(filepath=temp_data_path, n_new_estimators=10, input_dir=str(tmp_path))
+    
+    model, preprocessor, threshold, saved_f1 = load_artifacts(artifacts_path, suffix='-new')
+    deployed_model, deployed_preprocessor, _, _ = load_artifacts(str(tmp_path))
+    assert best_f1 == saved_f1
+    assert n_trees(model) == 30
+    assert (preprocessor.scaler.mean_ == deployed_preprocessor.scaler.mean_).all()  # scaling the old trees split on
+    
+    metadata = load_metadata(artifacts_path, suffix='-new')
+    assert metadata['watermark'] == df['Time'].max()
+    assert [entry['mode'] for entry in metadata['lineage']] == ['full', 'incremental']
+    assert metadata['lineage'][1]['rows'] == len(new)
+    assert metadata['lineage'][1]['watermark_from'] == old['Time'].max()
+    assert metadata['lineage'][1]['base_model_sha256'] == deployed_sha256
+    assert metadata['model_selection']['within_budget'] and metadata['model_selection']['chosen']['n_trees'] == 30
+    
+    # Threshold picked on the deployed holdout plus the new test rows, saved as the next holdout
+    deployed_holdout = np.load(os.path.join(tmp_path, "holdout.npy"))
+    holdout = np.load(artifact_path(artifacts_path, "holdout.npy", suffix='-new'))
+    assert set(deployed_holdout) < set(holdout) and (holdout >= len(old)).sum() == round(len(new) * 0.2)
+    
+    for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+        if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+            os.remove(artifact_path(artifacts_path, artifact, suffix='-new'))
+    
+    # A size budget trims the continued forest like a full run's
+    incremental(filepath=temp_data_path, n_new_estimators=10, input_dir=str(tmp_path), budget={'max_size_bytes': serialized_size(model) * 0.8})
+    metadata = load_metadata(artifacts_path, suffix='-new')
+    assert metadata['model_selection']['within_budget'] and metadata['model_selection']['chosen']['n_trees'] < 30
+    assert metadata['lineage'][1]['n_trees'] == metadata['model_selection']['chosen']['n_trees']
+    
+    # trimming dropped the oldest deployed trees, all 10 new trees are kept
+    trimmed, _, _, _ = load_artifacts(artifacts_path, suffix='-new')
+    deployed_trees = [tree.tree_.threshold.tobytes() for tree in deployed_model.estimators_]
+    kept = [tree.tree_.threshold.tobytes() in deployed_trees for tree in trimmed.estimators_]
+    assert kept == [True] * (len(kept) - 10) + [False] * 10
+    
+    # Without a saved holdout, too few frauds in the new test split keep the deployed threshold
+    os.remove(os.path.join(tmp_path, "holdout.npy"))
+    incremental(filepath=temp_data_path, n_new_estimators=10, input_dir=str(tmp_path), min_holdout_frauds=len(new))
+    _, _, threshold, saved_f1 = load_artifacts(artifacts_path, suffix='-new')
+    _, _, deployed_threshold, deployed_f1 = load_artifacts(str(tmp_path))
+    assert threshold == deployed_threshold and saved_f1 == deployed_f1
+    
+    for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+        if os.path.exists(artifact_path(artifacts_path, artifact, suffix='-new')):
+            os.remove(artifact_path(artifacts_path, artifact, suffix='-new'))
+    
+    # Nothing past the watermark: nothing to train on
+    shutil.move(os.path.join(tmp_path, "metadata.json"), os.path.join(tmp_path, "metadata-old.json"))
+    with open(os.path.join(tmp_path, "metadata.json"), 'w') as f:
+        f.write('{"watermark": %r, "lineage": []}' % float(df['Time'].max()))
+    assert incremental(filepath=temp_data_path, input_dir=str(tmp_path)) is None
+    
+    os.remove(temp_data_path)
+    shutil.rmtree(os.path.join(os.path.dirname(temp_data_path), 'cache', 'creditcard_incremental'), ignore_errors=True)
+
+
+def test_continue_xgboost():
+    df = pd.read_csv(data_path)
+    X, y = df.drop('Class', axis=1), df['Class']
+    
+    model = train_xgboost(X[:5000], y[:5000], n_estimators=10)
+    model = continue_training(model, X[5000:], y[5000:], n_estimators=5)
+    
+    assert n_trees(model) == 15
+    assert model.predict_proba(X[:10]).shape == (10, 2)
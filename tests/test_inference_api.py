@@ -1,4 +1,8 @@
 import os
+import json
+import time
+import pytest
+import numpy as np
 from fastapi.testclient import TestClient
 from api.app import app
 import pandas as pd
@@ -19,10 +23,10 @@ def test_inference_api(mock_boto3):
     # Import app after mocking boto3
     from api.app import app
     from api import app as app_module
-    from src.utils import load_artifacts
+    from src.model_handle import ModelHandle
     
     # Load models from local artifacts since S3 mock blocked download
-    app_module.model, app_module.preprocessor, app_module.threshold, app_module.best_f1 = load_artifacts('artifacts')
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
     
     # Start FastAPI server in background
     client = TestClient(app)  
@@ -45,4 +49,374 @@ def test_inference_api(mock_boto3):
     assert 0 <= response_fraud.json()["fraud_probability"] <= 1
 
 
-# run all 3 tests on every PR
\ No newline at end of file
+
+@patch('api.app.boto3.client')
+def test_inference_api_batch(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    client = TestClient(app)
+    
+    df = pd.read_csv(data_path)
+    valid_transaction = df.drop('Class', axis=1).iloc[1].tolist()
+    fraud_transaction = df[df['Class'] == 1].drop('Class', axis=1).iloc[0].tolist()
+    
+    # Mix valid rows with a malformed one, results must come back in input order
+    batch = [valid_transaction, valid_transaction[:10], fraud_transaction]
+    response = client.post("/predict/batch", json={"transactions": batch})
+    
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert results[0]["prediction"] == "legit"
+    assert "error" in results[1]
+    assert results[2]["prediction"] == "fraud"
+    
+    # Batch scores must match the single-transaction endpoint
+    single = client.post("/predict", json={"features": fraud_transaction}).json()
+    assert results[2]["fraud_probability"] == single["fraud_probability"]
+    
+    # Oversized batches are rejected as a whole
+    with patch.object(app_module, 'MAX_BATCH_SIZE', 2):
+        response = client.post("/predict/batch", json={"transactions": batch})
+    assert response.status_code == 413
+
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_reload(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    client = TestClient(app)
+    
+    # /reload returns straight away, the new version is loaded in the background
+    with patch.object(app_module, 'fetch_model', lambda version: ModelHandle.from_artifacts('artifacts')):
+        response = client.post("/reload")
+        assert response.status_code == 200
+        version = response.json()["version"]
+        app_module.registry._executor.submit(lambda: None).result()  # wait for the loader thread
+    
+    status = client.get(f"/reload/{version}").json()
+    assert status["status"] == "active"
+    assert client.get("/model").json()["model_version"] == version
+    
+    df = pd.read_csv(data_path)
+    response = client.post("/predict", json={"features": df.drop('Class', axis=1).iloc[1].tolist()})
+    assert response.json()["model_version"] == version
+    
+    assert client.get("/reload/v0").status_code == 404
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_shadow(mock_boto3, tmp_path):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    from src.shadow import ShadowScorer, read_shadow_log
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    shadow = ShadowScorer(app_module.shadow_registry, str(tmp_path / "shadow.log"))
+    client = TestClient(app)
+    
+    try:
+        app_module.shadow_registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+        app_module.shadow = shadow
+        df = pd.read_csv(data_path)
+        rows = df.drop('Class', axis=1).iloc[:5].values.tolist()
+        single = client.post("/predict", json={"features": rows[0]}, headers={"X-Request-Id": "txn-42"})
+        batch = client.post("/predict/batch", json={"transactions": rows})
+        
+        deadline = time.monotonic() + 10
+        while shadow.stats()["scored"] < 6 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        stats = client.get("/shadow/stats").json()
+    finally:
+        app_module.shadow = None
+        shadow.stop()
+        app_module.shadow_registry.unload()
+    
+    assert stats["enabled"] and stats["scored"] == 6 and stats["dropped"] == 0
+    records = read_shadow_log(str(tmp_path / "shadow.log"))
+    probabilities = [single.json()["fraud_probability"]] + [r["fraud_probability"] for r in batch.json()["results"]]
+    np.testing.assert_allclose(records['champion'], probabilities, rtol=1e-6)
+    np.testing.assert_allclose(records['challenger'], records['champion'])  # same artifacts on both sides
+    
+    # Records name the artifacts, not the per-process registry versions, and the request they came from
+    assert (records['champion_artifact'] == stats["challenger_artifact"].encode()).all()
+    assert (records['challenger_artifact'] == records['champion_artifact']).all()
+    assert single.headers["X-Request-Id"] == "txn-42"
+    assert records['request_id'].tolist() == [b"txn-42"] + [batch.headers["X-Request-Id"].encode()] * 5
+    assert records['row'].tolist() == [0, 0, 1, 2, 3, 4]
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_metrics(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    from prometheus_client.parser import text_string_to_metric_families
+    
+    handle = app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts', use_fused=False))
+    client = TestClient(app)
+    
+    df = pd.read_csv(data_path)
+    rows = df.drop('Class', axis=1).iloc[:5].values.tolist()
+    client.post("/predict", json={"features": rows[0]})
+    client.post("/predict/batch", json={"transactions": rows})
+    client.post("/predict", json={"features": [1.0]})  # 400
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    samples = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            samples[(sample.name, tuple(sorted(sample.labels.items())))] = sample.value
+    
+    # Every stage of both endpoints is timed
+    for endpoint, stages in [('/predict', ['parse', 'transform', 'predict', 'threshold']),
+                             ('/predict/batch', ['parse', 'assemble', 'transform', 'predict', 'threshold'])]:
+        for stage in stages:
+            assert samples[('fraud_api_stage_seconds_count', (('endpoint', endpoint), ('stage', stage)))] >= 1
+    
+    assert samples[('fraud_api_rows_scored_total', (('endpoint', '/predict/batch'), ('model_version', handle.version)))] >= 5
+    assert samples[('fraud_api_requests_total', (('endpoint', '/predict'), ('status', '400')))] >= 1
+    assert samples[('fraud_api_model_active', (('model', 'champion'), ('version', handle.version)))] == 1
+    assert samples[('fraud_api_reload_seconds_count', (('model', 'champion'),))] >= 1
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_prediction_cache(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    from src.prediction_cache import PredictionCache
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    app_module.prediction_cache = PredictionCache()
+    client = TestClient(app)
+    
+    try:
+        df = pd.read_csv(data_path)
+        rows = df.drop('Class', axis=1).iloc[:3].values.tolist()
+        
+        first = client.post("/predict", json={"features": rows[0]})
+        retry = client.post("/predict", json={"features": rows[0]})
+        keyed = client.post("/predict", json={"features": rows[0]}, headers={"Idempotency-Key": "abc"})
+        assert first.headers["X-Cache"] == "miss"
+        assert retry.headers["X-Cache"] == "hit" and retry.json() == first.json()
+        assert keyed.headers["X-Cache"] == "miss"
+        
+        # Batches reuse cached rows and only score the rest
+        batch = client.post("/predict/batch", json={"transactions": rows}).json()
+        assert batch["results"][0]["fraud_probability"] == first.json()["fraud_probability"]
+        stats = client.get("/cache/stats").json()
+        assert stats["enabled"] and stats["hits"] == 2 and stats["entries"] == 4
+        
+        # Activating a new version empties the cache
+        app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+        after_reload = client.post("/predict", json={"features": rows[0]})
+        assert after_reload.headers["X-Cache"] == "miss"
+        assert after_reload.json()["model_version"] != first.json()["model_version"]
+    finally:
+        app_module.prediction_cache = None
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_compact_payloads(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    client = TestClient(app)
+    
+    df = pd.read_csv(data_path)
+    X = df.drop('Class', axis=1).iloc[:5].to_numpy(dtype=np.float64)
+    expected_single = client.post("/predict", json={"features": X[0].tolist()}).json()
+    expected_batch = client.post("/predict/batch", json={"transactions": X.tolist()}).json()
+    
+    # Raw float64 and bare JSON arrays score exactly like the JSON contract
+    single = client.post("/predict", content=X[0].astype('<f8').tobytes(), headers={"Content-Type": "application/octet-stream"})
+    assert single.status_code == 200 and single.json() == expected_single
+    batch = client.post("/predict/batch", content=X.astype('<f8').tobytes(), headers={"Content-Type": "application/octet-stream; dtype=float64"})
+    assert batch.json() == expected_batch
+    array = client.post("/predict/batch", content=str(X.tolist()), headers={"Content-Type": "application/x-array+json"})
+    assert array.json() == expected_batch
+    
+    # float32 bodies carry float32 precision
+    batch32 = client.post("/predict/batch", content=X.astype('<f4').tobytes(), headers={"Content-Type": "application/octet-stream; dtype=float32"}).json()
+    expected32 = client.post("/predict/batch", json={"transactions": X.astype(np.float32).astype(np.float64).tolist()}).json()
+    assert batch32 == expected32
+    
+    # Non-finite rows still get a per-item error
+    X_bad = X.copy()
+    X_bad[1, 3] = np.nan
+    results = client.post("/predict/batch", content=X_bad.tobytes(), headers={"Content-Type": "application/octet-stream"}).json()["results"]
+    assert results[1] == {"error": "Features must be finite numbers"} and results[0] == expected_batch["results"][0]
+    
+    # Shape checks
+    assert client.post("/predict", content=X[0].tobytes()[:-8], headers={"Content-Type": "application/octet-stream"}).status_code == 400
+    assert client.post("/predict", content=X[:2].tobytes(), headers={"Content-Type": "application/octet-stream"}).status_code == 400
+    assert client.post("/predict", content=X[0].tobytes(), headers={"Content-Type": "application/octet-stream; dtype=int8"}).status_code == 400
+    
+    # NaN and inf are rejected on the single-row routes, JSON and compact
+    for value in (np.nan, np.inf):
+        row = X[0].copy()
+        row[3] = value
+        assert client.post("/predict", content=row.tobytes(), headers={"Content-Type": "application/octet-stream"}).status_code == 400
+        assert client.post("/predict", content=json.dumps(row.tolist()), headers={"Content-Type": "application/x-array+json"}).status_code == 400
+        assert client.post("/predict", content=json.dumps({"features": row.tolist()}), headers={"Content-Type": "application/json"}).status_code == 400
+    assert client.post("/predict/batch", content="[[1, 2], [3]]", headers={"Content-Type": "application/x-array+json"}).status_code == 400
+    assert client.post("/predict/batch", content="{\"a\": 1}", headers={"Content-Type": "application/x-array+json"}).status_code == 400
+    
+    # Any other content type still goes through the JSON route
+    assert client.post("/predict", content="1.0, 2.0", headers={"Content-Type": "text/plain"}).status_code == 422
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_drift(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    from src.microbatch import MicroBatcher
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    client = TestClient(app)
+    
+    df = pd.read_csv(data_path)
+    rows = df.drop('Class', axis=1).iloc[:200].values.tolist()
+    client.post("/predict", json={"features": rows[0]})
+    client.post("/predict/batch", json={"transactions": rows[1:] + [[1.0]]})  # the invalid row is not counted
+    
+    report = client.get("/drift").json()
+    assert report["model_version"] == app_module.registry.current.version
+    assert report["rows"] == 200 and len(report["features"]) == 30
+    assert report["reference"] in ("training", "scaler")
+    assert 0 <= report["fraud_probability"]["mean"] <= 1
+    
+    # A NaN row cannot poison the running statistics, /drift keeps answering
+    client.post("/predict", content=json.dumps({"features": [float("nan")] + rows[0][1:]}), headers={"Content-Type": "application/json"})
+    response = client.get("/drift")
+    assert response.status_code == 200 and response.json()["rows"] == 200
+    assert np.isfinite(response.json()["max_psi"])
+    
+    # A reload lands while the row waits in the micro-batch queue: drift follows the version that scored it
+    def reload_then_score(X):
+        app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+        return app_module.score_current(X)
+    
+    batcher = app_module.batcher
+    app_module.batcher = MicroBatcher(reload_then_score, max_batch_size=4, max_wait_ms=1)
+    try:
+        response = client.post("/predict", json={"features": rows[0]}).json()
+    finally:
+        app_module.batcher.stop()
+        app_module.batcher = batcher
+    report = client.get("/drift").json()
+    assert report["model_version"] == response["model_version"] == app_module.registry.current.version
+    assert report["rows"] == 1
+
+
+@patch('api.app.boto3.client')
+def test_inference_api_admission(mock_boto3):
+    mock_s3 = MagicMock()
+    mock_boto3.return_value = mock_s3
+    
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    
+    app_module.registry.load(lambda version: ModelHandle.from_artifacts('artifacts'))
+    client = TestClient(app)
+    
+    df = pd.read_csv(data_path)
+    row = df.drop('Class', axis=1).iloc[1].tolist()
+    before = client.get("/admission/stats").json()
+    
+    assert client.post("/predict", json={"features": row}, headers={"X-Deadline-Ms": "5000"}).status_code == 200
+    assert client.post("/predict", json={"features": row}, headers={"X-Deadline-Ms": "soon"}).status_code == 400
+    
+    # far below the measured service time, rejected without being scored
+    response = client.post("/predict", json={"features": row}, headers={"X-Deadline-Ms": "0.0001"})
+    assert response.status_code == 429
+    assert response.headers["X-Shed-Reason"] == "deadline"
+    
+    stats = client.get("/admission/stats").json()
+    assert stats["enabled"] is True and stats["in_flight"] == 0
+    assert stats["admitted"] == before["admitted"] + 1
+    assert stats["shed_deadline"] == before["shed_deadline"] + 1
+    
+    body = client.get("/metrics").text
+    assert 'fraud_api_shed_total{endpoint="/predict",reason="deadline"}' in body
+    assert 'fraud_api_requests_total{endpoint="/predict",status="429"}' in body
+    assert 'fraud_api_queue_wait_seconds_count{endpoint="/predict"}' in body
+
+
+def test_inference_api_startup_readiness():
+    from api.app import app
+    from api import app as app_module
+    from src.model_handle import ModelHandle
+    
+    # the lifespan starts the background load, here from local artifacts instead of S3
+    with patch.object(app_module, 'fetch_model', lambda version, timeline=None: ModelHandle.from_artifacts('artifacts')), TestClient(app) as client:
+        deadline = time.time() + 60
+        while client.get("/ready").status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+        ready = client.get("/ready")
+        assert ready.status_code == 200 and ready.json()["ready"] is True
+        assert {"imports", "warm_model", "warm_request_path"} <= set(ready.json()["phases"])
+        marks = ready.json()["since_process_start"]
+        assert marks["app_imported"] <= marks["ready"]
+        
+        row = pd.read_csv(data_path).drop('Class', axis=1).iloc[1].tolist()
+        assert client.post("/predict", json={"features": row}).status_code == 200
+        assert "first_prediction" in client.get("/ready").json()["since_process_start"]
+        assert 'fraud_api_startup_phase_seconds{phase="warm_model"}' in client.get("/metrics").text
+
+
+
+def test_fetch_model_times_startup_phases_only_when_asked():
+    from api import app as app_module
+    from src.startup import StartupTimeline
+    
+    # the S3 fetch fails either way, a phase is still recorded when it is timed
+    store = MagicMock()
+    store.fetch.side_effect = OSError("S3 unavailable")
+    timeline = StartupTimeline()
+    with patch.object(app_module, 'artifact_store', return_value=store), patch.object(app_module, 'startup', timeline):
+        for fetch in (app_module.fetch_model, app_module.fetch_shadow_model):  # a /reload or the shadow load
+            with pytest.raises(OSError):
+                fetch('v1')
+        assert timeline.phases == {}
+        with pytest.raises(OSError):
+            app_module.fetch_model('v1', timeline=timeline)
+        assert set(timeline.phases) == {'fetch'}
+
+
+# run all 3 tests on every PR
@@ -0,0 +1,94 @@
+import time
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.microbatch import MicroBatcher
+
+# this test verifies concurrent requests are coalesced and each caller gets its own result
+
+
+def test_microbatcher_coalesces_concurrent_calls():
+    calls = []
+    
+    def score(X):
+        calls.append(len(X))
+        time.sleep(0.01)  # slow scorer so requests pile up behind it
+        return X.sum(axis=1)
+    
+    batcher = MicroBatcher(score, max_batch_size=16, max_wait_ms=5)
+    rows = np.random.default_rng(0).normal(size=(64, 30))
+    
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.predict, rows))
+    batcher.stop()
+    
+    np.testing.assert_allclose(results, rows.sum(axis=1))
+    assert sum(calls) == 64
+    assert max(calls) > 1 and max(calls) <= 16
+    
+    stats = batcher.stats()
+    assert stats["rows"] == 64
+    assert stats["batches"] == len(calls)
+    assert stats["queue_depth"] == 0
+
+
+def test_microbatcher_propagates_errors():
+    def score(X):
+        raise RuntimeError("model exploded")
+    
+    batcher = MicroBatcher(score, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model exploded"):
+        batcher.predict(np.zeros(30), timeout=5)
+    batcher.stop()
+
+
+def test_microbatcher_stop_fails_queued_rows():
+    release = threading.Event()
+    
+    def score(X):
+        release.wait(5)  # holds the first row while the others queue up
+        return X.sum(axis=1)
+    
+    batcher = MicroBatcher(score, max_batch_size=1, max_wait_ms=0)
+    futures = [batcher.submit(np.zeros(30)) for _ in range(3)]
+    time.sleep(0.05)
+    
+    stopper = threading.Thread(target=batcher.stop)
+    stopper.start()
+    time.sleep(0.05)
+    release.set()
+    stopper.join(5)
+    
+    assert futures[0].result(timeout=1) == 0
+    for future in futures[1:]:
+        with pytest.raises(RuntimeError, match="stopped"):
+            future.result(timeout=1)
+    with pytest.raises(RuntimeError, match="stopped"):
+        batcher.submit(np.zeros(30))
+
+
+def test_microbatcher_stop_races_submit():
+    batcher = MicroBatcher(lambda X: X.sum(axis=1), max_batch_size=1, max_wait_ms=0)
+    in_put, resume = threading.Event(), threading.Event()
+    put = batcher._queue.put
+    
+    def slow_put(item):
+        in_put.set()
+        resume.wait(5)  # submit has seen the batcher running and not queued its row yet
+        put(item)
+    
+    batcher._queue.put = slow_put
+    futures = []
+    submitter = threading.Thread(target=lambda: futures.append(batcher.submit(np.zeros(30))))
+    submitter.start()
+    in_put.wait(5)
+    stopper = threading.Thread(target=batcher.stop)
+    stopper.start()
+    stopper.join(0.5)  # without the lock stop() would finish its drain here
+    resume.set()
+    submitter.join(5)
+    stopper.join(5)
+    
+    # stop() waited for the row, which was then scored or failed by the drain, never left waiting
+    assert futures[0].done()
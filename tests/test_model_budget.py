@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from unittest.mock import patch
+from src.data import load_data
+from src.preprocessing import FraudPreprocessor, split_data
+from src.models import train_random_forest
+from src.model_budget import fit_budget, profile_model, serialized_size, trim_forest
+from src.train_pipeline import train_stage
+
+# this test verifies models are shrunk to a latency/size budget and the trade-off is recorded
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def _split():
+    X, y = load_data(data_path)
+    X_train, X_test, y_train, y_test = split_data(X, y, test_size=0.2, random_state=42)
+    preprocessor = FraudPreprocessor()
+    return preprocessor.fit_transform(X_train), preprocessor.transform(X_test), y_train, y_test
+
+
+def test_fit_budget_trims_trees():
+    X_train, X_test, y_train, y_test = _split()
+    model = train_random_forest(X_train, y_train, n_estimators=40)
+    profile = profile_model(model, X_test)
+    assert profile['size_bytes'] == serialized_size(model)
+    
+    # no budget: the model is kept as is and only profiled
+    same, record = fit_budget(model, X_train, y_train, X_test, y_test)
+    assert same is model and record['within_budget'] and record['candidates_tried'] == 1
+    
+    # half the size forces fewer trees, the first trees of the forest are kept
+    budget = profile['size_bytes'] // 2
+    trimmed, record = fit_budget(model, X_train, y_train, X_test, y_test, max_size_bytes=budget, max_f1_drop=1.0)
+    assert record['within_budget'] and record['chosen']['size_bytes'] <= budget
+    assert len(trimmed.estimators_) == record['chosen']['n_trees'] < 40
+    assert trimmed.estimators_[0] is model.estimators_[0] and len(model.estimators_) == 40
+    assert record['f1_drop'] == record['original']['f1'] - record['chosen']['f1']
+    
+    trimmed_proba = trimmed.predict_proba(X_test)[:, 1]
+    expected = trim_forest(model, len(trimmed.estimators_)).predict_proba(X_test)[:, 1]
+    assert np.array_equal(trimmed_proba, expected)
+
+
+def test_fit_budget_caps_depth():
+    X_train, X_test, y_train, y_test = _split()
+    model = train_random_forest(X_train, y_train, n_estimators=20)
+    budget = profile_model(model, X_test)['size_bytes'] // 2
+    
+    # an impossible F1 tolerance makes it try every depth cap and keep the best in-budget F1
+    shrunk, record = fit_budget(model, X_train, y_train, X_test, y_test, max_size_bytes=budget, max_f1_drop=-1.0, depth_caps=(8, 4))
+    assert record['within_budget'] and record['chosen']['size_bytes'] <= budget
+    assert shrunk.max_depth == record['chosen']['max_depth']
+    assert record['candidates_tried'] > 2
+
+
+def test_train_stage_selects_on_validation():
+    X, y = load_data(data_path)
+    split = split_data(X, y, test_size=0.2, random_state=42)
+    preprocessor = FraudPreprocessor().fit(split[0])
+    model = train_random_forest(preprocessor.transform(split[0]), split[2], n_estimators=20)
+    budget = {'max_size_bytes': serialized_size(model) // 2}
+    
+    # the trimmed variant is picked on validation rows of train, then refitted on all of train
+    with patch('src.train_pipeline.fit_budget', wraps=fit_budget) as budget_fit:
+        shrunk, record = train_stage(split, preprocessor, n_estimators=20, search=False, budget=budget, max_f1_drop=1.0)
+    X_val = budget_fit.call_args.args[3]
+    assert len(X_val) == round(len(split[0]) * 0.2) and np.isin(X_val[:, 0], preprocessor.transform(split[0])[:, 0]).all()
+    assert record['within_budget'] and len(shrunk.estimators_) == record['chosen']['n_trees'] < 20
+    expected = train_random_forest(preprocessor.transform(split[0]), split[2], n_estimators=record['chosen']['n_trees'])
+    X_test = preprocessor.transform(split[1])
+    np.testing.assert_array_equal(shrunk.predict_proba(X_test), expected.predict_proba(X_test))
+    
+    # no budget: the trained model is only profiled
+    same, record = train_stage(split, preprocessor, n_estimators=20, search=False, budget={})
+    assert record['chosen'] is record['original'] and len(same.estimators_) == 20
@@ -0,0 +1,119 @@
+import threading
+import time
+import numpy as np
+import pytest
+from src.model_handle import ModelHandle, ModelRegistry
+
+# this test verifies model versions are swapped atomically and only released once drained
+
+
+class ConstantModel:
+    def __init__(self, p):
+        self.p = p
+    
+    def predict_proba(self, X):
+        return np.column_stack([np.full(len(X), 1 - self.p), np.full(len(X), self.p)])
+
+
+class IdentityPreprocessor:
+    def transform(self, X):
+        return X
+
+
+def make_loader(p, threshold):
+    return lambda version: ModelHandle(ConstantModel(p), IdentityPreprocessor(), threshold, best_f1=p)
+
+
+def test_in_flight_requests_keep_their_version():
+    registry = ModelRegistry()
+    registry.load(make_loader(0.2, 0.5))
+    
+    with registry.acquire() as old:
+        # Swap while a request is still using the old version
+        registry.load(make_loader(0.8, 0.9))
+        assert registry.current is not old
+        assert old.score(np.zeros((1, 30)))[0] == 0.2
+        assert old.threshold == 0.5
+        assert registry.status(old.version)["status"] == "draining"
+    
+    # Released once its last request finished
+    assert registry.status(old.version)["status"] == "released"
+    assert old.model is None
+    
+    with registry.acquire() as new:
+        assert new.score(np.zeros((1, 30)))[0] == 0.8
+        assert registry.status(new.version)["status"] == "active"
+
+
+def test_reload_async_returns_before_load():
+    registry = ModelRegistry()
+    registry.load(make_loader(0.2, 0.5))
+    started = threading.Event()
+    finish = threading.Event()
+    
+    def slow_loader(version):
+        started.set()
+        finish.wait(5)
+        return make_loader(0.8, 0.5)(version)
+    
+    version = registry.reload_async(slow_loader)
+    started.wait(5)
+    assert registry.status(version)["status"] == "loading"
+    assert registry.current.best_f1 == 0.2  # old version keeps serving while loading
+    
+    finish.set()
+    registry._executor.submit(lambda: None).result()
+    assert registry.status(version)["status"] == "active"
+    assert registry.current.version == version
+
+
+def test_loads_run_in_request_order():
+    # a reload requested while a slow (startup) load is running is applied after it, not overwritten by it
+    registry = ModelRegistry()
+    started = threading.Event()
+    
+    def slow_loader(version):
+        started.set()
+        time.sleep(0.2)
+        return make_loader(0.2, 0.5)(version)
+    
+    startup = threading.Thread(target=registry.load, args=(slow_loader,))
+    startup.start()
+    started.wait(5)
+    version = registry.reload_async(make_loader(0.8, 0.5))
+    startup.join(5)
+    registry._executor.submit(lambda: None).result()
+    assert registry.current.version == version and registry.current.best_f1 == 0.8
+
+
+def test_failed_load_keeps_current_version():
+    registry = ModelRegistry()
+    current = registry.load(make_loader(0.2, 0.5))
+    
+    def broken_loader(version):
+        raise FileNotFoundError("model.joblib")
+    
+    with pytest.raises(FileNotFoundError):
+        registry.load(broken_loader)
+    
+    assert registry.current is current
+    failed = [s for s in registry._versions.values() if s["status"] == "failed"]
+    assert len(failed) == 1 and "model.joblib" in failed[0]["error"]
+
+
+def test_listener_runs_outside_the_lock():
+    # a listener calling back into the registry (here acquire, which takes the lock) must not deadlock
+    seen = []
+    registry = ModelRegistry()
+    
+    def listener(status):
+        with registry.acquire() as handle:
+            seen.append((status["status"], handle.version if handle else None))
+    
+    registry.listener = listener
+    loader = threading.Thread(target=lambda: [registry.load(make_loader(0.2, 0.5)), registry.load(make_loader(0.8, 0.5))])
+    loader.start()
+    loader.join(5)
+    assert not loader.is_alive()
+    assert [status for status, _ in seen] == ["active", "active", "draining", "released"]
+    assert seen[1][1] == seen[2][1] == registry.current.version  # the new version is published before the listener runs
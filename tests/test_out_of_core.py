@@ -0,0 +1,54 @@
+import os
+import numpy as np
+import pandas as pd
+from src.out_of_core import plan_holdout, train_xgboost_out_of_core
+from src.train_pipeline import out_of_core
+from src.utils import load_artifacts, load_metadata, artifact_path, ARTIFACTS, OPTIONAL_ARTIFACTS
+
+# this test verifies out-of-core training streams the CSV and holds out a stratified sample
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+def test_plan_holdout():
+    counts = [[900, 10], [1000, 0], [50, 40], [999, 1]]
+    plan = plan_holdout(counts, test_size=0.2, random_state=1)
+    assert (plan.sum(axis=0) == [590, 10]).all() and (plan <= counts).all()
+    
+    capped = plan_holdout(counts, test_size=0.2, max_holdout_rows=300)
+    assert capped.sum() <= 300 and capped.sum(axis=0)[1] == 5
+
+
+def test_out_of_core_training(tmp_path):
+    df = pd.read_csv(data_path)
+    model, preprocessor, X_test, y_test, info = train_xgboost_out_of_core(data_path, chunk_rows=1500, n_estimators=20, work_dir=str(tmp_path))
+    
+    # stratified holdout of real rows, the scaler saw exactly the other rows
+    assert info['rows'] == len(df) and info['chunks'] == 7 and info['data_passes'] >= 3
+    assert y_test.sum() == round(df['Class'].sum() * 0.2) and len(y_test) == info['test_rows']
+    held_out = df.drop(columns=['Class']).merge(X_test.assign(held_out=True), how='left')['held_out'].notna().to_numpy()
+    assert held_out.sum() == len(X_test)
+    assert (df.drop(columns=['Class']).to_numpy()[X_test.index] == X_test.to_numpy()).all()  # indexed by row position in the CSV
+    train = df[~held_out].drop(columns=['Class'])
+    np.testing.assert_allclose(preprocessor.scaler.mean_, train.mean())
+    np.testing.assert_allclose(preprocessor.scaler.var_, train.var(ddof=0))
+    
+    assert model.get_booster().num_boosted_rounds() == 20
+    assert model.predict_proba(preprocessor.transform(X_test)).shape == (len(X_test), 2)
+    assert info['watermark'] == df['Time'].max() and all(mb > 0 for mb in info['peak_rss_mb'].values())
+
+
+def test_out_of_core_pipeline():
+    best_f1 = out_of_core(filepath=data_path, chunk_rows=2500, n_estimators=20)
+    try:
+        model, preprocessor, threshold, saved_f1 = load_artifacts(artifacts_path, suffix='-new')
+        assert best_f1 == saved_f1 and type(model).__name__ == 'XGBClassifier'
+        metadata = load_metadata(artifacts_path, suffix='-new')
+        assert metadata['lineage'][-1]['mode'] == 'out_of_core' and metadata['out_of_core']['chunks'] == 4
+    finally:
+        for artifact in ARTIFACTS + OPTIONAL_ARTIFACTS:
+            path = artifact_path(artifacts_path, artifact, suffix='-new')
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,46 @@
+import time
+import numpy as np
+from src.prediction_cache import PredictionCache, feature_key
+
+# this test verifies cached predictions are evicted by size and age and never outlive their model version
+
+
+def test_prediction_cache_hits_and_versions():
+    cache = PredictionCache(max_entries=10, ttl_seconds=60)
+    row = np.arange(30, dtype=float)
+    
+    assert cache.get(feature_key(row), "v1") is None
+    cache.put(feature_key(row), "v1", 0.25)
+    assert cache.get(feature_key(row.tolist()), "v1") == 0.25  # same floats, same key
+    
+    # Idempotency keys separate otherwise identical requests
+    assert cache.get(feature_key(row, "retry-1"), "v1") is None
+    
+    # A different model version never sees the old result
+    assert cache.get(feature_key(row), "v2") is None
+    assert cache.get(feature_key(row), "v1") is None  # and the stale entry is gone
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 4 and stats["invalidated"] == 1
+    assert stats["entries"] == 0 and stats["memory_bytes"] == 0
+
+
+def test_prediction_cache_lru_and_ttl():
+    cache = PredictionCache(max_entries=3, ttl_seconds=0.05)
+    keys = [feature_key(np.full(30, i, dtype=float)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, "v1", 0.5)
+    cache.get(keys[0], "v1")  # keys[1] is now the least recently used
+    cache.put(keys[3], "v1", 0.5)
+    
+    assert cache.get(keys[1], "v1") is None
+    assert cache.get(keys[0], "v1") == 0.5
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["entries"] == 3 and stats["memory_bytes"] > 0
+    
+    time.sleep(0.06)
+    assert cache.get(keys[0], "v1") is None
+    assert cache.stats()["expired"] == 1
+    
+    cache.clear()
+    assert cache.stats()["entries"] == 0
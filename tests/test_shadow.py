@@ -0,0 +1,96 @@
+import time
+import numpy as np
+import pytest
+from src.model_handle import ModelHandle, ModelRegistry
+from src.shadow import ShadowScorer, read_shadow_log
+
+# this test verifies shadow scoring logs both models' results and drops work instead of blocking when saturated
+
+
+class ConstantModel:
+    def __init__(self, p, delay=0.0):
+        self.p = p
+        self.delay = delay
+    
+    def predict_proba(self, X):
+        time.sleep(self.delay)
+        return np.column_stack([np.full(len(X), 1 - self.p), np.full(len(X), self.p)])
+
+
+class IdentityPreprocessor:
+    def transform(self, X):
+        return X
+
+
+def make_registry(p, threshold, delay=0.0):
+    registry = ModelRegistry()
+    registry.load(lambda version: ModelHandle(ConstantModel(p, delay), IdentityPreprocessor(), threshold, best_f1=p, artifact_version="c0ffee"))
+    return registry
+
+
+def wait_until_idle(shadow, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = shadow.stats()
+        if stats["scored"] + stats["no_challenger"] + stats["errors"] == stats["submitted"]:
+            return
+        time.sleep(0.01)
+
+
+def test_shadow_scorer_logs_both_models(tmp_path):
+    shadow = ShadowScorer(make_registry(0.7, 0.5), str(tmp_path / "shadow.log"))
+    
+    champion = np.array([0.1, 0.9, 0.3])
+    assert shadow.submit(np.zeros((3, 30)), champion, champion >= 0.5, "a1b2c3d4e5f6", "request-1")
+    assert shadow.submit(np.zeros((1, 30)), [0.2], [False], "f6e5d4c3b2a1", "request-2", rows=[7])
+    wait_until_idle(shadow)
+    shadow.stop()
+    
+    records = read_shadow_log(str(tmp_path / "shadow.log"))
+    assert len(records) == 4
+    np.testing.assert_allclose(records['champion'], [0.1, 0.9, 0.3, 0.2], rtol=1e-6)
+    np.testing.assert_allclose(records['challenger'], 0.7, rtol=1e-6)
+    assert records['champion_artifact'].tolist() == [b"a1b2c3d4e5f6"] * 3 + [b"f6e5d4c3b2a1"]
+    assert (records['challenger_artifact'] == b"c0ffee").all()
+    assert records['request_id'].tolist() == [b"request-1"] * 3 + [b"request-2"]
+    assert records['row'].tolist() == [0, 1, 2, 7]
+    assert records['flags'].tolist() == [2, 3, 2, 2]  # challenger always says fraud, champion only for row 2
+    
+    # Appending to an existing log keeps earlier records
+    shadow = ShadowScorer(make_registry(0.7, 0.5), str(tmp_path / "shadow.log"))
+    shadow.submit(np.zeros((2, 30)), [0.1, 0.1], [False, False], "a1b2c3d4e5f6")
+    wait_until_idle(shadow)
+    shadow.stop()
+    assert len(read_shadow_log(str(tmp_path / "shadow.log"))) == 6
+    
+    # A log of another record layout is never appended to
+    with open(tmp_path / "old.log", 'wb') as f:
+        f.write(b"FRAUDSHD" + (21).to_bytes(8, 'little'))
+    with pytest.raises(ValueError):
+        ShadowScorer(make_registry(0.7, 0.5), str(tmp_path / "old.log"))
+
+
+def test_shadow_scorer_drops_when_saturated(tmp_path):
+    # Slow challenger and a tiny queue: submit must return right away and count what it drops
+    shadow = ShadowScorer(make_registry(0.7, 0.5, delay=0.2), str(tmp_path / "shadow.log"), max_queue_size=2, max_batch_size=1)
+    
+    start = time.perf_counter()
+    accepted = [shadow.submit(np.zeros((1, 30)), [0.1], [False], "a1b2c3d4e5f6") for _ in range(50)]
+    elapsed = time.perf_counter() - start
+    
+    assert elapsed < 0.1
+    assert not all(accepted)
+    stats = shadow.stats()
+    assert stats["dropped"] == accepted.count(False)
+    assert stats["submitted"] == accepted.count(True)
+    shadow.stop()
+
+
+def test_shadow_scorer_without_challenger(tmp_path):
+    shadow = ShadowScorer(ModelRegistry(), str(tmp_path / "shadow.log"))
+    shadow.submit(np.zeros((2, 30)), [0.1, 0.2], [False, False], "a1b2c3d4e5f6")
+    wait_until_idle(shadow)
+    shadow.stop()
+    
+    assert shadow.stats()["no_challenger"] == 2
+    assert len(read_shadow_log(str(tmp_path / "shadow.log"))) == 0
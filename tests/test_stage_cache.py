@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+import pandas as pd
+from src.stage_cache import StageCache
+from src.utils import file_sha256
+from src.train_pipeline import load_stage, split_stage, fit_preprocessor, train_stage, threshold_stage
+
+# this test verifies workflow stages are skipped when their inputs are unchanged
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+
+
+def run_stages(cache, filepath, n_estimators):
+    # same chain as src/workflow.py without the compare stage, which talks to S3
+    data = cache.run('load', load_stage, {'filepath': filepath, 'cache_dir': None}, fingerprint=file_sha256(filepath))
+    split = cache.run('split', split_stage, {'test_size': 0.2, 'random_state': 42}, deps=[data])
+    preprocessor = cache.run('preprocess', fit_preprocessor, deps=[split])
+    trained = cache.run('train', train_stage, {'n_estimators': n_estimators, 'search': False, 'budget': {}}, deps=[split, preprocessor])
+    threshold = cache.run('threshold', threshold_stage, deps=[trained, split, preprocessor])
+    return {timing['stage']: timing['cached'] for timing in cache.summary()}, threshold
+
+
+def test_stage_cache(tmp_path):
+    df = pd.read_csv(data_path).iloc[:3000]
+    filepath = str(tmp_path / "data.csv")
+    df.to_csv(filepath, index=False)
+    cache_dir = str(tmp_path / "stages")
+    
+    cached, first = run_stages(StageCache(cache_dir), filepath, n_estimators=10)
+    assert not any(cached.values())
+    
+    # Nothing changed: every stage is skipped and no output is even loaded
+    cached, second = run_stages(StageCache(cache_dir), filepath, n_estimators=10)
+    assert all(cached.values()) and second.key == first.key
+    assert second._value is not first._value and second.value[1] == first.value[1]  # best F1 read back from disk
+    
+    # New training parameters only rerun training and what depends on it
+    cached, _ = run_stages(StageCache(cache_dir), filepath, n_estimators=20)
+    assert cached == {'load': True, 'split': True, 'preprocess': True, 'train': False, 'threshold': False}
+    assert len(os.listdir(cache_dir)) == 5  # only the latest output of each stage is kept
+    
+    # New data reruns everything
+    df.iloc[:2500].to_csv(filepath, index=False)
+    cached, _ = run_stages(StageCache(cache_dir), filepath, n_estimators=20)
+    assert not any(cached.values())
+
+
+def test_stage_cache_lock(tmp_path):
+    # an overlapping run waits until the first has loaded everything it needs
+    cache_dir = str(tmp_path / "stages")
+    first, second = StageCache(cache_dir), StageCache(cache_dir)
+    events = []
+    
+    def overlapping_run():
+        with second.lock():
+            events.append('second')
+    
+    with first.lock():
+        thread = threading.Thread(target=overlapping_run)
+        thread.start()
+        time.sleep(0.1)
+        events.append('first')
+    thread.join(5)
+    assert events == ['first', 'second']
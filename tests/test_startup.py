@@ -0,0 +1,34 @@
+import sys
+import time
+import types
+from src.startup import StartupTimeline, lazy_import, process_age
+
+# this test verifies startup phases are timed from process start and heavy modules load on first use
+
+
+def test_startup_timeline():
+    timeline = StartupTimeline()
+    age = process_age()
+    assert age is not None and age > 0
+    assert abs(timeline.since_start() - age) < 1  # /proc has 10 ms ticks
+    
+    with timeline.phase('fetch'):
+        time.sleep(0.01)
+    assert timeline.mark('ready') and not timeline.mark('ready')  # first occurrence only
+    timeline.finish()
+    with timeline.phase('fetch'):  # a later reload does not overwrite startup numbers
+        time.sleep(0.05)
+    
+    report = timeline.report()
+    assert 0.01 <= report['phases']['fetch'] < 0.05
+    assert report['since_process_start']['ready'] >= age
+
+
+def test_lazy_import_defers_execution():
+    assert 'tabnanny' not in sys.modules
+    module = lazy_import('tabnanny')
+    assert sys.modules['tabnanny'] is module
+    assert type(module) is not types.ModuleType  # not executed yet
+    assert module.NannyNag.__name__ == 'NannyNag'
+    assert type(module) is types.ModuleType
+    assert lazy_import('tabnanny') is module
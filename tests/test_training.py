@@ -1,7 +1,12 @@
+import numpy as np
 import pandas as pd
-from src.train_pipeline import main as train_pipeline
-from src.utils import load_artifacts
+from src.train_pipeline import main as train_pipeline, extend_split
+from src.utils import load_artifacts, load_fused_model, load_metadata
+from src.bundle import load_bundle
 import os
+import shutil
+import joblib
+import pytest
 
 
 data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
@@ -39,9 +44,63 @@ def test_training_pipeline():
     prediction = model.predict(sample_scaled)
     assert prediction is not None  # Verify prediction worked
     
-    for artifact in ["model-new", "preprocessor-new", "threshold-new", "best_f1-new"]:
+    # Fused raw-input model is exported next to the other artifacts and needs no scaling
+    fused_model = load_fused_model(suffix="-new")
+    assert fused_model is not None
+    assert (fused_model.predict_proba(sample_X.to_numpy()) == model.predict_proba(sample_scaled)).all()
+    
+    # Bundle serves the same predictions straight from the memory-mapped file
+    bundle_model, bundle_preprocessor, bundle_threshold, bundle_f1, manifest = load_bundle(os.path.join(artifacts_path, "model-new.bundle"), verify=True)
+    assert bundle_threshold == threshold and bundle_f1 == best_f1
+    assert (bundle_model.predict_proba(sample_X.to_numpy()) == model.predict_proba(sample_scaled)).all()
+    
+    # Lineage starts with this full run, watermarked at the newest row it saw
+    metadata = load_metadata(suffix="-new")
+    assert metadata['watermark'] == df_temp['Time'].max()
+    assert [entry['mode'] for entry in metadata['lineage']] == ['full']
+    
+    # Test rows are saved by their position in the CSV for compare_and_deploy
+    holdout = np.load(os.path.join(artifacts_path, "holdout-new.npy"))
+    assert len(holdout) == len(df_temp) // 5 and df_temp['Class'].to_numpy()[holdout].sum() == 10
+    
+    # Serving profile of the saved model is recorded, no budget means nothing was trimmed
+    selection = metadata['model_selection']
+    assert selection['within_budget'] and selection['f1_drop'] == 0
+    assert selection['chosen']['n_trees'] == len(model.estimators_)
+    assert selection['chosen']['single_row_ms'] > 0 and selection['chosen']['size_bytes'] > 0
+    
+    # Reference distributions for drift monitoring come from the test split
+    drift_reference = joblib.load(os.path.join(artifacts_path, "drift_reference-new.joblib"))
+    assert drift_reference['feature_names'] == list(sample_X.columns)
+    assert drift_reference['proportions'].shape == (30, 10)
+    
+    for artifact in ["model-new", "preprocessor-new", "threshold-new", "best_f1-new", "model_fused-new", "drift_reference-new"]:
         os.remove(os.path.join(artifacts_path, f"{artifact}.joblib"))
+    os.remove(os.path.join(artifacts_path, "model-new.bundle"))
+    os.remove(os.path.join(artifacts_path, "metadata-new.json"))
+    os.remove(os.path.join(artifacts_path, "holdout-new.npy"))
         
     os.remove(temp_data_path)
+    shutil.rmtree(os.path.join(os.path.dirname(temp_data_path), 'cache', 'creditcard_temp'), ignore_errors=True)
+    
+
+
+def test_extend_split():
+    # the deployed holdout stays held out, only rows past its watermark are split anew
+    df = pd.read_csv(data_path).sort_values('Time', kind='stable').reset_index(drop=True)
+    X, y = df.drop('Class', axis=1), df['Class']
+    old = X.index[:len(X) // 2]
+    rows = old[::5].to_numpy()
+    watermark = float(X['Time'].iloc[len(X) // 2 - 1])
+    
+    X_train, X_test, y_train, y_test = extend_split(X, y, rows, watermark, test_size=0.2)
+    assert set(rows) <= set(X_test.index) and not set(X_train.index) & set(X_test.index)
+    assert len(X_train) + len(X_test) == len(X)
+    new_test = X_test[X_test['Time'] > watermark]
+    assert abs(len(new_test) - 0.2 * (X['Time'] > watermark).sum()) <= 1
+    
+    # Holdout rows that are no longer in the data
+    with pytest.raises(ValueError):
+        extend_split(X.iloc[:100], y.iloc[:100], rows, watermark)
     
 # pytest tests/test_training.py -v
\ No newline at end of file
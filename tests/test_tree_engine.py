@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.tree_engine import FlatForest, build_engine
+from src.models import train_logistic_regression
+from src.utils import load_artifacts
+
+# this test verifies the flattened forest matches sklearn's predict_proba
+
+
+data_path = os.getenv('DATA_PATH', './data/creditcard_ci.csv')
+artifacts_path = os.getenv('ARTIFACTS_PATH', 'artifacts')
+
+
+def test_flat_forest_parity():
+    model, preprocessor, threshold, best_f1 = load_artifacts(artifacts_path)
+    
+    df = pd.read_csv(data_path)
+    X_scaled = preprocessor.transform(df.drop('Class', axis=1))
+    
+    flat = FlatForest.from_sklearn(model)
+    assert flat.n_estimators == len(model.estimators_)
+    
+    # Whole CI set as one batch
+    np.testing.assert_allclose(flat.predict_proba(X_scaled), model.predict_proba(X_scaled), rtol=0, atol=1e-12)
+    
+    # Single rows, both 1-D and 2-D
+    for i in range(5):
+        expected = model.predict_proba(X_scaled[i:i + 1])[0, 1]
+        assert flat.predict_fraud_proba(X_scaled[i]) == pytest.approx(expected, abs=1e-12)
+        assert flat.predict_proba(X_scaled[i:i + 1]).shape == (1, 2)
+
+
+def test_build_engine_falls_back_for_other_models():
+    X = np.random.default_rng(0).normal(size=(200, 30))
+    y = (X[:, 0] > 1).astype(int)
+    model = train_logistic_regression(X, y)
+    
+    assert build_engine(model, 'flat') is model
+    assert build_engine(model, 'sklearn') is model
+    with pytest.raises(ValueError):
+        build_engine(model, 'onnx')